@@ -6,70 +6,95 @@ os.environ["DISABLE_BNB_QUANTIZATION_CHECK"] = "1"
 
 import gradio as gr
 import torch
-from transformers import AutoModelForCausalLM, AutoTokenizer
 import spaces
 
+from serving.conversation import conversation_messages, prompt_ids
+from serving.model_manager import ModelManager, ModelNotReady, zero_gpu
+from serving.prefix_cache import PrefixCache
+from serving.scheduler import ContinuousBatcher, SchedulerBusy
+from serving.streaming import stream_generate
+
 MODEL_CANDIDATES = [
     "jackyanghxc/PEAllm",
     "Sakjay/Thai-Llama3-8b"
 ]
 
+# Optional system prompt put in front of every conversation; being shared, its KV cache is computed once.
+SYSTEM_PROMPT = os.environ.get("PEALLM_SYSTEM_PROMPT")
 
-def _select_device_and_dtype():
-    """Return device map and dtype based on GPU availability."""
-    if torch.cuda.is_available():
-        return "cuda", torch.float16
-    return "cpu", torch.float32
+# Seconds a chat message waits for the model while the worker is still starting up.
+READY_TIMEOUT = float(os.environ.get("PEALLM_READY_TIMEOUT") or 30)
 
+# ZeroGPU only grants the GPU inside @spaces.GPU calls.
+ZERO_GPU = zero_gpu()
 
-@spaces.GPU
-def load_model():
-    """Load tokenizer and model when a GPU worker spins up."""
-    device_map, dtype = _select_device_and_dtype()
-    last_error = None
-    for name in MODEL_CANDIDATES:
-        try:
-            tokenizer = AutoTokenizer.from_pretrained(name)
-            model = AutoModelForCausalLM.from_pretrained(
-                name,
-                torch_dtype=dtype,
-                device_map=device_map,
-                low_cpu_mem_usage=True
-            )
-            model.eval()
-            return tokenizer, model
-        except Exception as exc:  # noqa: BLE001
-            last_error = exc
-    raise RuntimeError(f"Failed to load model: {last_error}")
+# The model is loaded and warmed up once per worker, in the background, as soon as the app starts.
+# On ZeroGPU it is loaded at import instead (ZeroGPU places module-level .to("cuda") weights on the
+# GPU it attaches to each call) and not warmed up, since generating outside @spaces.GPU fails.
+# On CPU-only workers set PEALLM_QUANTIZATION=bf16|int8|int4 (see serving/bench_quantization.py).
+manager = ModelManager(MODEL_CANDIDATES)
+manager.start(background=not ZERO_GPU)
+
+# Concurrent chats share one decoding batch (PEALLM_SCHEDULER=1). On ZeroGPU each chat keeps
+# its own generate call inside @spaces.GPU by default.
+USE_SCHEDULER = (os.environ.get("PEALLM_SCHEDULER") or ("0" if ZERO_GPU else "1")) == "1"
 
+# KV caches of earlier turns and shared prefixes, so a follow-up only prefills its new tokens
+# (bounded by PEALLM_PREFIX_CACHE_MB). ZeroGPU releases the GPU between calls, so not there.
+prefix_cache = None if ZERO_GPU else PrefixCache()
+scheduler = ContinuousBatcher(manager, prefix_cache=prefix_cache) if USE_SCHEDULER else None
 
+
+@spaces.GPU
 def generate_response(message, history):
-    """Generate response from PEAllm."""
-    tokenizer, model = load_model()
+    """Stream the response from PEAllm token by token.
+
+    Gradio closes this generator when the user presses stop or disconnects,
+    which stops generation at the next token.
+    """
+    messages = conversation_messages(message, history, SYSTEM_PROMPT)
     try:
-        prompt = f"<|begin_of_text|>{message}"
-        inputs = tokenizer(
-            prompt,
-            return_tensors="pt",
-            truncation=True,
-            max_length=512
-        )
-        if torch.cuda.is_available():
-            inputs = {k: v.to(model.device) for k, v in inputs.items()}
-
-        with torch.no_grad():
-            outputs = model.generate(
-                **inputs,
+        if scheduler is not None:
+            manager.wait_ready(READY_TIMEOUT)
+            for partial in scheduler.submit(messages, max_new_tokens=200, temperature=0.7, do_sample=True):
+                yield partial.strip()
+            return
+
+        with manager.acquire(timeout=READY_TIMEOUT) as loaded:
+            tokenizer, model = loaded.tokenizer, loaded.model
+            ids = prompt_ids(tokenizer, messages)
+            inputs = {
+                "input_ids": torch.tensor([ids]),
+                "attention_mask": torch.ones(1, len(ids), dtype=torch.long)
+            }
+            if torch.cuda.is_available():
+                inputs = {k: v.to(model.device) for k, v in inputs.items()}
+
+            for partial in stream_generate(
+                tokenizer,
+                model,
+                inputs,
+                prefix_cache=prefix_cache,
+                cache_version=loaded.key,
                 max_new_tokens=200,
                 temperature=0.7,
                 do_sample=True,
                 pad_token_id=tokenizer.eos_token_id
-            )
-
-        response = tokenizer.decode(outputs[0], skip_special_tokens=True)
-        return response.replace(prompt, "").strip()
+            ):
+                yield partial.strip()
+    except (ModelNotReady, SchedulerBusy) as exc:
+        yield f"⏳ {exc}. Please try again in a moment."
     except Exception as exc:  # noqa: BLE001
-        return f"Error: {exc}"
+        yield f"Error: {exc}"
+
+
+def server_status():
+    data = manager.status()
+    if scheduler is not None:
+        data["scheduler"] = scheduler.summary()
+    if prefix_cache is not None:
+        data["prefix_cache"] = prefix_cache.summary()
+    return data
 
 
 title = "PEAllm - Thailand Energy AI Assistant"
@@ -99,15 +124,7 @@ examples = [
 ]
 
 
-demo = gr.ChatInterface(
-    fn=generate_response,
-    title=title,
-    description=description,
-    examples=examples,
-    theme="soft",
-)
-
-demo.css = """
+css = """
 .gradio-container {
     font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
 }
@@ -117,6 +134,23 @@ demo.css = """
 }
 """
 
+with gr.Blocks(theme="soft", css=css, title=title) as demo:
+    gr.ChatInterface(
+        fn=generate_response,
+        title=title,
+        description=description,
+        examples=examples,
+    )
+    # Readiness for health checks: the "status" API endpoint reports load state, the serving revision
+    # and, with the scheduler, queue wait, batch occupancy and tokens/sec, plus prefix cache reuse.
+    with gr.Accordion("Model status", open=False):
+        status = gr.JSON(value=server_status)
+        gr.Button("Refresh").click(server_status, outputs=status, api_name="status")
+
+# Let concurrent chats reach the scheduler; beyond its batch and queue they wait in Gradio's queue.
+if scheduler is not None:
+    demo.queue(default_concurrency_limit=scheduler.max_batch + scheduler.max_queue)
+
 
 if __name__ == "__main__":
     demo.launch()
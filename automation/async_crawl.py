@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+
+class HostThrottle:
+    """Caps in-flight requests to one host and spaces their start times."""
+
+    def __init__(self, max_in_flight: int, delay: float) -> None:
+        self.semaphore = asyncio.Semaphore(max_in_flight)
+        self.delay = delay
+        self._next_start = 0.0
+        self._lock = asyncio.Lock()
+
+    async def __aenter__(self) -> "HostThrottle":
+        await self.semaphore.acquire()
+        loop = asyncio.get_running_loop()
+        async with self._lock:
+            now = loop.time()
+            start_at = max(now, self._next_start)
+            self._next_start = start_at + self.delay
+        if start_at > now:
+            await asyncio.sleep(start_at - now)
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        self.semaphore.release()
+
+
+class AsyncCrawlEngine:
+    """Crawl every configured site concurrently on top of a ThaiEnergyWebScraper.
+
+    Network I/O and parsing run in a thread pool sized to ``max_in_flight``;
+    deduplication and record registration happen afterwards on the event loop
+    in the same site/page order as the sequential crawl, so ``all_documents``
+    ends up identical to ``scrape_all_websites`` in sequential mode.
+    """
+
+    def __init__(self, scraper: Any, max_in_flight: int = 8, per_host_in_flight: int = 2, host_delay: float = 1.0) -> None:
+        self.scraper = scraper
+        self.max_in_flight = max(1, max_in_flight)
+        self.per_host_in_flight = max(1, per_host_in_flight)
+        self.host_delay = max(0.0, host_delay)
+        self._global: Optional[asyncio.Semaphore] = None
+        self._hosts: Dict[str, HostThrottle] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _throttle_for(self, url: str) -> HostThrottle:
+        host = urlparse(url).netloc.lower()
+        if host not in self._hosts:
+            # robots.txt has already been loaded for this host by the time a page is fetched.
+            delay = max(self.host_delay, self.scraper.robots.crawl_delay(url))
+            self._hosts[host] = HostThrottle(self.per_host_in_flight, delay)
+        return self._hosts[host]
+
+    async def fetch_page(self, url: str) -> Any:
+        assert self._global is not None
+        loop = asyncio.get_running_loop()
+        # Wait for the host's slot and politeness delay first: a global slot is only taken for the
+        # request itself, so one site queueing on its host limit cannot starve the other sites.
+        async with self._throttle_for(url):
+            async with self._global:
+                return await loop.run_in_executor(self._executor, self.scraper.fetch_page, url)
+
+    async def _fetch_page(self, url: str) -> Any:
+        try:
+            print(f"  Scraping: {url}")
+            return await self.fetch_page(url)
+        except Exception as exc:
+            print(f"[ERROR] Error scraping {url}: {exc}")
+            self.scraper.failed_pages.append(url)
+            return None
+
+    async def crawl_site(self, website_name: str, config: Dict[str, Any]) -> List[Tuple[str, List[Tuple[str, str, Dict[str, str]]]]]:
+        """Return ``(url, candidates)`` pairs for every page of a site fetched successfully, in crawl order.
+
+        The frontier is expanded one depth level at a time: the level's pages are
+        fetched concurrently, then parsed and expanded in frontier order.
+        """
+        print(f"\n  Starting deep scrape of {website_name}")
+        loop = asyncio.get_running_loop()
+        frontier = self.scraper.new_frontier(config)
+        pages: List[Tuple[str, List[Tuple[str, str, Dict[str, str]]]]] = []
+
+        while not frontier.exhausted():
+            allowed = []
+            for url, depth in frontier.pop_level():
+                if await loop.run_in_executor(self._executor, self.scraper.robots.can_fetch, url):
+                    allowed.append((url, depth))
+                else:
+                    print(f"  [SKIP] robots.txt disallows {url}")
+                    frontier.skip()
+
+            parsed = await asyncio.gather(*(self._fetch_page(url) for url, _ in allowed))
+            for (url, depth), page in zip(allowed, parsed):
+                if page is None:
+                    continue
+                pages.append((url, self.scraper.parse_documents(page, url, config)))
+                self.scraper.expand_frontier(frontier, page, url, depth, config)
+
+        print(f"  Crawled {frontier.pages_taken} pages of {website_name} ({len(frontier)} left in frontier)")
+        return pages
+
+    async def _run(self) -> List[Tuple[str, List[Tuple[str, List[Tuple[str, str, Dict[str, str]]]]]]]:
+        self._global = asyncio.Semaphore(self.max_in_flight)
+        self._hosts = {}
+        with ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix="crawl") as executor:
+            self._executor = executor
+            names = list(self.scraper.websites)
+            results = await asyncio.gather(
+                *(self.crawl_site(name, self.scraper.websites[name]) for name in names),
+                return_exceptions=True,
+            )
+        self._executor = None
+
+        site_pages = []
+        for name, result in zip(names, results):
+            if isinstance(result, BaseException):
+                print(f"[ERROR] Failed to process {name}: {result}")
+                result = []
+            site_pages.append((name, result))
+        return site_pages
+
+    def run(self) -> int:
+        """Crawl all sites and register their documents on the scraper, returning the number added."""
+        site_pages = asyncio.run(self._run())
+
+        total_docs = 0
+        for website_name, pages in site_pages:
+            site_docs = 0
+            for url, candidates in pages:
+                found = self.scraper.register_documents(candidates, url)
+                print(f"[OK] Found {found} relevant documents from {url}")
+                site_docs += found
+            total_docs += site_docs
+            print(f"[OK] {website_name}: Collected {site_docs} documents")
+        return total_docs
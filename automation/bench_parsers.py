@@ -0,0 +1,132 @@
+"""Benchmark the HTML parser backends on saved pages.
+
+    python -m automation.bench_parsers --save            # download the scraper's landing pages
+    python -m automation.bench_parsers --rounds 20       # compare every installed backend
+
+Each backend runs in its own interpreter so peak memory is not shared between
+them. Peak RSS is the growth of the process high-water mark while parsing
+(Unix only); the traced peak covers Python-level allocations only, which
+understates C parsers such as lxml and selectolax.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import subprocess
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - Windows
+    resource = None  # type: ignore
+
+from automation.html_parsing import BACKENDS
+
+DEFAULT_FIXTURES = Path("automation_artifacts/html_fixtures")
+
+
+def _max_rss_kb() -> Optional[int]:
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage // 1024 if sys.platform == "darwin" else usage
+
+
+def save_fixtures(directory: Path) -> None:
+    from thai_energy_scraper import ThaiEnergyWebScraper
+
+    directory.mkdir(parents=True, exist_ok=True)
+    scraper = ThaiEnergyWebScraper()
+    for name, config in scraper.websites.items():
+        try:
+            response = scraper.session.get(config["thai_url"], timeout=30)
+            response.raise_for_status()
+        except Exception as exc:
+            print(f"[WARN] Could not save {name}: {exc}")
+            continue
+        target = directory / f"{name}.html"
+        target.write_bytes(response.content)
+        print(f"[OK] Saved {target} ({len(response.content):,} bytes)")
+
+
+def run_worker(backend: str, fixtures: List[Path], rounds: int) -> Dict[str, object]:
+    parse = BACKENDS[backend]
+    pages = [path.read_bytes() for path in fixtures]
+    parse(pages[0])  # warm imports and caches
+
+    rss_before = _max_rss_kb()
+    anchors = 0
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for content in pages:
+            anchors += len(parse(content).anchors)
+    elapsed = time.perf_counter() - started
+    rss_after = _max_rss_kb()
+
+    # tracemalloc slows parsing down, so memory is traced on a separate pass.
+    tracemalloc.start()
+    for content in pages:
+        parse(content)
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    parsed = rounds * len(pages)
+    return {
+        "backend": backend,
+        "pages": parsed,
+        "anchors_per_page": anchors / parsed,
+        "seconds": elapsed,
+        "pages_per_sec": parsed / elapsed if elapsed else float("inf"),
+        "traced_peak_kb": traced_peak // 1024,
+        "rss_growth_kb": rss_after - rss_before if rss_before is not None and rss_after is not None else None,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare HTML parser backends on saved pages.")
+    parser.add_argument("--fixtures", type=Path, default=DEFAULT_FIXTURES, help="Directory of saved *.html pages")
+    parser.add_argument("--save", action="store_true", help="Download the scraper's landing pages into --fixtures first")
+    parser.add_argument("--rounds", type=int, default=10, help="Times each page is parsed per backend")
+    parser.add_argument("--backends", default=",".join(BACKENDS), help="Comma-separated backends to compare")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.save:
+        save_fixtures(args.fixtures)
+
+    fixtures = sorted(args.fixtures.glob("*.html"))
+    if not fixtures:
+        raise SystemExit(f"No *.html fixtures in {args.fixtures}; run with --save first.")
+
+    if args.worker:
+        print(json.dumps(run_worker(args.worker, fixtures, args.rounds)))
+        return
+
+    total_kb = sum(path.stat().st_size for path in fixtures) // 1024
+    print(f"{len(fixtures)} fixtures, {total_kb:,} KB, {args.rounds} rounds")
+    print(f"{'backend':<12} {'pages/sec':>10} {'anchors/page':>13} {'traced peak KB':>15} {'RSS growth KB':>14}")
+    for backend in [name.strip() for name in args.backends.split(",") if name.strip()]:
+        if backend not in BACKENDS:
+            print(f"{backend:<12} not installed")
+            continue
+        result = subprocess.run(
+            [sys.executable, "-m", "automation.bench_parsers", "--worker", backend,
+             "--fixtures", str(args.fixtures), "--rounds", str(args.rounds)],
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode != 0:
+            print(f"{backend:<12} failed: {result.stderr.strip().splitlines()[-1:]}")
+            continue
+        row = json.loads(result.stdout.strip().splitlines()[-1])
+        rss = row["rss_growth_kb"] if row["rss_growth_kb"] is not None else "n/a"
+        print(f"{backend:<12} {row['pages_per_sec']:>10.1f} {row['anchors_per_page']:>13.1f} {row['traced_peak_kb']:>15,} {rss:>14}")
+
+
+if __name__ == "__main__":
+    main()
@@ -31,6 +31,23 @@ class PipelineConfig:
     hf_training_method: str
     hf_training_timeout: int
     timezone: str
+    scrape_mode: str
+    scrape_max_in_flight: int
+    scrape_per_host_in_flight: int
+    scrape_host_delay: float
+    crawl_max_depth: int
+    crawl_max_pages: int
+    html_parser: str
+    host_rate: float
+    http_max_retries: int
+    http_pool_size: int
+    http_cache_dir: Optional[Path]
+    http_cache_max_mb: int
+    crawl_index_path: Optional[Path]
+    incremental: bool
+    extract_dir: Optional[Path]
+    extract_max_mb: int
+    extract_workers: Optional[int]
 
     @classmethod
     def from_env(cls) -> "PipelineConfig":
@@ -52,6 +69,15 @@ class PipelineConfig:
             if default_sa.exists():
                 service_account_path = default_sa
 
+        # An empty PEALLM_HTTP_CACHE_DIR / PEALLM_CRAWL_INDEX / PEALLM_EXTRACT_DIR disables
+        # the cache / crawl index / document text extraction.
+        cache_setting = env.get("PEALLM_HTTP_CACHE_DIR", ".peallm_cache/http").strip()
+        http_cache_dir = Path(cache_setting) if cache_setting else None
+        index_setting = env.get("PEALLM_CRAWL_INDEX", ".peallm_cache/crawl_index.sqlite").strip()
+        crawl_index_path = Path(index_setting) if index_setting else None
+        extract_setting = env.get("PEALLM_EXTRACT_DIR", ".peallm_cache/extracted").strip()
+        extract_dir = Path(extract_setting) if extract_setting else None
+
         timeout_value = _optional(env, "HF_TRAINING_TRIGGER_TIMEOUT")
         hf_timeout = int(timeout_value) if timeout_value else 60
 
@@ -73,4 +99,21 @@ class PipelineConfig:
             hf_training_method=_optional(env, "HF_TRAINING_TRIGGER_METHOD") or "POST",
             hf_training_timeout=hf_timeout,
             timezone=env.get("PEALLM_TIMEZONE", "Asia/Bangkok"),
+            scrape_mode=_optional(env, "PEALLM_SCRAPE_MODE") or "async",
+            scrape_max_in_flight=int(_optional(env, "PEALLM_SCRAPE_MAX_IN_FLIGHT") or 8),
+            scrape_per_host_in_flight=int(_optional(env, "PEALLM_SCRAPE_PER_HOST") or 2),
+            scrape_host_delay=float(_optional(env, "PEALLM_SCRAPE_HOST_DELAY") or 1.0),
+            crawl_max_depth=int(_optional(env, "PEALLM_CRAWL_MAX_DEPTH") or 2),
+            crawl_max_pages=int(_optional(env, "PEALLM_CRAWL_MAX_PAGES") or 50),
+            html_parser=_optional(env, "PEALLM_HTML_PARSER") or "auto",
+            host_rate=float(_optional(env, "PEALLM_HOST_RATE") or 2.0),
+            http_max_retries=int(_optional(env, "PEALLM_HTTP_MAX_RETRIES") or 4),
+            http_pool_size=int(_optional(env, "PEALLM_HTTP_POOL_SIZE") or 16),
+            http_cache_dir=http_cache_dir,
+            http_cache_max_mb=int(_optional(env, "PEALLM_HTTP_CACHE_MAX_MB") or 256),
+            crawl_index_path=crawl_index_path,
+            incremental=(_optional(env, "PEALLM_INCREMENTAL") or "1").lower() not in ("0", "false", "no"),
+            extract_dir=extract_dir,
+            extract_max_mb=int(_optional(env, "PEALLM_EXTRACT_MAX_MB") or 25),
+            extract_workers=int(_optional(env, "PEALLM_EXTRACT_WORKERS") or 0) or None,
         )
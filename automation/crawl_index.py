@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import sqlite3
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    url_hash BLOB PRIMARY KEY,
+    content_hash BLOB NOT NULL,
+    source TEXT NOT NULL,
+    url TEXT NOT NULL,
+    page TEXT,
+    first_seen TEXT NOT NULL,
+    last_seen TEXT NOT NULL,
+    removed_at TEXT
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS documents_source_seen ON documents (source, last_seen);
+"""
+PAGE_INDEX = "CREATE INDEX IF NOT EXISTS documents_page ON documents (page)"
+
+NEW = "new"
+CHANGED = "changed"
+UNCHANGED = "unchanged"
+
+
+class CrawlIndex:
+    """Persistent record of every document URL the scraper has emitted.
+
+    Hashes are the scraper's MD5 hex digests stored as 16-byte blobs. Each run
+    stamps ``last_seen`` on the URLs it encounters, along with the listing
+    ``page`` that linked to them. At the end of the run a live URL becomes a
+    tombstone only if its page was fetched this run and no longer links to it:
+    documents on pages that failed or fell outside the crawl budget are kept,
+    so a transient error does not show up downstream as a remove/re-add pair.
+    Rows recorded before pages were tracked have no page and are kept until
+    they are seen again.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.path))
+        self.conn.executescript(SCHEMA)
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(documents)")}
+        if "page" not in columns:
+            self.conn.execute("ALTER TABLE documents ADD COLUMN page TEXT")
+        self.conn.execute(PAGE_INDEX)
+        self.run_started: Optional[str] = None
+
+    def begin_run(self) -> str:
+        self.run_started = datetime.now(timezone.utc).isoformat(timespec="microseconds")
+        return self.run_started
+
+    def observe(self, url_hash: str, content_hash: str, source: str, url: str, page: Optional[str] = None) -> str:
+        """Record that ``url`` was seen this run, linked from ``page``, and return ``new``, ``changed`` or ``unchanged``."""
+        if self.run_started is None:
+            self.begin_run()
+        key = bytes.fromhex(url_hash)
+        digest = bytes.fromhex(content_hash)
+        row = self.conn.execute(
+            "SELECT content_hash, removed_at FROM documents WHERE url_hash = ?", (key,)
+        ).fetchone()
+
+        if row is None:
+            self.conn.execute(
+                "INSERT INTO documents (url_hash, content_hash, source, url, page, first_seen, last_seen) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, digest, source, url, page, self.run_started, self.run_started),
+            )
+            return NEW
+
+        previous_digest, removed_at = row
+        self.conn.execute(
+            "UPDATE documents SET content_hash = ?, source = ?, page = COALESCE(?, page), last_seen = ?, removed_at = NULL WHERE url_hash = ?",
+            (digest, source, page, self.run_started, key),
+        )
+        if removed_at is not None:
+            return NEW
+        return UNCHANGED if bytes(previous_digest) == digest else CHANGED
+
+    def finish_run(self, fetched_pages: Iterable[str]) -> List[Dict[str, str]]:
+        """Tombstone live documents not seen this run whose linking page was among ``fetched_pages``."""
+        pages = set(fetched_pages)
+        tombstones: List[Dict[str, str]] = []
+        if self.run_started is None or not pages:
+            self.conn.commit()
+            return tombstones
+
+        self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS fetched_pages (page TEXT PRIMARY KEY)")
+        self.conn.execute("DELETE FROM fetched_pages")
+        self.conn.executemany("INSERT INTO fetched_pages (page) VALUES (?)", [(page,) for page in pages])
+        rows = self.conn.execute(
+            "SELECT url_hash, content_hash, source, url, first_seen, last_seen FROM documents "
+            "WHERE removed_at IS NULL AND last_seen < ? AND page IN (SELECT page FROM fetched_pages)",
+            (self.run_started,),
+        ).fetchall()
+        for url_hash, content_hash, source, url, first_seen, last_seen in rows:
+            tombstones.append(
+                {
+                    "Document_URL": url,
+                    "Source": source,
+                    "Content_Hash": bytes(content_hash).hex(),
+                    "First_Seen": first_seen,
+                    "Last_Seen": last_seen,
+                    "Status": "Removed",
+                }
+            )
+        self.conn.executemany(
+            "UPDATE documents SET removed_at = ? WHERE url_hash = ?",
+            [(self.run_started, url_hash) for url_hash, *_ in rows],
+        )
+        self.conn.commit()
+        return tombstones
+
+    def counts(self) -> Dict[str, int]:
+        live, removed = self.conn.execute(
+            "SELECT SUM(removed_at IS NULL), SUM(removed_at IS NOT NULL) FROM documents"
+        ).fetchone()
+        return {"live": live or 0, "removed": removed or 0}
+
+    def close(self) -> None:
+        self.conn.commit()
+        self.conn.close()
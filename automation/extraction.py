@@ -0,0 +1,268 @@
+from __future__ import annotations
+
+import json
+import os
+import re
+import threading
+import time
+import zipfile
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlparse
+from xml.etree import ElementTree
+
+try:
+    from pypdf import PdfReader
+except Exception:  # pragma: no cover - optional dependency
+    PdfReader = None  # type: ignore
+
+# Only links whose path ends in one of these are downloaded; everything else is an HTML page.
+EXTRACTABLE_EXTENSIONS = {".pdf": "pdf", ".docx": "docx", ".xlsx": "xlsx"}
+
+WORD_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+SHEET_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+HTML_CONTENT_TYPES = ("text/html", "application/xhtml")
+
+BLANK_LINES_RE = re.compile(r"\n\s*\n+")
+
+
+def document_kind(url: str) -> Optional[str]:
+    """Return 'pdf', 'docx' or 'xlsx' for a downloadable document URL, else None."""
+    return EXTRACTABLE_EXTENSIONS.get(os.path.splitext(urlparse(url).path.lower())[1])
+
+
+def extract_pdf(path: Path) -> str:
+    if PdfReader is None:
+        raise RuntimeError("pypdf is not installed")
+    reader = PdfReader(str(path))
+    return "\n\n".join(page.extract_text() or "" for page in reader.pages)
+
+
+def extract_docx(path: Path) -> str:
+    paragraphs: List[str] = []
+    current: List[str] = []
+    with zipfile.ZipFile(path) as archive, archive.open("word/document.xml") as stream:
+        for event, element in ElementTree.iterparse(stream, events=("end",)):
+            if element.tag == WORD_NS + "t":
+                current.append(element.text or "")
+            elif element.tag == WORD_NS + "tab":
+                current.append("\t")
+            elif element.tag == WORD_NS + "p":
+                paragraphs.append("".join(current))
+                current = []
+                element.clear()
+    return "\n".join(paragraphs)
+
+
+def extract_xlsx(path: Path) -> str:
+    lines: List[str] = []
+    with zipfile.ZipFile(path) as archive:
+        shared: List[str] = []
+        if "xl/sharedStrings.xml" in archive.namelist():
+            with archive.open("xl/sharedStrings.xml") as stream:
+                for _, element in ElementTree.iterparse(stream, events=("end",)):
+                    if element.tag == SHEET_NS + "si":
+                        shared.append("".join(node.text or "" for node in element.iter(SHEET_NS + "t")))
+                        element.clear()
+        sheets = sorted(name for name in archive.namelist() if name.startswith("xl/worksheets/") and name.endswith(".xml"))
+        for name in sheets:
+            with archive.open(name) as stream:
+                for _, element in ElementTree.iterparse(stream, events=("end",)):
+                    if element.tag != SHEET_NS + "row":
+                        continue
+                    cells = []
+                    for cell in element.iter(SHEET_NS + "c"):
+                        kind = cell.get("t")
+                        if kind == "inlineStr":
+                            cells.append("".join(node.text or "" for node in cell.iter(SHEET_NS + "t")))
+                            continue
+                        value = cell.find(SHEET_NS + "v")
+                        if value is None or value.text is None:
+                            continue
+                        cells.append(shared[int(value.text)] if kind == "s" else value.text)
+                    if cells:
+                        lines.append("\t".join(cells))
+                    element.clear()
+    return "\n".join(lines)
+
+
+EXTRACTORS: Dict[str, Callable[[Path], str]] = {"pdf": extract_pdf, "docx": extract_docx, "xlsx": extract_xlsx}
+
+
+def extract_to_file(source: str, kind: str, target: str) -> int:
+    """Extract ``source`` into the UTF-8 text file ``target`` and return its length in characters.
+
+    Runs in a worker process; writing the text there keeps large strings out of the result pipe.
+    """
+    text = BLANK_LINES_RE.sub("\n\n", EXTRACTORS[kind](Path(source))).strip()
+    partial = Path(target + ".part")
+    partial.write_text(text, encoding="utf-8")
+    os.replace(partial, target)
+    return len(text)
+
+
+class DocumentTooLarge(Exception):
+    pass
+
+
+class DocumentExtractor:
+    """Download linked PDF/DOCX/XLSX files and extract their text outside the crawl loop.
+
+    Downloads are streamed to ``<directory>/downloads`` by a small thread pool and
+    abandoned once they exceed ``max_bytes``; each finished download is handed to a
+    process pool for extraction, so parsing overlaps with the remaining downloads.
+    Text is stored as ``<directory>/text/<Content_Hash>.txt`` and recorded in
+    ``manifest.json``; a record whose hash already has text is not downloaded again.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        session,
+        max_bytes: int = 25 * 1024 * 1024,
+        workers: Optional[int] = None,
+        download_workers: int = 4,
+        timeout: int = 60,
+        can_fetch: Optional[Callable[[str], bool]] = None,
+    ) -> None:
+        self.directory = Path(directory)
+        self.text_dir = self.directory / "text"
+        self.download_dir = self.directory / "downloads"
+        self.manifest_path = self.directory / "manifest.json"
+        self.session = session
+        self.max_bytes = max_bytes
+        self.workers = workers or os.cpu_count() or 1
+        self.download_workers = max(1, download_workers)
+        self.timeout = timeout
+        self.can_fetch = can_fetch
+        self._lock = threading.Lock()
+        self.stats = {"extracted": 0, "reused": 0, "too_large": 0, "failed": 0, "bytes_downloaded": 0}
+        self.manifest: Dict[str, Dict[str, object]] = {}
+        if self.manifest_path.exists():
+            try:
+                self.manifest = json.loads(self.manifest_path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                print(f"[WARN] Extraction manifest {self.manifest_path} unreadable; starting empty")
+
+    def text_path(self, content_hash: str) -> Path:
+        return self.text_dir / f"{content_hash}.txt"
+
+    def cached(self, content_hash: str) -> Optional[Dict[str, object]]:
+        entry = self.manifest.get(content_hash)
+        if entry is not None and self.text_path(content_hash).exists():
+            return entry
+        return None
+
+    def _download(self, url: str, content_hash: str, kind: str) -> Path:
+        target = self.download_dir / f"{content_hash}.{kind}"
+        with self.session.get(url, stream=True, timeout=self.timeout) as response:
+            response.raise_for_status()
+            content_type = response.headers.get("Content-Type", "").lower()
+            if content_type.startswith(HTML_CONTENT_TYPES):
+                raise ValueError(f"expected a {kind} file, got {content_type}")
+            declared = int(response.headers.get("Content-Length") or 0)
+            if declared > self.max_bytes:
+                raise DocumentTooLarge(f"{declared:,} bytes")
+            written = 0
+            with target.open("wb") as stream:
+                for chunk in response.iter_content(chunk_size=64 * 1024):
+                    written += len(chunk)
+                    if written > self.max_bytes:
+                        break
+                    stream.write(chunk)
+        with self._lock:
+            self.stats["bytes_downloaded"] += min(written, self.max_bytes)
+        if written > self.max_bytes:
+            target.unlink(missing_ok=True)
+            raise DocumentTooLarge(f"over {self.max_bytes:,} bytes")
+        return target
+
+    def _process_pool(self) -> Executor:
+        try:
+            return ProcessPoolExecutor(max_workers=self.workers)
+        except (OSError, NotImplementedError, ImportError) as exc:
+            print(f"[WARN] Process pool unavailable ({exc}); extracting in threads")
+            return ThreadPoolExecutor(max_workers=self.workers)
+
+    def extract(self, documents: Iterable[Dict[str, str]]) -> Dict[str, Dict[str, object]]:
+        """Extract text for every document link in ``documents``; return manifest entries by Content_Hash."""
+        pending: Dict[str, Tuple[str, str]] = {}
+        results: Dict[str, Dict[str, object]] = {}
+        unsupported = set()
+        for document in documents:
+            url, content_hash = document.get("Document_URL", ""), document.get("Content_Hash", "")
+            kind = document_kind(url)
+            if kind is None or not content_hash or content_hash in pending or content_hash in results:
+                continue
+            if kind == "pdf" and PdfReader is None:
+                unsupported.add(kind)
+                continue
+            entry = self.cached(content_hash)
+            if entry is not None:
+                results[content_hash] = entry
+                self.stats["reused"] += 1
+            elif self.can_fetch is not None and not self.can_fetch(url):
+                print(f"  [SKIP] robots.txt disallows {url}")
+            else:
+                pending[content_hash] = (url, kind)
+
+        if unsupported:
+            print("[WARN] pypdf is not installed; PDF links are not extracted")
+        if not pending:
+            return results
+
+        self.text_dir.mkdir(parents=True, exist_ok=True)
+        self.download_dir.mkdir(parents=True, exist_ok=True)
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.download_workers, thread_name_prefix="download") as downloads, \
+                self._process_pool() as extractors:
+            download_jobs = {
+                downloads.submit(self._download, url, content_hash, kind): content_hash
+                for content_hash, (url, kind) in pending.items()
+            }
+            extract_jobs: Dict[Future, Tuple[str, Path]] = {}
+            for job in as_completed(download_jobs):
+                content_hash = download_jobs[job]
+                url, kind = pending[content_hash]
+                try:
+                    source = job.result()
+                except DocumentTooLarge as exc:
+                    print(f"  [SKIP] {url}: {exc}")
+                    self.stats["too_large"] += 1
+                    continue
+                except Exception as exc:
+                    print(f"[WARN] Could not download {url}: {exc}")
+                    self.stats["failed"] += 1
+                    continue
+                target = self.text_path(content_hash)
+                extract_jobs[extractors.submit(extract_to_file, str(source), kind, str(target))] = (content_hash, source)
+
+            for job in as_completed(extract_jobs):
+                content_hash, source = extract_jobs[job]
+                url, kind = pending[content_hash]
+                source.unlink(missing_ok=True)
+                try:
+                    chars = job.result()
+                except Exception as exc:
+                    print(f"[WARN] Could not extract text from {url}: {exc}")
+                    self.stats["failed"] += 1
+                    continue
+                entry = {"url": url, "kind": kind, "chars": chars, "file": self.text_path(content_hash).name}
+                self.manifest[content_hash] = entry
+                results[content_hash] = entry
+                self.stats["extracted"] += 1
+
+        print(f"  Extracted {self.stats['extracted']} documents in {time.perf_counter() - started:.1f}s "
+              f"({self.stats['reused']} unchanged, {self.stats['too_large']} too large, {self.stats['failed']} failed)")
+        self.save()
+        return results
+
+    def save(self) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        partial = self.manifest_path.with_suffix(".json.part")
+        partial.write_text(json.dumps(self.manifest, ensure_ascii=False), encoding="utf-8")
+        os.replace(partial, self.manifest_path)
+
+    def summary(self) -> Dict[str, int]:
+        return dict(self.stats, stored=len(self.manifest))
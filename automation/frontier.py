@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import heapq
+import posixpath
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
+from urllib.robotparser import RobotFileParser
+
+TRACKING_PARAMS = {"fbclid", "gclid", "mc_cid", "mc_eid"}
+DEFAULT_PORTS = {"http": ":80", "https": ":443"}
+# Links ending in these are documents to record, not pages to crawl.
+DOCUMENT_EXTENSIONS = (".pdf", ".doc", ".docx", ".xls", ".xlsx", ".ppt", ".pptx", ".zip", ".rar", ".jpg", ".jpeg", ".png", ".gif", ".mp4")
+
+
+def normalize_url(url: str) -> str:
+    """Canonical form used for frontier dedup: lower-case scheme/host, no default
+    port, no fragment, resolved dot segments, tracking parameters removed and
+    the remaining query parameters sorted."""
+    parts = urlparse(url.strip())
+    scheme = parts.scheme.lower()
+    netloc = parts.netloc.lower()
+    if scheme in DEFAULT_PORTS and netloc.endswith(DEFAULT_PORTS[scheme]):
+        netloc = netloc[: -len(DEFAULT_PORTS[scheme])]
+
+    path = parts.path or "/"
+    while "//" in path:
+        path = path.replace("//", "/")
+    normalized_path = posixpath.normpath(path)
+    if path.endswith("/") and normalized_path != "/":
+        normalized_path += "/"
+
+    query = [
+        (key, value)
+        for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith("utm_") and key.lower() not in TRACKING_PARAMS
+    ]
+    return urlunparse((scheme, netloc, normalized_path, parts.params, urlencode(sorted(query)), ""))
+
+
+def is_crawlable(url: str, allowed_hosts: Iterable[str]) -> bool:
+    parts = urlparse(url)
+    if parts.scheme not in ("http", "https"):
+        return False
+    if parts.netloc.lower() not in allowed_hosts:
+        return False
+    return not parts.path.lower().endswith(DOCUMENT_EXTENSIONS)
+
+
+class RobotsCache:
+    """Fetch and parse each host's robots.txt once, then answer ``can_fetch`` from memory."""
+
+    def __init__(self, session: Any, user_agent: str, timeout: int = 10) -> None:
+        self.session = session
+        self.user_agent = user_agent
+        self.timeout = timeout
+        self._parsers: Dict[str, Optional[RobotFileParser]] = {}
+        self._lock = threading.Lock()
+        self._host_locks: Dict[str, threading.Lock] = {}
+
+    def _parser_for(self, url: str) -> Optional[RobotFileParser]:
+        parts = urlparse(url)
+        origin = f"{parts.scheme}://{parts.netloc.lower()}"
+        with self._lock:
+            host_lock = self._host_locks.setdefault(origin, threading.Lock())
+
+        with host_lock:
+            if origin in self._parsers:
+                return self._parsers[origin]
+            parser: Optional[RobotFileParser] = None
+            try:
+                response = self.session.get(f"{origin}/robots.txt", timeout=self.timeout)
+                if response.status_code < 400:
+                    parser = RobotFileParser()
+                    parser.parse(response.text.splitlines())
+            except Exception as exc:
+                print(f"[WARN] robots.txt unavailable for {origin}: {exc}")
+            # None means "no usable robots.txt": everything is allowed.
+            self._parsers[origin] = parser
+            return parser
+
+    def can_fetch(self, url: str) -> bool:
+        parser = self._parser_for(url)
+        return parser is None or parser.can_fetch(self.user_agent, url)
+
+    def crawl_delay(self, url: str) -> float:
+        parser = self._parser_for(url)
+        if parser is None:
+            return 0.0
+        delay = parser.crawl_delay(self.user_agent)
+        return float(delay) if delay else 0.0
+
+
+class CrawlFrontier:
+    """Breadth-first frontier for one site with a depth limit and a page budget.
+
+    Pages are expanded level by level; within a level the highest-scoring links
+    come first, ties broken by discovery order, so sequential and concurrent
+    crawls visit the same pages in the same order.
+    """
+
+    def __init__(self, max_depth: int, max_pages: int) -> None:
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.pages_taken = 0
+        self._heap: List[Tuple[int, float, int, str]] = []
+        self._seen: Set[str] = set()
+        self._counter = 0
+
+    def push(self, url: str, depth: int, score: float = 0.0) -> bool:
+        if depth > self.max_depth:
+            return False
+        key = normalize_url(url)
+        if key in self._seen:
+            return False
+        self._seen.add(key)
+        heapq.heappush(self._heap, (depth, -score, self._counter, key))
+        self._counter += 1
+        return True
+
+    def mark_seen(self, url: str) -> None:
+        self._seen.add(normalize_url(url))
+
+    def pop_level(self) -> List[Tuple[str, int]]:
+        """Take the next depth level's pages, highest score first, within the remaining budget."""
+        if not self._heap:
+            return []
+        depth = self._heap[0][0]
+        level: List[Tuple[str, int]] = []
+        while self._heap and self._heap[0][0] == depth and self.pages_taken < self.max_pages:
+            _, _, _, url = heapq.heappop(self._heap)
+            level.append((url, depth))
+            self.pages_taken += 1
+        return level
+
+    def skip(self) -> None:
+        """Give back budget for a page that was popped but not fetched (e.g. disallowed by robots.txt)."""
+        self.pages_taken -= 1
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def exhausted(self) -> bool:
+        return not self._heap or self.pages_taken >= self.max_pages
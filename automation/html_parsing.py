@@ -0,0 +1,207 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from bs4 import BeautifulSoup
+
+try:
+    import lxml.html as lxml_html
+except Exception:  # pragma: no cover - optional dependency
+    lxml_html = None  # type: ignore
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except Exception:  # pragma: no cover - optional dependency
+    LexborHTMLParser = None  # type: ignore
+
+# Equivalent of the scraper's nav selectors ('nav a', '.menu a', '.navigation a',
+# '.main-menu a', '.primary-menu a', 'header a', '.header a') as ancestor rules.
+NAV_TAGS = {"nav", "header"}
+NAV_CLASSES = {"menu", "navigation", "main-menu", "primary-menu", "header"}
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+
+CHARSET_RE = re.compile(rb"""<meta[^>]+charset=["']?([\w-]+)""", re.IGNORECASE)
+
+
+class Anchor(NamedTuple):
+    href: str
+    text: str
+    in_nav: bool
+
+
+@dataclass
+class ParsedPage:
+    """The parts of a page the scraper reads: every ``<a href>`` and the canonical URL."""
+
+    anchors: List[Anchor] = field(default_factory=list)
+    canonical: Optional[str] = None
+
+
+def decode_html(content: bytes) -> str:
+    """Decode a page using its declared charset, falling back to UTF-8 then Thai Windows-874."""
+    if isinstance(content, str):
+        return content
+    match = CHARSET_RE.search(content[:4096])
+    encodings = [match.group(1).decode("ascii")] if match else []
+    for encoding in encodings + ["utf-8", "cp874"]:
+        try:
+            return content.decode(encoding)
+        except (LookupError, UnicodeDecodeError):
+            continue
+    return content.decode("utf-8", errors="replace")
+
+
+def _is_nav(tag: str, classes: str) -> bool:
+    return tag in NAV_TAGS or bool(NAV_CLASSES.intersection(classes.split()))
+
+
+def parse_bs4(content: bytes, features: str = "html.parser") -> ParsedPage:
+    soup = BeautifulSoup(content, features)
+    page = ParsedPage()
+    for link in soup.find_all("a", href=True):
+        in_nav = any(_is_nav(parent.name or "", " ".join(parent.get("class") or [])) for parent in link.parents)
+        page.anchors.append(Anchor(link.get("href", ""), link.get_text(), in_nav))
+    canonical = soup.find("link", rel="canonical", href=True)
+    if canonical:
+        page.canonical = canonical["href"]
+    return page
+
+
+def parse_lxml(content: bytes) -> ParsedPage:
+    try:
+        root = lxml_html.fromstring(decode_html(content))
+    except ValueError:
+        # Documents with an XML encoding declaration must be parsed from bytes.
+        root = lxml_html.fromstring(content)
+    page = ParsedPage()
+    for link in root.iter("a"):
+        href = link.get("href")
+        if href is None:
+            continue
+        in_nav = any(_is_nav(str(parent.tag), parent.get("class") or "") for parent in link.iterancestors())
+        page.anchors.append(Anchor(href, link.text_content(), in_nav))
+    for link in root.iter("link"):
+        if "canonical" in (link.get("rel") or "").lower().split() and link.get("href"):
+            page.canonical = link.get("href")
+            break
+    return page
+
+
+def parse_selectolax(content: bytes) -> ParsedPage:
+    tree = LexborHTMLParser(decode_html(content))
+    page = ParsedPage()
+    for link in tree.css("a[href]"):
+        in_nav = False
+        parent = link.parent
+        while parent is not None:
+            if _is_nav(parent.tag or "", parent.attributes.get("class") or ""):
+                in_nav = True
+                break
+            parent = parent.parent
+        page.anchors.append(Anchor(link.attributes.get("href") or "", link.text(deep=True), in_nav))
+    for link in tree.css("link[rel][href]"):
+        if "canonical" in (link.attributes.get("rel") or "").lower().split():
+            page.canonical = link.attributes.get("href")
+            break
+    return page
+
+
+class _LinkStreamParser(HTMLParser):
+    """Event-driven extractor that keeps only an open-element stack, never a tree."""
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.page = ParsedPage()
+        self._stack: List[tuple] = []
+        self._nav_depth = 0
+        self._open_anchors: List[Dict[str, object]] = []
+
+    def handle_starttag(self, tag: str, attrs: list) -> None:
+        attributes = dict(attrs)
+        if tag == "link":
+            rel = (attributes.get("rel") or "").lower().split()
+            if "canonical" in rel and attributes.get("href") and self.page.canonical is None:
+                self.page.canonical = attributes["href"]
+            return
+        if tag in VOID_TAGS:
+            return
+        if tag == "a" and self._open_anchors:
+            # Anchors cannot nest; a new one implicitly closes the open one.
+            self.handle_endtag("a")
+        if tag == "a" and "href" in attributes:
+            self._open_anchors.append({"href": attributes.get("href") or "", "text": [], "in_nav": self._nav_depth > 0})
+            self._stack.append((tag, False, True))
+            return
+        is_nav = _is_nav(tag, attributes.get("class") or "")
+        self._nav_depth += is_nav
+        self._stack.append((tag, is_nav, False))
+
+    def handle_startendtag(self, tag: str, attrs: list) -> None:
+        if tag == "link":
+            self.handle_starttag(tag, attrs)
+
+    def handle_endtag(self, tag: str) -> None:
+        if not any(open_tag == tag for open_tag, _, _ in self._stack):
+            return
+        # Close everything up to the matching element, like an HTML tree builder would.
+        while self._stack:
+            open_tag, is_nav, is_anchor = self._stack.pop()
+            self._nav_depth -= is_nav
+            if is_anchor:
+                self._close_anchor()
+            if open_tag == tag:
+                break
+
+    def handle_data(self, data: str) -> None:
+        for anchor in self._open_anchors:
+            anchor["text"].append(data)  # type: ignore[union-attr]
+
+    def _close_anchor(self) -> None:
+        anchor = self._open_anchors.pop()
+        self.page.anchors.append(Anchor(anchor["href"], "".join(anchor["text"]), anchor["in_nav"]))  # type: ignore[arg-type]
+
+    def close(self) -> None:
+        super().close()
+        while self._open_anchors:
+            self._close_anchor()
+
+
+def parse_stream(content: bytes) -> ParsedPage:
+    parser = _LinkStreamParser()
+    parser.feed(decode_html(content))
+    parser.close()
+    return parser.page
+
+
+def _available_backends() -> Dict[str, Callable[[bytes], ParsedPage]]:
+    backends: Dict[str, Callable[[bytes], ParsedPage]] = {}
+    if LexborHTMLParser is not None:
+        backends["selectolax"] = parse_selectolax
+    if lxml_html is not None:
+        backends["lxml"] = parse_lxml
+        backends["bs4-lxml"] = lambda content: parse_bs4(content, "lxml")
+    backends["stream"] = parse_stream
+    backends["html.parser"] = parse_bs4
+    return backends
+
+
+BACKENDS = _available_backends()
+# Preference order for "auto": fastest tree builder available, pure Python last.
+AUTO_ORDER = ("selectolax", "lxml", "html.parser")
+
+
+def resolve_backend_name(name: str = "auto") -> str:
+    """Map ``name`` to an installed backend; unknown or unavailable backends fall back to html.parser."""
+    if name == "auto":
+        return next(candidate for candidate in AUTO_ORDER if candidate in BACKENDS)
+    if name not in BACKENDS:
+        print(f"[WARN] HTML parser backend '{name}' unavailable; using html.parser")
+        return "html.parser"
+    return name
+
+
+def get_parser(name: str = "auto") -> Callable[[bytes], ParsedPage]:
+    return BACKENDS[resolve_backend_name(name)]
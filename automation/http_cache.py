@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+
+class HttpCache:
+    """Persistent URL-keyed cache that revalidates with conditional GETs.
+
+    Bodies are stored one file per URL under ``directory``; validators and
+    bookkeeping live in ``index.json``. Responses without an ``ETag`` or
+    ``Last-Modified`` header are never stored because they cannot be
+    revalidated. When the stored bodies exceed ``max_bytes`` the least recently
+    used entries are evicted.
+    """
+
+    INDEX_NAME = "index.json"
+
+    def __init__(self, directory: Path, max_bytes: int = 256 * 1024 * 1024) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._index: Dict[str, Dict[str, Any]] = self._load_index()
+        self.stats: Dict[str, int] = {
+            "hits": 0,
+            "misses": 0,
+            "uncacheable": 0,
+            "evictions": 0,
+            "bytes_downloaded": 0,
+            "bytes_saved": 0,
+        }
+
+    def _load_index(self) -> Dict[str, Dict[str, Any]]:
+        index_path = self.directory / self.INDEX_NAME
+        if not index_path.exists():
+            return {}
+        try:
+            return json.loads(index_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            print(f"[WARN] HTTP cache index unreadable, starting empty: {index_path}")
+            return {}
+
+    def _body_path(self, url: str) -> Path:
+        return self.directory / (hashlib.sha256(url.encode("utf-8")).hexdigest() + ".body")
+
+    def _conditional_headers(self, entry: Optional[Dict[str, Any]]) -> Dict[str, str]:
+        headers: Dict[str, str] = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def fetch(self, session: Any, url: str, timeout: int = 15) -> bytes:
+        """GET ``url`` through ``session``, answering 304 responses from disk."""
+        with self._lock:
+            entry = self._index.get(url)
+        body_path = self._body_path(url)
+        if entry and not body_path.exists():
+            entry = None
+
+        response = session.get(url, headers=self._conditional_headers(entry), timeout=timeout)
+        if response.status_code == 304 and entry:
+            try:
+                content = body_path.read_bytes()
+            except OSError:
+                content = None
+            if content is not None:
+                with self._lock:
+                    entry["last_used"] = time.time()
+                    self.stats["hits"] += 1
+                    self.stats["bytes_saved"] += len(content)
+                return content
+            # The body vanished underneath us; fall back to an unconditional fetch.
+            response = session.get(url, timeout=timeout)
+
+        response.raise_for_status()
+        content = response.content
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+
+        with self._lock:
+            self.stats["bytes_downloaded"] += len(content)
+            if not (etag or last_modified):
+                self.stats["uncacheable"] += 1
+                self._drop(url)
+                return content
+            self.stats["misses"] += 1
+
+        tmp_path = body_path.with_suffix(".tmp")
+        tmp_path.write_bytes(content)
+        os.replace(tmp_path, body_path)
+        with self._lock:
+            self._index[url] = {
+                "etag": etag,
+                "last_modified": last_modified,
+                "size": len(content),
+                "stored_at": time.time(),
+                "last_used": time.time(),
+            }
+            self._evict()
+        return content
+
+    def _drop(self, url: str) -> None:
+        entry = self._index.pop(url, None)
+        if entry is not None:
+            try:
+                self._body_path(url).unlink()
+            except OSError:
+                pass
+
+    def _evict(self) -> None:
+        total = sum(entry.get("size", 0) for entry in self._index.values())
+        if total <= self.max_bytes:
+            return
+        for url, entry in sorted(self._index.items(), key=lambda item: item[1].get("last_used", 0)):
+            if total <= self.max_bytes:
+                break
+            total -= entry.get("size", 0)
+            self._drop(url)
+            self.stats["evictions"] += 1
+
+    def stored_bytes(self) -> int:
+        with self._lock:
+            return sum(entry.get("size", 0) for entry in self._index.values())
+
+    def summary(self) -> Dict[str, int]:
+        data = dict(self.stats)
+        data["entries"] = len(self._index)
+        data["stored_bytes"] = self.stored_bytes()
+        return data
+
+    def save(self) -> None:
+        """Persist the index; bodies are already on disk."""
+        with self._lock:
+            payload = json.dumps(self._index, ensure_ascii=False)
+        index_path = self.directory / self.INDEX_NAME
+        tmp_path = index_path.with_suffix(".tmp")
+        tmp_path.write_text(payload, encoding="utf-8")
+        os.replace(tmp_path, index_path)
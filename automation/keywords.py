@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import json
+import os
+import re
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Tuple
+
+DEFAULT_TABLES = Path(__file__).with_name("keyword_tables.json")
+
+
+class Classification(NamedTuple):
+    relevant: bool
+    document_type: str
+    priority: str
+    keyword_hits: int
+
+
+def _trie_pattern(words: Iterable[str]) -> str:
+    """Regex alternation shaped like a prefix trie, so each position fails after one character
+    instead of trying every keyword. Optional suffixes are greedy, so the longest keyword wins."""
+    trie: Dict[str, dict] = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: Dict[str, dict]) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return f"(?:{body})?" if "" in node else body
+
+    return build(trie)
+
+
+def load_keyword_tables(path: Optional[Path] = None) -> Dict[str, object]:
+    """Load classification tables from ``path``, ``PEALLM_KEYWORDS_FILE`` or the bundled defaults."""
+    source = Path(path or os.environ.get("PEALLM_KEYWORDS_FILE") or DEFAULT_TABLES)
+    return json.loads(source.read_text(encoding="utf-8"))
+
+
+class KeywordMatcher:
+    """One-pass keyword scanner for relevance, document type and priority.
+
+    Every keyword from the tables (plus any site keyword lists) is compiled into
+    a single trie-shaped alternation that prefers the longest keyword at each
+    position. Scanning resumes one character after each match start, so
+    overlapping keywords are still found, and keywords that are substrings of a
+    longer match (``แผน`` inside ``แผนแม่บท``) are implied. The result is exactly
+    the set of keywords contained in the text, the same answer the old
+    ``any(word in text ...)`` chains gave, from one scan.
+    """
+
+    def __init__(self, tables: Dict[str, object], extra_keywords: Iterable[str] = (), cache_size: int = 65536) -> None:
+        self.document_types: List[Tuple[str, FrozenSet[str]]] = [
+            (name, frozenset(word.lower() for word in words)) for name, words in tables["document_types"]  # type: ignore[union-attr]
+        ]
+        self.default_document_type = str(tables.get("default_document_type", "Document"))
+        self.priority_keywords: List[Tuple[str, FrozenSet[str]]] = [
+            (name, frozenset(word.lower() for word in words)) for name, words in tables["priority_keywords"]  # type: ignore[union-attr]
+        ]
+        self.type_priority: Dict[str, str] = dict(tables.get("type_priority", {}))  # type: ignore[arg-type]
+        self.default_priority = str(tables.get("default_priority", "Low"))
+
+        vocabulary = {word.lower() for word in extra_keywords if word}
+        for _, words in self.document_types + self.priority_keywords:
+            vocabulary.update(words)
+        self.vocabulary: FrozenSet[str] = frozenset(vocabulary)
+        self._implied = {word: frozenset(other for other in vocabulary if other in word) for word in vocabulary}
+
+        # For each keyword, the best (lowest) type and priority table rank among the
+        # keywords it implies; a rank equal to the table length means "no entry".
+        type_rank = self._ranks(self.document_types)
+        priority_rank = self._ranks(self.priority_keywords)
+        self._implied_ranks = {
+            word: (
+                min((type_rank.get(other, len(self.document_types)) for other in implied), default=len(self.document_types)),
+                min((priority_rank.get(other, len(self.priority_keywords)) for other in implied), default=len(self.priority_keywords)),
+            )
+            for word, implied in self._implied.items()
+        }
+
+        self._pattern = re.compile(_trie_pattern(vocabulary)) if vocabulary else None
+        self._scan = lru_cache(maxsize=cache_size)(self._scan_uncached)
+        # Anchor texts repeat on every page (menus, footers), so whole answers are cached too.
+        self.classify = lru_cache(maxsize=cache_size)(self._classify)  # type: ignore[method-assign]
+
+    @staticmethod
+    def _ranks(table: List[Tuple[str, FrozenSet[str]]]) -> Dict[str, int]:
+        ranks: Dict[str, int] = {}
+        for rank, (_, words) in enumerate(table):
+            for word in words:
+                ranks.setdefault(word, rank)
+        return ranks
+
+    def _scan_uncached(self, text: str) -> Tuple[FrozenSet[str], int, int]:
+        found: set = set()
+        type_rank, priority_rank = len(self.document_types), len(self.priority_keywords)
+        if text and self._pattern is not None:
+            text = text.lower()
+            search = self._pattern.search
+            hit = search(text)
+            while hit is not None:
+                word = hit.group()
+                found.update(self._implied[word])
+                word_type, word_priority = self._implied_ranks[word]
+                if word_type < type_rank:
+                    type_rank = word_type
+                if word_priority < priority_rank:
+                    priority_rank = word_priority
+                # Restart just after the match start so overlapping keywords are found too.
+                hit = search(text, hit.start() + 1)
+        return frozenset(found), type_rank, priority_rank
+
+    def match(self, text: str) -> FrozenSet[str]:
+        """Return every vocabulary keyword contained in ``text``."""
+        return self._scan(text)[0]
+
+    def covers(self, keywords: Iterable[str]) -> bool:
+        return all(word.lower() in self.vocabulary for word in keywords)
+
+    def document_type(self, matched: FrozenSet[str]) -> str:
+        for name, words in self.document_types:
+            if matched & words:
+                return name
+        return self.default_document_type
+
+    def priority(self, matched: FrozenSet[str], document_type: str) -> str:
+        for name, words in self.priority_keywords:
+            if matched & words:
+                return name
+        return self.type_priority.get(document_type, self.default_priority)
+
+    def _classify(self, text: str, site_keywords: FrozenSet[str] = frozenset()) -> Classification:
+        """Relevance to ``site_keywords`` (lower-cased), document type and priority from one scan."""
+        matched, type_rank, priority_rank = self._scan_uncached(text)
+        if type_rank < len(self.document_types):
+            document_type = self.document_types[type_rank][0]
+        else:
+            document_type = self.default_document_type
+        if priority_rank < len(self.priority_keywords):
+            priority = self.priority_keywords[priority_rank][0]
+        else:
+            priority = self.type_priority.get(document_type, self.default_priority)
+        hits = len(matched & site_keywords)
+        return Classification(hits > 0, document_type, priority, hits)
@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlparse
+
+from automation.html_parsing import get_parser, resolve_backend_name
+from automation.http_cache import HttpCache
+
+
+class PageFetcher:
+    """Fetch and parse each URL at most once per run.
+
+    Parsed pages (and fetch errors) are kept in a bounded LRU so the landing
+    page, its document links and its navigation menu are all read from the same
+    parse. ``parser`` selects an ``automation.html_parsing`` backend. Counters are kept per host so the run summary can show how many
+    network fetches and parses each site cost.
+    """
+
+    def __init__(
+        self,
+        session: Any,
+        timeout: int = 15,
+        max_pages: int = 256,
+        parser: str = "auto",
+        http_cache: Optional[HttpCache] = None,
+    ) -> None:
+        self.session = session
+        self.http_cache = http_cache
+        self.timeout = timeout
+        self.max_pages = max_pages
+        self.parser_name = resolve_backend_name(parser)
+        self.parse = get_parser(self.parser_name)
+        self._pages: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Per-URL lock and the number of callers using it; dropped when the last one leaves.
+        self._url_locks: Dict[str, List[Any]] = {}
+        self.stats: Dict[str, Dict[str, int]] = defaultdict(lambda: {"fetches": 0, "parses": 0, "reuses": 0, "errors": 0})
+
+    def _count(self, url: str, key: str) -> None:
+        with self._lock:
+            self.stats[urlparse(url).netloc.lower()][key] += 1
+
+    def _remember(self, url: str, value: Any) -> None:
+        with self._lock:
+            self._pages[url] = value
+            self._pages.move_to_end(url)
+            while len(self._pages) > self.max_pages:
+                self._pages.popitem(last=False)
+
+    def _lookup(self, url: str) -> Optional[Any]:
+        with self._lock:
+            if url not in self._pages:
+                return None
+            self._pages.move_to_end(url)
+            return self._pages[url]
+
+    def get(self, url: str) -> Any:
+        """Return the ParsedPage for ``url``, raising the original error if the fetch failed."""
+        with self._lock:
+            entry = self._url_locks.setdefault(url, [threading.Lock(), 0])
+            entry[1] += 1
+
+        try:
+            with entry[0]:
+                cached = self._lookup(url)
+                if cached is None:
+                    try:
+                        self._count(url, "fetches")
+                        content = self.download(url)
+                        self._count(url, "parses")
+                        cached = self.parse(content)
+                    except Exception as exc:
+                        self._count(url, "errors")
+                        cached = exc
+                    self._remember(url, cached)
+                else:
+                    self._count(url, "reuses")
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if entry[1] == 0 and self._url_locks.get(url) is entry:
+                    del self._url_locks[url]
+
+        if isinstance(cached, Exception):
+            raise cached
+        return cached
+
+    def download(self, url: str) -> bytes:
+        if self.http_cache is not None:
+            return self.http_cache.fetch(self.session, url, timeout=self.timeout)
+        response = self.session.get(url, timeout=self.timeout)
+        response.raise_for_status()
+        return response.content
+
+    def summary(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {host: dict(counts) for host, counts in sorted(self.stats.items())}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._pages.clear()
+            self._url_locks.clear()
+            self.stats.clear()
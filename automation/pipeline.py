@@ -30,10 +30,31 @@ def run_pipeline(timestamp: Optional[str] = None) -> Dict[str, Optional[str]]:
     cfg = PipelineConfig.from_env()
     ts = timestamp or datetime.utcnow().strftime("%Y%m%d-%H%M%S")
 
-    scraper = ThaiEnergyWebScraper()
+    scraper = ThaiEnergyWebScraper(
+        crawl_mode=cfg.scrape_mode,
+        max_in_flight=cfg.scrape_max_in_flight,
+        per_host_in_flight=cfg.scrape_per_host_in_flight,
+        host_delay=cfg.scrape_host_delay,
+        max_depth=cfg.crawl_max_depth,
+        max_pages=cfg.crawl_max_pages,
+        parser=cfg.html_parser,
+        host_rate=cfg.host_rate,
+        max_retries=cfg.http_max_retries,
+        pool_size=cfg.http_pool_size,
+        http_cache_dir=cfg.http_cache_dir,
+        http_cache_max_mb=cfg.http_cache_max_mb,
+        index_path=cfg.crawl_index_path,
+        extract_dir=cfg.extract_dir,
+        extract_max_mb=cfg.extract_max_mb,
+        extract_workers=cfg.extract_workers,
+        dataset_dir=cfg.raw_output_dir / f"thai_energy_dataset_{ts}",
+        keep_documents=False,
+    )
     total_docs = scraper.scrape_all_websites()
 
-    raw_records = scraper.all_documents
+    incremental = cfg.incremental and scraper.index is not None
+    raw_records = scraper.delta_documents if incremental else scraper.collected_documents()
+    has_changes = bool(raw_records or scraper.tombstones) if incremental else True
     raw_path = cfg.raw_output_dir / f"thai_energy_raw_{ts}.json"
     _write_json(raw_records, raw_path)
 
@@ -45,28 +66,41 @@ def run_pipeline(timestamp: Optional[str] = None) -> Dict[str, Optional[str]]:
     report_path = cfg.compliance_output_dir / f"pdpa_report_{ts}.csv"
     report_path.write_text(compliance_report, encoding="utf-8")
 
-    drive_client = GoogleDriveClient(
-        cfg.service_account_file,
-        cfg.google_client_id,
-        cfg.google_client_secret,
-        cfg.google_refresh_token,
-    )
-    raw_link = drive_client.upload_file(raw_path, cfg.drive_raw_folder_id)
-    processed_link = drive_client.upload_file(processed_path, cfg.drive_processed_folder_id, mime_type="application/json")
-    report_link = drive_client.upload_file(report_path, cfg.drive_compliance_folder_id, mime_type="text/csv")
+    tombstone_path = None
+    if incremental:
+        tombstone_path = cfg.processed_output_dir / f"thai_energy_tombstones_{ts}.json"
+        _write_json(scraper.tombstones, tombstone_path)
 
+    raw_link = processed_link = report_link = None
     hf_link = None
     repo_path = None
     training_response = None
-    try:
-        hf_sync = HFDatasetSync(cfg.hf_dataset_repo, cfg.hf_token)
-        repo_path = f"processed/{processed_path.name}"
-        hf_sync.upload_file(processed_path, repo_path=repo_path)
-        hf_link = f"https://huggingface.co/datasets/{cfg.hf_dataset_repo}/blob/main/{repo_path}"
-    except Exception as exc:  # pragma: no cover - network credentials required
-        print(f"[WARN] Hugging Face upload skipped: {exc}")
-
-    if cfg.hf_training_trigger_url:
+    if not has_changes:
+        print("[OK] No new, changed or removed documents since the last run; skipping upload and training.")
+    else:
+        drive_client = GoogleDriveClient(
+            cfg.service_account_file,
+            cfg.google_client_id,
+            cfg.google_client_secret,
+            cfg.google_refresh_token,
+        )
+        raw_link = drive_client.upload_file(raw_path, cfg.drive_raw_folder_id)
+        processed_link = drive_client.upload_file(processed_path, cfg.drive_processed_folder_id, mime_type="application/json")
+        report_link = drive_client.upload_file(report_path, cfg.drive_compliance_folder_id, mime_type="text/csv")
+        if tombstone_path is not None:
+            drive_client.upload_file(tombstone_path, cfg.drive_processed_folder_id)
+
+        try:
+            hf_sync = HFDatasetSync(cfg.hf_dataset_repo, cfg.hf_token)
+            repo_path = f"processed/{processed_path.name}"
+            hf_sync.upload_file(processed_path, repo_path=repo_path)
+            if tombstone_path is not None:
+                hf_sync.upload_file(tombstone_path, repo_path=f"tombstones/{tombstone_path.name}")
+            hf_link = f"https://huggingface.co/datasets/{cfg.hf_dataset_repo}/blob/main/{repo_path}"
+        except Exception as exc:  # pragma: no cover - network credentials required
+            print(f"[WARN] Hugging Face upload skipped: {exc}")
+
+    if cfg.hf_training_trigger_url and has_changes:
         try:
             training_response = trigger_training(
                 url=cfg.hf_training_trigger_url,
@@ -84,9 +118,16 @@ def run_pipeline(timestamp: Optional[str] = None) -> Dict[str, Optional[str]]:
     return {
         "timestamp": ts,
         "documents_collected": str(total_docs),
+        "documents_emitted": str(len(raw_records)),
+        "documents_removed": str(len(scraper.tombstones)),
+        "http_cache": json.dumps(scraper.http_cache.summary()) if scraper.http_cache is not None else None,
+        "transport": json.dumps(scraper.session.summary()),
+        "failed_pages": str(len(scraper.failed_pages)),
+        "document_extraction": json.dumps(scraper.extractor.summary()) if scraper.extractor is not None else None,
         "raw_file": str(raw_path),
         "processed_file": str(processed_path),
         "pdpa_report": str(report_path),
+        "tombstone_file": str(tombstone_path) if tombstone_path else None,
         "drive_raw_link": raw_link,
         "drive_processed_link": processed_link,
         "drive_report_link": report_link,
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+from urllib.parse import quote
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as pa_dataset
+    import pyarrow.parquet as pq
+except Exception:  # pragma: no cover - optional dependency
+    pa = None  # type: ignore
+
+# Columns of a scraped record, in the order the CSV exports have always used.
+COLUMNS = (
+    "Document_Title_Thai",
+    "Document_URL",
+    "Source",
+    "Collection_Date",
+    "Language",
+    "Document_Type",
+    "Priority",
+    "Status",
+    "Folder_Path",
+    "Content_Hash",
+)
+PARTITION_COLUMNS = ("Source", "Priority")
+# Arrival number of each record, so reads can return scrape order across partitions.
+ORDER_COLUMN = "_row"
+
+
+def available() -> bool:
+    return pa is not None
+
+
+class RecordDataset:
+    """Append-only Parquet dataset of scraped records, hive-partitioned by Source and Priority.
+
+    Records are buffered per partition and written as a new ``part-NNNNN.parquet``
+    file whenever a buffer reaches ``batch_size``, so memory stays bounded by
+    the number of partitions times the batch size rather than the crawl size.
+    Reads for one source or one priority only open that partition's files.
+    ``iter_batches`` returns records in the order they were appended.
+    """
+
+    def __init__(self, directory: Path, batch_size: int = 500) -> None:
+        if pa is None:
+            raise RuntimeError("pyarrow is required for RecordDataset")
+        self.directory = Path(directory)
+        self.batch_size = max(1, batch_size)
+        self.file_schema = pa.schema(
+            [(name, pa.string()) for name in COLUMNS if name not in PARTITION_COLUMNS] + [(ORDER_COLUMN, pa.int64())]
+        )
+        self.partitioning = pa_dataset.partitioning(
+            pa.schema([(name, pa.string()) for name in PARTITION_COLUMNS]), flavor="hive"
+        )
+        self._buffers: Dict[Tuple[str, str], List[Tuple[int, Dict[str, str]]]] = {}
+        self._parts: Counter = Counter()
+        self.counts: Counter = Counter()
+
+    def __len__(self) -> int:
+        return sum(self.counts.values())
+
+    def append(self, record: Dict[str, str]) -> None:
+        key = (str(record.get("Source", "")), str(record.get("Priority", "")))
+        buffer = self._buffers.setdefault(key, [])
+        buffer.append((len(self), record))
+        self.counts[key] += 1
+        if len(buffer) >= self.batch_size:
+            self._flush(key)
+
+    def _partition_dir(self, key: Tuple[str, str]) -> Path:
+        return self.directory.joinpath(*(f"{name}={quote(value, safe='')}" for name, value in zip(PARTITION_COLUMNS, key)))
+
+    def _flush(self, key: Tuple[str, str]) -> None:
+        rows = self._buffers.pop(key, [])
+        if not rows:
+            return
+        columns = {
+            name: [None if row.get(name) is None else str(row.get(name)) for _, row in rows]
+            for name in self.file_schema.names if name != ORDER_COLUMN
+        }
+        columns[ORDER_COLUMN] = [position for position, _ in rows]
+        target = self._partition_dir(key)
+        target.mkdir(parents=True, exist_ok=True)
+        pq.write_table(pa.table(columns, schema=self.file_schema), target / f"part-{self._parts[key]:05d}.parquet")
+        self._parts[key] += 1
+
+    def flush(self) -> None:
+        for key in list(self._buffers):
+            self._flush(key)
+
+    def sources(self) -> List[str]:
+        return sorted({source for source, _ in self.counts})
+
+    def _dataset(self):
+        self.flush()
+        return pa_dataset.dataset(self.directory, format="parquet", partitioning=self.partitioning)
+
+    def scanner(self, source: Optional[str] = None, priority: Optional[str] = None, columns: Sequence[str] = COLUMNS):
+        """Scanner over the records of one source and/or priority; other partitions are pruned, not read."""
+        expression = None
+        for name, value in zip(PARTITION_COLUMNS, (source, priority)):
+            if value is not None:
+                condition = pa_dataset.field(name) == value
+                expression = condition if expression is None else expression & condition
+        return self._dataset().scanner(columns=list(columns), filter=expression)
+
+    def iter_batches(self, source: Optional[str] = None, priority: Optional[str] = None, columns: Sequence[str] = COLUMNS) -> Iterator:
+        """Record batches of one source and/or priority in append order.
+
+        Restoring the order reads the selected partitions into one Arrow table
+        (columnar, far smaller than the equivalent dicts) before slicing it.
+        """
+        if not self.counts:
+            return iter(())
+        table = self.scanner(source, priority, list(columns) + [ORDER_COLUMN]).to_table()
+        return iter(table.sort_by(ORDER_COLUMN).select(list(columns)).to_batches(max_chunksize=self.batch_size))
+
+    def read(self, source: Optional[str] = None, priority: Optional[str] = None, columns: Sequence[str] = COLUMNS):
+        if not self.counts:
+            return pa.table({name: pa.array([], pa.string()) for name in columns})
+        return self.scanner(source, priority, columns).to_table()
+
+    def records(self) -> List[Dict[str, str]]:
+        return self.read().to_pylist()
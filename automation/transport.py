@@ -0,0 +1,212 @@
+from __future__ import annotations
+
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Statuses that mean the host is overloaded, as opposed to a broken page.
+OVERLOAD_STATUSES = {429, 503}
+RETRY_EXCEPTIONS = (requests.Timeout, requests.ConnectionError)
+
+
+class TokenBucket:
+    """Thread-safe token bucket: ``rate`` requests per second with bursts of up to ``burst``."""
+
+    def __init__(self, rate: float, burst: float = 1.0) -> None:
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Take one token, sleeping until it is available; return the seconds waited."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            # A negative balance reserves a future token; later callers queue behind it.
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+class HostLimiter:
+    """Token bucket for one host whose rate adapts to the host's behaviour.
+
+    The rate is halved (down to ``min_rate``) on 429/503 responses, timeouts, or
+    when the smoothed latency climbs past ``slow_factor`` times its baseline (the
+    best latency seen, reset after each slowdown); every healthy response adds
+    ``increase`` back, up to ``max_rate``.
+    """
+
+    def __init__(self, max_rate: float, burst: float, min_rate: float = 0.2, increase: float = 0.1, slow_factor: float = 3.0) -> None:
+        self.max_rate = max_rate
+        self.min_rate = min(min_rate, max_rate)
+        self.increase = increase
+        self.slow_factor = slow_factor
+        self.bucket = TokenBucket(max_rate, burst)
+        self.latency: Optional[float] = None
+        self.best_latency: Optional[float] = None
+        self._lock = threading.Lock()
+        self.stats = {
+            "requests": 0,
+            "retries": 0,
+            "rate_limited": 0,
+            "server_errors": 0,
+            "timeouts": 0,
+            "failures": 0,
+            "slowdowns": 0,
+            "throttle_wait_s": 0.0,
+        }
+
+    def acquire(self) -> None:
+        waited = self.bucket.acquire()
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["throttle_wait_s"] += waited
+
+    def _slow_down(self) -> None:
+        self.bucket.rate = max(self.min_rate, self.bucket.rate / 2)
+        self.stats["slowdowns"] += 1
+
+    def record(self, latency: Optional[float], status: Optional[int] = None, error: Optional[str] = None) -> None:
+        with self._lock:
+            if error == "timeout":
+                self.stats["timeouts"] += 1
+                self._slow_down()
+                return
+            if error is not None:
+                return
+            if status == 429:
+                self.stats["rate_limited"] += 1
+            elif status is not None and status >= 500:
+                self.stats["server_errors"] += 1
+            if status in OVERLOAD_STATUSES:
+                self._slow_down()
+                return
+            if status is not None and status >= 500:
+                return
+            if latency is None:
+                return
+            self.latency = latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+            self.best_latency = self.latency if self.best_latency is None else min(self.best_latency, self.latency)
+            if self.latency > self.slow_factor * self.best_latency:
+                self._slow_down()
+                # Slow down again only if latency keeps climbing from here.
+                self.best_latency = self.latency
+            else:
+                self.bucket.rate = min(self.max_rate, self.bucket.rate + self.increase)
+
+    def count(self, key: str) -> None:
+        with self._lock:
+            self.stats[key] += 1
+
+    def summary(self) -> Dict[str, object]:
+        with self._lock:
+            return dict(
+                self.stats,
+                throttle_wait_s=round(self.stats["throttle_wait_s"], 2),
+                rate=round(self.bucket.rate, 3),
+                latency_ms=round(self.latency * 1000) if self.latency is not None else None,
+            )
+
+
+def _retry_after(response: requests.Response) -> Optional[float]:
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class ThrottledSession(requests.Session):
+    """``requests.Session`` with per-host adaptive rate limits and retries.
+
+    Every request waits for its host's token bucket, then is retried on
+    429/5xx responses, timeouts and connection errors with exponential
+    backoff and full jitter (honouring ``Retry-After``). When retries run out
+    the last response is returned, or the last exception raised, so callers
+    keep using ``raise_for_status`` as before.
+    """
+
+    def __init__(
+        self,
+        host_rate: float = 2.0,
+        host_burst: float = 2.0,
+        max_retries: int = 4,
+        backoff_base: float = 0.5,
+        backoff_cap: float = 30.0,
+        pool_size: int = 16,
+    ) -> None:
+        super().__init__()
+        self.host_rate = host_rate
+        self.host_burst = host_burst
+        self.max_retries = max(0, max_retries)
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.mount("http://", adapter)
+        self.mount("https://", adapter)
+        self.hosts: Dict[str, HostLimiter] = {}
+        self._hosts_lock = threading.Lock()
+
+    def limiter(self, url: str) -> HostLimiter:
+        host = urlparse(url).netloc.lower()
+        with self._hosts_lock:
+            if host not in self.hosts:
+                self.hosts[host] = HostLimiter(self.host_rate, self.host_burst)
+            return self.hosts[host]
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        delay = random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.backoff_cap))
+        return delay
+
+    def request(self, method, url, *args, **kwargs):  # type: ignore[override]
+        limiter = self.limiter(url)
+        attempt = 0
+        while True:
+            limiter.acquire()
+            started = time.monotonic()
+            try:
+                response = super().request(method, url, *args, **kwargs)
+            except RETRY_EXCEPTIONS as exc:
+                limiter.record(None, error="timeout" if isinstance(exc, requests.Timeout) else "connection")
+                if attempt >= self.max_retries:
+                    limiter.count("failures")
+                    raise
+                delay = self.backoff(attempt)
+            else:
+                limiter.record(time.monotonic() - started, response.status_code)
+                if response.status_code not in RETRY_STATUSES:
+                    return response
+                if attempt >= self.max_retries:
+                    limiter.count("failures")
+                    return response
+                delay = self.backoff(attempt, _retry_after(response))
+                response.close()
+            attempt += 1
+            limiter.count("retries")
+            time.sleep(delay)
+
+    def summary(self) -> Dict[str, Dict[str, object]]:
+        with self._hosts_lock:
+            hosts = dict(self.hosts)
+        return {host: limiter.summary() for host, limiter in sorted(hosts.items())}
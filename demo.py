@@ -3,19 +3,30 @@ Thai Energy RAG System - Perfect for PEA Demo Tomorrow!
 Fetches content dynamically from URLs using your scraped metadata
 """
 
+import os
+from pathlib import Path
 import pandas as pd
 import gradio as gr
-import requests
 from bs4 import BeautifulSoup
 import numpy as np
 from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
 import re
 import json
 from typing import List, Dict, Tuple
 import time
 import logging
 
+from retrieval.chunking import chunk_spans
+from retrieval.content_fetcher import ContentFetcher
+from retrieval.embedding_store import EmbeddingStore
+from retrieval.filters import FilterIndex, detect_organizations
+from retrieval.hybrid import HybridRetriever
+from retrieval.lexical import load_or_sync
+from retrieval.query_cache import QueryCache, normalize_query
+from retrieval.vector_index import default_backend, load_or_build, normalize
+
+EMBEDDING_MODEL = 'sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2'
+
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -31,79 +42,165 @@ class ThaiEnergyRAG:
         
         # Initialize embedding model
         print("🤖 Loading multilingual embedding model...")
-        self.model = SentenceTransformer('sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2')
+        self.model = SentenceTransformer(EMBEDDING_MODEL)
+        self.embedding_store = EmbeddingStore(
+            EMBEDDING_MODEL, dtype=os.environ.get('PEALLM_EMBEDDING_DTYPE', 'float32'), name='metadata'
+        )
         
         # Prepare document metadata
         self.documents = self.prepare_documents()
         
         # Create embeddings
         print("🔄 Creating metadata embeddings...")
-        self.embeddings = self.model.encode(self.documents)
+        self.embeddings = self.embedding_store.encode(self.model, self.documents)
+        stats = self.embedding_store.stats
+        print(f"   Reused {stats['reused']}, encoded {stats['encoded']} ({stats['seconds']:.1f}s)")
+        self.index = load_or_build(
+            self.embeddings, self.embedding_store.directory / 'index', self.embedding_store.fingerprint,
+            backend=default_backend()
+        )
+        # BM25 catches exact terms (acronyms, regulation numbers) the embeddings miss
+        self.lexical = load_or_sync(self.embedding_store.hashes, self.documents, name=self.embedding_store.name)
+        self.retriever = HybridRetriever(self.index, self.lexical, self.embeddings)
+        
+        # Row sets per organization, type, priority and collection date, built once
+        def column(name: str) -> pd.Series:
+            return self.df[name] if name in self.df.columns else pd.Series('', index=self.df.index)
+        self.filters = FilterIndex(
+            {'org': column('Source'), 'type': column('Document_Type'), 'priority': column('Priority')},
+            dates=column('Collection_Date')
+        )
+        
+        # Repeated questions skip encoding and answering; entries die with the corpus version
+        self.embedding_cache = QueryCache(name='query embedding')
+        self.answer_cache = QueryCache(name='answer')
         
-        # Cache for fetched content
-        self.content_cache = {}
+        # Page text is fetched in parallel over one pooled session and kept in a persistent TTL cache;
+        # a chat turn waits at most PEALLM_FETCH_DEADLINE seconds for pages that are not cached yet
+        self.fetcher = ContentFetcher(self.extract_page_text, workers=int(os.environ.get('PEALLM_FETCH_WORKERS', '8')))
+        self.fetch_deadline = float(os.environ.get('PEALLM_FETCH_DEADLINE', '3'))
+        # Passages of fetched pages with their embeddings, LRU-bounded (PEALLM_PASSAGE_CACHE_SIZE, default 256 pages)
+        self.passage_cache = QueryCache(max_entries=int(os.environ.get('PEALLM_PASSAGE_CACHE_SIZE', '256')), name='passage')
+        
+        # Text the scraper extracted from linked PDF/DOCX/XLSX files, by URL
+        text_dir = Path(os.environ.get('PEALLM_EXTRACT_DIR', '.peallm_cache/extracted')) / 'text'
+        self.extracted_files = {}
+        if 'Text_File' in self.df.columns:
+            for url, name in zip(self.df['Document_URL'], self.df['Text_File']):
+                if isinstance(name, str) and name:
+                    self.extracted_files[url] = text_dir / name
+        
+        # Warm the page cache for the whole corpus in the background
+        if os.environ.get('PEALLM_PREFETCH', '1') != '0' and 'Document_URL' in self.df.columns:
+            urls = [url for url in self.df['Document_URL'].dropna().astype(str)
+                    if url.startswith('http') and url not in self.extracted_files]
+            self.fetcher.prefetch(urls)
         
         print("✅ Thai Energy RAG System Ready!")
         print("🎯 Perfect for PEA Demo Tomorrow!")
         print("=" * 60)
     
+    @property
+    def corpus_version(self) -> str:
+        return f"{self.index.name}:{self.embedding_store.fingerprint}"
+    
+    def encode_query(self, query: str) -> np.ndarray:
+        key = normalize_query(query)
+        vector = self.embedding_cache.get(key, self.corpus_version)
+        if vector is None:
+            vector = self.model.encode([query])[0]
+            self.embedding_cache.put(key, vector, self.corpus_version)
+        return vector
+    
     def prepare_documents(self) -> List[str]:
-        documents = []
-        for _, row in self.df.iterrows():
-            title = str(row.get('Document_Title_Thai', 'Unknown'))
-            source = str(row.get('Source', 'Unknown'))
-            doc_type = str(row.get('Document_Type', 'Document'))
-            doc_text = f"{source}: {title} ({doc_type})"
-            documents.append(doc_text)
-        return documents
+        def column(name: str, default: str) -> pd.Series:
+            if name not in self.df.columns:
+                return pd.Series(default, index=self.df.index)
+            return self.df[name].astype(str)
+        
+        documents = (
+            column('Source', 'Unknown') + ': ' + column('Document_Title_Thai', 'Unknown')
+            + ' (' + column('Document_Type', 'Document') + ')'
+        )
+        return documents.tolist()
     
-    def fetch_content_from_url(self, url: str) -> str:
-        if url in self.content_cache:
-            return self.content_cache[url]
+    def extract_page_text(self, response) -> str:
+        """Visible text of an HTML page; other content types (PDF etc.) yield no text."""
+        if 'text/html' not in response.headers.get('content-type', ''):
+            return ""
+        soup = BeautifulSoup(response.content, 'html.parser')
         
-        try:
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-            }
-            
-            response = requests.get(url, headers=headers, timeout=10)
-            response.raise_for_status()
-            
-            if 'text/html' in response.headers.get('content-type', ''):
-                soup = BeautifulSoup(response.content, 'html.parser')
-                
-                # Remove scripts and styles
-                for script in soup(["script", "style"]):
-                    script.decompose()
-                
-                text = soup.get_text()
-                lines = (line.strip() for line in text.splitlines())
-                chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-                text = ' '.join(chunk for chunk in chunks if chunk)
-                
-                if len(text) > 2000:
-                    text = text[:2000] + "..."
-                
-                self.content_cache[url] = text
-                return text
+        # Remove scripts and styles
+        for script in soup(["script", "style"]):
+            script.decompose()
+        
+        text = soup.get_text()
+        lines = (line.strip() for line in text.splitlines())
+        chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+        return ' '.join(chunk for chunk in chunks if chunk)
+    
+    def fetch_contents(self, urls: List[str]) -> Dict[str, str]:
+        """Text for each URL: scraper-extracted files first, the rest fetched concurrently.
+        
+        URLs whose fetch failed or missed the deadline map to None; late fetches still fill the cache.
+        """
+        contents = {}
+        remote = []
+        for url in urls:
+            extracted = self.extracted_files.get(url)
+            if extracted is not None and extracted.exists():
+                contents[url] = ' '.join(extracted.read_text(encoding='utf-8').split())
             else:
-                return "ไม่สามารถดึงข้อมูลจากไฟล์ PDF หรือเอกสารประเภทนี้ได้"
-                
-        except Exception as e:
-            logger.error(f"Error fetching {url}: {e}")
-            return f"ไม่สามารถดึงข้อมูลจาก URL นี้ได้"
+                remote.append(url)
+        if remote:
+            contents.update(self.fetcher.get_many(remote, deadline=self.fetch_deadline))
+        return contents
     
-    def search_documents(self, query: str, top_k: int = 3) -> List[Dict]:
-        query_embedding = self.model.encode([query])
-        similarities = cosine_similarity(query_embedding, self.embeddings)[0]
-        top_indices = np.argsort(similarities)[-top_k:][::-1]
+    def fetch_content_from_url(self, url: str) -> str:
+        content = self.fetch_contents([url]).get(url)
+        if content is None:
+            return "ไม่สามารถดึงข้อมูลจาก URL นี้ได้"
+        return content or "ไม่สามารถดึงข้อมูลจากไฟล์ PDF หรือเอกสารประเภทนี้ได้"
+    
+    def best_passage(self, url: str, text: str, query_vector: np.ndarray) -> str:
+        """The chunk of a fetched page closest to the question, instead of the page's first characters."""
+        # Keyed by the text too: a page re-fetched after its cache entry expired may have changed
+        key = (url, hash(text))
+        cached = self.passage_cache.get(key, EMBEDDING_MODEL)
+        if cached is None:
+            spans = chunk_spans(text)
+            vectors = normalize(self.model.encode([text[start:end] for start, end in spans])) if spans else None
+            cached = (spans, vectors)
+            self.passage_cache.put(key, cached, EMBEDDING_MODEL)
+        spans, vectors = cached
+        if not spans:
+            return text
+        start, end = spans[int(np.argmax(vectors @ normalize(query_vector)))]
+        return text[start:end]
+    
+    def search_documents(self, query: str, top_k: int = 3, query_vector=None, filters=None) -> List[Dict]:
+        """Hybrid search, optionally restricted by ``filters`` (org, doc_type, priority, since, until).
+        
+        Without an explicit org filter, organizations named in the question (PEA, กฟภ., กกพ. ...) become one.
+        """
+        if query_vector is None:
+            query_vector = self.encode_query(query)
+        spec = dict(filters or {})
+        allowed = None
+        detected = 'org' not in spec and detect_organizations(query)
+        if detected:
+            allowed = self.filters.select(org=detected, **spec)
+        if allowed is None or not len(allowed):
+            allowed = self.filters.select(**spec)
+        hits = self.retriever.search(query_vector, query, top_k, allowed)
         
         results = []
-        for idx in top_indices:
+        for hit in hits:
+            idx = hit.id
             row_data = self.df.iloc[idx]
             results.append({
                 'index': idx,
-                'similarity': similarities[idx],
+                'similarity': hit.similarity,
                 'title': row_data.get('Document_Title_Thai', 'Unknown'),
                 'source': row_data.get('Source', 'Unknown'),
                 'doc_type': row_data.get('Document_Type', 'Document'),
@@ -114,16 +211,34 @@ class ThaiEnergyRAG:
         return results
     
     def answer_question(self, question: str) -> str:
+        key = normalize_query(question)
+        answer = self.answer_cache.get(key, self.corpus_version)
+        if answer is None:
+            answer, complete = self.compose_answer(question)
+            # Answers missing a page that was still loading are not cached, so a retry picks it up
+            if complete:
+                self.answer_cache.put(key, answer, self.corpus_version)
+        return answer
+    
+    def compose_answer(self, question: str) -> Tuple[str, bool]:
+        """The answer text and whether every source page's content was available."""
         print(f"🔍 Processing question: {question}")
         
-        results = self.search_documents(question, top_k=3)
+        query_vector = self.encode_query(question)
+        results = self.search_documents(question, top_k=3, query_vector=query_vector)
         
         if not results or results[0]['similarity'] < 0.1:
-            return self.create_fallback_response(question)
+            return self.create_fallback_response(question), True
         
         response_parts = []
         response_parts.append("ตามข้อมูลจากฐานข้อมูลพลังงานไทย:\n")
         
+        # Fetch the sources of this answer at the same time rather than one after another
+        urls = [result['url'] for result in results[:2] if result['url'] and result['url'] != 'nan']
+        print(f"📡 Fetching content from: {', '.join(urls)}")
+        contents = self.fetch_contents(urls)
+        complete = True
+        
         for i, result in enumerate(results[:2], 1):
             title = result['title']
             source = result['source']
@@ -136,10 +251,11 @@ class ThaiEnergyRAG:
             response_parts.append(f"📝 ประเภท: {doc_type}")
             
             if url and url != 'nan':
-                print(f"📡 Fetching content from: {url}")
-                content = self.fetch_content_from_url(url)
+                content = contents.get(url)
+                complete = complete and content is not None
                 if content and len(content) > 50:
-                    response_parts.append(f"📖 ข้อมูล: {content[:300]}...")
+                    passage = self.best_passage(url, content, query_vector)
+                    response_parts.append(f"📖 ข้อมูล: {passage}...")
                 else:
                     response_parts.append("📖 ข้อมูล: ไม่สามารถดึงเนื้อหาได้ในขณะนี้")
             
@@ -148,15 +264,15 @@ class ThaiEnergyRAG:
         
         response_parts.append("\n💡 หมายเหตุ: ข้อมูลนี้ดึงมาจากเว็บไซต์ราชการโดยตรง")
         
-        return "\n".join(response_parts)
+        return "\n".join(response_parts), complete
     
     def create_fallback_response(self, question: str) -> str:
         question_lower = question.lower()
         
         if 'pea' in question_lower or 'การไฟฟ้าส่วนภูมิภาค' in question_lower:
-            pea_docs = self.df[self.df['Source'] == 'PEA']
-            if len(pea_docs) > 0:
-                sample_doc = pea_docs.iloc[0]
+            pea_rows = self.filters.rows('org', 'PEA')
+            if len(pea_rows) > 0:
+                sample_doc = self.df.iloc[pea_rows[0]]
                 return f"""🔍 ไม่พบข้อมูลที่ตรงกับคำถามโดยตรง แต่เรามีข้อมูลเกี่ยวกับ PEA:
 
 📄 ตัวอย่างเอกสาร: {sample_doc.get('Document_Title_Thai', 'Unknown')}
@@ -169,9 +285,9 @@ class ThaiEnergyRAG:
 - มาตรฐานการให้บริการของ PEA?"""
 
         elif 'mea' in question_lower or 'การไฟฟ้านครหลวง' in question_lower:
-            mea_docs = self.df[self.df['Source'] == 'MEA']
-            if len(mea_docs) > 0:
-                sample_doc = mea_docs.iloc[0]
+            mea_rows = self.filters.rows('org', 'MEA')
+            if len(mea_rows) > 0:
+                sample_doc = self.df.iloc[mea_rows[0]]
                 return f"""🔍 ไม่พบข้อมูลที่ตรงกับคำถามโดยตรง แต่เรามีข้อมูลเกี่ยวกับ MEA:
 
 📄 ตัวอย่างเอกสาร: {sample_doc.get('Document_Title_Thai', 'Unknown')}
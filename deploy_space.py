@@ -49,6 +49,17 @@ def deploy_space():
             else:
                 print(f"??  Warning: {local_file} not found, skipping")
         
+        # app.py imports the serving package
+        print("Uploading serving/ -> serving/")
+        api.upload_folder(
+            folder_path="serving",
+            path_in_repo="serving",
+            repo_id=space_id,
+            repo_type="space",
+            allow_patterns=["*.py"],
+            commit_message="Upload serving package"
+        )
+        
         print(f"??Successfully deployed PEAllm Space!")
         print(f"?? Visit your Space at: https://huggingface.co/spaces/{space_id}")
         
@@ -0,0 +1 @@
+"""Retrieval utilities for the Thai energy RAG systems."""
@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Generic, List, Optional, Sequence, Tuple, TypeVar
+
+Request = TypeVar("Request")
+Result = TypeVar("Result")
+
+
+class MicroBatcher(Generic[Request, Result]):
+    """Run concurrent single requests through one batch handler.
+
+    Callers block in ``__call__`` (or keep the ``Future`` from ``submit``). A
+    worker thread takes the first waiting request, collects whatever else
+    arrives within ``max_wait`` seconds (up to ``max_batch`` requests) and hands
+    the whole list to ``handler``, which must return one result per request in
+    the same order. An exception from the handler is raised in every caller of
+    that batch.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[List[Request]], Sequence[Result]],
+        max_batch: int = 32,
+        max_wait: float = 0.005,
+        name: str = "micro-batcher",
+    ) -> None:
+        self.handler = handler
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0.0, max_wait)
+        self.stats = {"batches": 0, "requests": 0, "largest": 0}
+        self._queue: "queue.Queue[Optional[Tuple[Request, Future]]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._name = name
+        self._worker: Optional[threading.Thread] = None
+
+    def _ensure_worker(self) -> None:
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name=self._name, daemon=True)
+                self._worker.start()
+
+    def submit(self, request: Request) -> "Future[Result]":
+        future: "Future[Result]" = Future()
+        self._ensure_worker()
+        self._queue.put((request, future))
+        return future
+
+    def __call__(self, request: Request, timeout: Optional[float] = None) -> Result:
+        return self.submit(request).result(timeout)
+
+    def _collect(self, first: Tuple[Request, Future]) -> Tuple[List[Tuple[Request, Future]], bool]:
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch, closing = self._collect(first)
+            live = [(request, future) for request, future in batch if future.set_running_or_notify_cancel()]
+            if live:
+                self.stats["batches"] += 1
+                self.stats["requests"] += len(live)
+                self.stats["largest"] = max(self.stats["largest"], len(live))
+                try:
+                    results = self.handler([request for request, _ in live])
+                except BaseException as exc:  # propagate to the waiting callers, keep serving
+                    for _, future in live:
+                        future.set_exception(exc)
+                else:
+                    for (_, future), result in zip(live, results):
+                        future.set_result(result)
+            if closing:
+                return
+
+    def close(self) -> None:
+        """Stop the worker once the requests already queued have been served."""
+        with self._lock:
+            if self._worker is not None and self._worker.is_alive():
+                self._queue.put(None)
+                self._worker.join()
+            self._worker = None
+
+    def summary(self) -> str:
+        batches = self.stats["batches"]
+        average = self.stats["requests"] / batches if batches else 0.0
+        return f"{self.stats['requests']} requests in {batches} batches (avg {average:.1f}, max {self.stats['largest']})"
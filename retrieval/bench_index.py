@@ -0,0 +1,130 @@
+"""Compare vector index backends: recall@k against exact search versus query latency.
+
+    python -m retrieval.bench_index --synthetic 200000                # clustered random vectors
+    python -m retrieval.bench_index --embeddings .peallm_cache/embeddings/<model>/embeddings.npy
+
+Queries are held-out rows perturbed with noise, so they resemble real
+questions landing near (but not on) stored documents. Each approximate
+backend is swept over its speed/recall knob (``nprobe`` for IVF, ``ef`` for
+HNSW, the exact re-rank depth for the quantized SQ8/PQ indexes, where
+``rerank=1`` is the raw quantized order); pick the cheapest setting that
+meets the recall a deployment needs. The memory column is the size of the
+arrays each index keeps resident.
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from retrieval.vector_index import BACKENDS, ExactIndex, HNSWIndex, IVFIndex, PQIndex, SQ8Index, VectorIndex, load_index
+
+
+def synthetic_vectors(count: int, dim: int, clusters: int = 256, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, count)
+    return centers[labels] + 0.6 * rng.standard_normal((count, dim)).astype(np.float32)
+
+
+def make_queries(vectors: np.ndarray, count: int, seed: int = 1) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    picks = np.asarray(vectors[rng.choice(len(vectors), count, replace=False)], dtype=np.float32)
+    scale = np.linalg.norm(picks, axis=1, keepdims=True) / np.sqrt(picks.shape[1])
+    return picks + 0.3 * scale * rng.standard_normal(picks.shape).astype(np.float32)
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    hits = sum(len(set(row[row >= 0]) & set(expected)) for row, expected in zip(found, truth))
+    return hits / truth.size
+
+
+def time_queries(index: VectorIndex, queries: np.ndarray, k: int) -> Tuple[np.ndarray, List[float]]:
+    latencies, results = [], []
+    for query in queries:
+        started = time.perf_counter()
+        _, ids = index.search(query, k)
+        latencies.append((time.perf_counter() - started) * 1000)
+        results.append(ids[0])
+    return np.array(results), latencies
+
+
+def configurations(backend: str, count: int) -> Iterator[Tuple[str, Optional[int]]]:
+    """Knob settings to sweep per backend: (label, value) pairs."""
+    if backend == "ivf":
+        nlist = max(1, int(4 * np.sqrt(count)))
+        for nprobe in sorted({1, 4, 8, 16, 32, 64}):
+            if nprobe <= nlist:
+                yield f"nprobe={nprobe}/{nlist}", nprobe
+    elif backend == "hnsw":
+        for ef in (16, 32, 64, 128, 256):
+            yield f"ef={ef}", ef
+    elif backend in ("sq8", "pq"):
+        for rerank in (1, 2, 4, 8, 16):
+            yield f"rerank={rerank}", rerank
+    else:
+        yield "", None
+
+
+def resident_mb(index: VectorIndex) -> float:
+    """Megabytes of the index's own arrays (memory-mapped originals used for re-ranking excluded)."""
+    names = ("vectors", "centroids", "ids", "offsets", "codes", "codebooks", "low", "scale")
+    return sum(getattr(index, name).nbytes for name in names if isinstance(getattr(index, name, None), np.ndarray)) / 2 ** 20
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Recall@k versus latency for the vector index backends.")
+    parser.add_argument("--embeddings", type=Path, help="Saved .npy matrix (e.g. from the embedding store)")
+    parser.add_argument("--synthetic", type=int, default=50000, help="Number of synthetic vectors when --embeddings is not given")
+    parser.add_argument("--dim", type=int, default=384, help="Dimension of synthetic vectors")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--backends", default=",".join(BACKENDS), help="Comma-separated backends to compare")
+    parser.add_argument("--save-dir", type=Path, help="Also time save/load round trips under this directory")
+    args = parser.parse_args()
+
+    if args.embeddings:
+        vectors = np.load(args.embeddings, mmap_mode="r")
+    else:
+        vectors = synthetic_vectors(args.synthetic, args.dim)
+    queries = make_queries(vectors, min(args.queries, len(vectors)))
+    print(f"{len(vectors):,} vectors x {vectors.shape[1]} dims, {len(queries)} queries, k={args.k}")
+
+    exact = ExactIndex(vectors)
+    _, truth = exact.search(queries, args.k)
+
+    print(f"{'backend':<8} {'setting':<16} {'build s':>8} {'MB':>7} {'recall@k':>9} {'p50 ms':>8} {'p95 ms':>8} {'qps':>8}")
+    for backend in [name.strip() for name in args.backends.split(",") if name.strip()]:
+        if backend not in BACKENDS:
+            print(f"{backend:<8} not installed")
+            continue
+        started = time.perf_counter()
+        index = exact if backend == "exact" else BACKENDS[backend](vectors)
+        build_seconds = 0.0 if backend == "exact" else time.perf_counter() - started
+        if args.save_dir:
+            started = time.perf_counter()
+            index.save(args.save_dir / backend)
+            saved = time.perf_counter() - started
+            started = time.perf_counter()
+            index = load_index(args.save_dir / backend)
+            index.attach(vectors)
+            print(f"{backend:<8} save {saved:.2f}s, load {time.perf_counter() - started:.2f}s")
+        for label, value in configurations(backend, len(vectors)):
+            if isinstance(index, IVFIndex):
+                index.nprobe = value
+            elif isinstance(index, HNSWIndex):
+                index.ef_search = value
+            elif isinstance(index, (SQ8Index, PQIndex)):
+                index.rerank = value
+            found, latencies = time_queries(index, queries, args.k)
+            p50, p95 = np.percentile(latencies, [50, 95])
+            qps = 1000 * len(latencies) / sum(latencies)
+            print(f"{backend:<8} {label:<16} {build_seconds:>8.2f} {resident_mb(index):>7.1f} {recall_at_k(found, truth):>9.3f} {p50:>8.2f} {p95:>8.2f} {qps:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import os
+import re
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from retrieval.lexical import THAI_RUN
+
+try:
+    from pythainlp.tokenize import sent_tokenize
+except Exception:  # pragma: no cover - optional dependency
+    sent_tokenize = None  # type: ignore
+
+DEFAULT_CHUNK_SIZE = 400
+DEFAULT_CHUNK_OVERLAP = 80
+
+# Thai marks sentence ends with a space rather than punctuation, so a space between
+# Thai characters is a boundary too; so are newlines and Latin sentence punctuation.
+BOUNDARY_RE = re.compile(rf"\n+|(?<=[.!?])\s+|(?<=[{THAI_RUN}])\s+(?=[{THAI_RUN}])|(?<=ฯลฯ)\s*")
+
+
+def sentence_spans(text: str) -> List[Tuple[int, int]]:
+    """(start, end) offsets of the sentences in ``text``, using pythainlp's CRF model when installed."""
+    spans: List[Tuple[int, int]] = []
+    if sent_tokenize is not None:
+        position = 0
+        for sentence in sent_tokenize(text, engine="crfcut"):
+            start = text.find(sentence, position)
+            if start < 0 or not sentence.strip():
+                continue
+            spans.append((start, start + len(sentence)))
+            position = start + len(sentence)
+        if spans:
+            return spans
+    start = 0
+    for match in BOUNDARY_RE.finditer(text):
+        if match.start() > start:
+            spans.append((start, match.start()))
+        start = max(start, match.end())
+    if start < len(text):
+        spans.append((start, len(text)))
+    return spans
+
+
+def _split_long(start: int, end: int, size: int, text: str) -> Iterator[Tuple[int, int]]:
+    """Cut an over-long sentence into ``size`` pieces, preferring to cut at whitespace."""
+    while end - start > size:
+        cut = text.rfind(" ", start + size // 2, start + size)
+        cut = cut if cut > start else start + size
+        yield start, cut
+        start = cut
+        while start < end and text[start] == " ":
+            start += 1
+    if end > start:
+        yield start, end
+
+
+def chunk_spans(text: str, size: int = DEFAULT_CHUNK_SIZE, overlap: int = DEFAULT_CHUNK_OVERLAP) -> List[Tuple[int, int]]:
+    """Pack whole sentences into chunks of at most ``size`` characters.
+
+    Consecutive chunks share roughly ``overlap`` characters: the next chunk
+    starts at the first sentence that begins within ``overlap`` of the previous
+    chunk's end. A sentence longer than ``size`` is cut on its own.
+    """
+    overlap = max(0, min(overlap, size // 2))
+    sentences = [piece for start, end in sentence_spans(text) for piece in _split_long(start, end, size, text)]
+    chunks: List[Tuple[int, int]] = []
+    first = 0
+    while first < len(sentences):
+        last = first
+        while last + 1 < len(sentences) and sentences[last + 1][1] - sentences[first][0] <= size:
+            last += 1
+        chunk = (sentences[first][0], sentences[last][1])
+        chunks.append(chunk)
+        if last + 1 >= len(sentences):
+            break
+        following = last + 1
+        while following - 1 > first and chunk[1] - sentences[following - 1][0] <= overlap:
+            following -= 1
+        first = following
+    return chunks
+
+
+class ChunkStore:
+    """Chunks of a corpus as flat arrays rather than one object per chunk.
+
+    Chunk ``i`` is ``texts[doc_ids[i]][starts[i]:ends[i]]``; the parent text is
+    shared, never copied. ``prefixes[doc]`` (organization, title, type) is
+    prepended when a chunk is embedded or indexed, so every chunk carries its
+    document's context.
+    """
+
+    def __init__(self, texts: Sequence[str], prefixes: Sequence[str], doc_ids: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> None:
+        self.texts = texts
+        self.prefixes = prefixes
+        self.doc_ids = doc_ids
+        self.starts = starts
+        self.ends = ends
+
+    @classmethod
+    def build(
+        cls,
+        texts: Sequence[str],
+        prefixes: Optional[Sequence[str]] = None,
+        size: Optional[int] = None,
+        overlap: Optional[int] = None,
+    ) -> "ChunkStore":
+        size = size or int(os.environ.get("PEALLM_CHUNK_SIZE") or DEFAULT_CHUNK_SIZE)
+        overlap = overlap if overlap is not None else int(os.environ.get("PEALLM_CHUNK_OVERLAP") or DEFAULT_CHUNK_OVERLAP)
+        prefixes = prefixes if prefixes is not None else [""] * len(texts)
+        doc_ids: List[int] = []
+        starts: List[int] = []
+        ends: List[int] = []
+        for doc, text in enumerate(texts):
+            # A document without body text is still one (prefix-only) chunk.
+            spans = chunk_spans(text, size, overlap) or [(0, 0)]
+            for start, end in spans:
+                doc_ids.append(doc)
+                starts.append(start)
+                ends.append(end)
+        return cls(
+            texts,
+            prefixes,
+            np.asarray(doc_ids, dtype=np.int32),
+            np.asarray(starts, dtype=np.int32),
+            np.asarray(ends, dtype=np.int32),
+        )
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    def text(self, chunk: int) -> str:
+        return self.texts[self.doc_ids[chunk]][self.starts[chunk]:self.ends[chunk]]
+
+    def indexed_text(self, chunk: int) -> str:
+        """The chunk with its document prefix: what gets embedded and BM25-indexed."""
+        prefix, body = self.prefixes[self.doc_ids[chunk]], self.text(chunk)
+        return f"{prefix}\n{body}" if prefix and body else prefix or body
+
+    def indexed_texts(self) -> List[str]:
+        """All chunks with prefixes, decoding each parent once (``texts`` may be a lazily decoded blob)."""
+        chunks: List[str] = []
+        current, parent, prefix = -1, "", ""
+        for doc, start, end in zip(self.doc_ids.tolist(), self.starts.tolist(), self.ends.tolist()):
+            if doc != current:
+                current, parent, prefix = doc, self.texts[doc], self.prefixes[doc]
+            body = parent[start:end]
+            chunks.append(f"{prefix}\n{body}" if prefix and body else prefix or body)
+        return chunks
+
+    def aggregate(self, chunk_ids: np.ndarray, scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Collapse ranked chunk hits to documents, keeping each document's best chunk.
+
+        Returns ``(doc_ids, best_chunk_ids, scores)`` for the top ``k`` documents, best first.
+        """
+        chunk_ids = np.asarray(chunk_ids, dtype=np.int64)
+        order = np.argsort(-np.asarray(scores), kind="stable")
+        ranked_chunks = chunk_ids[order]
+        ranked_docs = self.doc_ids[ranked_chunks]
+        _, first = np.unique(ranked_docs, return_index=True)
+        first = np.sort(first)[:k]
+        return ranked_docs[first], ranked_chunks[first], np.asarray(scores)[order][first]
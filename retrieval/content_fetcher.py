@@ -0,0 +1,264 @@
+from __future__ import annotations
+
+import atexit
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import requests
+
+from automation.transport import ThrottledSession
+
+DEFAULT_DIRECTORY = Path(".peallm_cache/content")
+DEFAULT_MAX_ENTRIES = 5000
+DEFAULT_TTL = 24 * 3600.0
+DEFAULT_SAVE_EVERY = 100
+DEFAULT_SAVE_INTERVAL = 30.0
+# Several government sites reject the default python-requests User-Agent.
+DEFAULT_HEADERS = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"}
+
+
+class ContentCache:
+    """Text extracted from web pages, kept on disk across restarts.
+
+    One ``<sha256(url)>.txt`` file per page plus ``index.json`` with store and
+    last-use times. Entries older than ``ttl`` seconds are treated as missing;
+    beyond ``max_entries`` the least recently used pages are evicted. An empty
+    string is a valid entry: the page was fetched but had no usable text.
+
+    Page files are written on ``put``; ``index.json`` is rewritten after
+    ``save_every`` puts or ``save_interval`` seconds, whichever comes first,
+    and on ``close`` (also run at interpreter exit). A crash loses at most
+    those index updates, and unindexed page files are simply fetched again.
+    """
+
+    INDEX_NAME = "index.json"
+
+    def __init__(
+        self,
+        directory: Optional[Path] = None,
+        max_entries: Optional[int] = None,
+        ttl: Optional[float] = None,
+        save_every: int = DEFAULT_SAVE_EVERY,
+        save_interval: float = DEFAULT_SAVE_INTERVAL,
+    ) -> None:
+        self.directory = Path(directory or os.environ.get("PEALLM_CONTENT_CACHE_DIR") or DEFAULT_DIRECTORY)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries if max_entries is not None else int(os.environ.get("PEALLM_CONTENT_CACHE_SIZE") or DEFAULT_MAX_ENTRIES)
+        self.ttl = ttl if ttl is not None else float(os.environ.get("PEALLM_CONTENT_CACHE_TTL") or DEFAULT_TTL)
+        self.save_every = max(1, save_every)
+        self.save_interval = save_interval
+        self._lock = threading.Lock()
+        self._index: Dict[str, Dict[str, float]] = self._load_index()
+        self._unsaved = 0
+        self._saved_at = time.monotonic()
+        self.stats: Dict[str, int] = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0, "index_saves": 0}
+        atexit.register(self.close)
+
+    def _load_index(self) -> Dict[str, Dict[str, float]]:
+        index_path = self.directory / self.INDEX_NAME
+        if not index_path.exists():
+            return {}
+        try:
+            return json.loads(index_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            print(f"[WARN] Content cache index unreadable, starting empty: {index_path}")
+            return {}
+
+    def _path(self, url: str) -> Path:
+        return self.directory / (hashlib.sha256(url.encode("utf-8")).hexdigest() + ".txt")
+
+    def fresh(self, url: str) -> bool:
+        with self._lock:
+            entry = self._index.get(url)
+            return entry is not None and time.time() - entry["stored_at"] <= self.ttl
+
+    def get(self, url: str) -> Optional[str]:
+        with self._lock:
+            entry = self._index.get(url)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            if time.time() - entry["stored_at"] > self.ttl:
+                self._drop(url)
+                self.stats["expired"] += 1
+                self.stats["misses"] += 1
+                return None
+            try:
+                text = self._path(url).read_text(encoding="utf-8")
+            except OSError:
+                self._index.pop(url, None)
+                self.stats["misses"] += 1
+                return None
+            entry["last_used"] = time.time()
+            self.stats["hits"] += 1
+            return text
+
+    def put(self, url: str, text: str) -> None:
+        path = self._path(url)
+        partial = path.with_suffix(".part")
+        partial.write_text(text, encoding="utf-8")
+        os.replace(partial, path)
+        with self._lock:
+            now = time.time()
+            self._index[url] = {"stored_at": now, "last_used": now}
+            self._evict()
+            self._unsaved += 1
+            due = self._unsaved >= self.save_every or time.monotonic() - self._saved_at >= self.save_interval
+        if due:
+            self.save()
+
+    def _drop(self, url: str) -> None:
+        if self._index.pop(url, None) is not None:
+            try:
+                self._path(url).unlink()
+            except OSError:
+                pass
+
+    def _evict(self) -> None:
+        overflow = len(self._index) - self.max_entries
+        if overflow <= 0:
+            return
+        for url, _ in sorted(self._index.items(), key=lambda item: item[1]["last_used"])[:overflow]:
+            self._drop(url)
+            self.stats["evictions"] += 1
+
+    def save(self) -> None:
+        with self._lock:
+            payload = json.dumps(self._index, ensure_ascii=False)
+            self._unsaved = 0
+            self._saved_at = time.monotonic()
+            self.stats["index_saves"] += 1
+        index_path = self.directory / self.INDEX_NAME
+        tmp_path = index_path.with_name(f"{self.INDEX_NAME}.{threading.get_ident()}.tmp")
+        tmp_path.write_text(payload, encoding="utf-8")
+        os.replace(tmp_path, index_path)
+
+    def close(self) -> None:
+        """Write ``index.json`` if any put since the last save is not in it yet."""
+        if self._unsaved:
+            self.save()
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+
+class ContentFetcher:
+    """Fetch page text concurrently over one pooled, rate-limited session.
+
+    ``extract`` turns a response into text (``""`` when the page has none).
+    ``get_many`` fetches a chat turn's URLs in parallel and returns whatever is
+    ready by the deadline; fetches still running finish in the background and
+    land in the cache for the next question. Concurrent requests for the same
+    URL share one download. ``prefetch`` warms the cache for a whole corpus on a
+    separate, smaller pool so it never takes workers from chat turns.
+    """
+
+    def __init__(
+        self,
+        extract: Callable[[requests.Response], str],
+        cache: Optional[ContentCache] = None,
+        session: Optional[requests.Session] = None,
+        workers: int = 8,
+        prefetch_workers: int = 2,
+        timeout: float = 10,
+    ) -> None:
+        self.extract = extract
+        self.cache = cache if cache is not None else ContentCache()
+        if session is None:
+            session = ThrottledSession(max_retries=1, pool_size=workers + prefetch_workers)
+            session.headers.update(DEFAULT_HEADERS)
+        self.session = session
+        self.timeout = timeout
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="content-fetch")
+        self._prefetch_pool = ThreadPoolExecutor(max_workers=prefetch_workers, thread_name_prefix="content-prefetch")
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, Future] = {}
+        self.stats: Dict[str, int] = {"fetched": 0, "errors": 0, "late": 0, "prefetched": 0}
+
+    def _download(self, url: str) -> str:
+        try:
+            response = self.session.get(url, timeout=self.timeout)
+            response.raise_for_status()
+            text = self.extract(response)
+        except Exception as exc:
+            self.stats["errors"] += 1
+            print(f"[WARN] Could not fetch {url}: {exc}")
+            raise
+        self.cache.put(url, text)
+        self.stats["fetched"] += 1
+        return text
+
+    def _submit(self, url: str, pool: ThreadPoolExecutor) -> Future:
+        with self._lock:
+            future = self._inflight.get(url)
+            if future is not None:
+                return future
+            future = pool.submit(self._download, url)
+            self._inflight[url] = future
+        # Outside the lock: the callback runs immediately if the download already finished.
+        future.add_done_callback(lambda _, url=url: self._forget(url))
+        return future
+
+    def _forget(self, url: str) -> None:
+        with self._lock:
+            self._inflight.pop(url, None)
+
+    def get(self, url: str) -> Optional[str]:
+        """Page text for ``url`` from the cache or the network; None when the fetch fails."""
+        return self.get_many([url]).get(url)
+
+    def get_many(self, urls: Iterable[str], deadline: Optional[float] = None) -> Dict[str, Optional[str]]:
+        """Text for each URL, fetching misses in parallel; None for failures and fetches not done within ``deadline`` seconds."""
+        results: Dict[str, Optional[str]] = {}
+        pending: Dict[str, Future] = {}
+        for url in dict.fromkeys(urls):
+            text = self.cache.get(url)
+            if text is not None:
+                results[url] = text
+            else:
+                pending[url] = self._submit(url, self._pool)
+        if pending:
+            wait(list(pending.values()), timeout=deadline)
+        for url, future in pending.items():
+            if not future.done():
+                self.stats["late"] += 1
+                results[url] = None
+            elif future.exception() is not None:
+                results[url] = None
+            else:
+                results[url] = future.result()
+        return results
+
+    def prefetch(self, urls: Iterable[str]) -> threading.Thread:
+        """Fill the cache for ``urls`` in the background, skipping pages that are still fresh."""
+
+        def run() -> None:
+            todo: List[str] = [url for url in dict.fromkeys(urls) if not self.cache.fresh(url)]
+            futures = [self._submit(url, self._prefetch_pool) for url in todo]
+            wait(futures)
+            done = sum(1 for future in futures if future.exception() is None)
+            self.stats["prefetched"] += done
+            self.cache.close()
+            print(f"[OK] Prefetched {done}/{len(todo)} pages into {self.cache.directory}")
+
+        thread = threading.Thread(target=run, name="content-prefetcher", daemon=True)
+        thread.start()
+        return thread
+
+    def close(self) -> None:
+        """Stop accepting fetches, wait for running ones and save the cache index."""
+        self._pool.shutdown(wait=True)
+        self._prefetch_pool.shutdown(wait=True)
+        self.cache.close()
+
+    def summary(self) -> Dict[str, Any]:
+        data: Dict[str, Any] = dict(self.stats)
+        data.update({f"cache_{key}": value for key, value in self.cache.stats.items()})
+        data["cached_pages"] = len(self.cache)
+        return data
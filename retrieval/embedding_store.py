@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+DEFAULT_DIRECTORY = Path(".peallm_cache/embeddings")
+
+
+def document_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def _slug(model_name: str) -> str:
+    return re.sub(r"[^\w.-]+", "__", model_name)
+
+
+class EmbeddingStore:
+    """Embeddings kept on disk between runs, one ``.npy`` matrix per corpus and model.
+
+    ``<directory>/<name>/<model>/embeddings.npy`` holds one row per document and
+    ``manifest.json`` the document hash of each row, so a restart only encodes
+    texts whose hash is not stored yet. An unchanged corpus is returned
+    straight from ``np.load(mmap_mode='r')`` without copying; otherwise a new
+    matrix is written row by row and swapped in. Rows of documents that left
+    the corpus are dropped at that point, and switching between float32 and
+    float16 converts the stored rows instead of re-encoding them.
+
+    ``name`` separates corpora that share ``directory`` (e.g. the demo's
+    metadata strings and the full RAG's chunks), so alternating between them
+    does not drop and re-encode each other's rows.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        directory: Optional[Path] = None,
+        dtype: str = "float32",
+        batch_size: int = 64,
+        name: str = "default",
+    ) -> None:
+        if dtype not in ("float32", "float16"):
+            raise ValueError(f"Unsupported embedding dtype {dtype!r}; use float32 or float16")
+        self.model_name = model_name
+        self.dtype = np.dtype(dtype)
+        self.batch_size = batch_size
+        self.name = name
+        self.directory = Path(directory or os.environ.get("PEALLM_EMBEDDING_DIR") or DEFAULT_DIRECTORY) / _slug(name) / _slug(model_name)
+        self.matrix_path = self.directory / "embeddings.npy"
+        self.manifest_path = self.directory / "manifest.json"
+        self.stats = {"reused": 0, "encoded": 0, "seconds": 0.0}
+        self.fingerprint = ""
+        self.hashes: List[str] = []
+
+    def _load(self):
+        if not (self.matrix_path.exists() and self.manifest_path.exists()):
+            return None, []
+        try:
+            manifest = json.loads(self.manifest_path.read_text(encoding="utf-8"))
+            matrix = np.load(self.matrix_path, mmap_mode="r")
+        except (OSError, ValueError) as exc:
+            print(f"[WARN] Embedding store {self.directory} unreadable ({exc}); re-encoding")
+            return None, []
+        hashes = manifest.get("hashes", [])
+        if manifest.get("model") != self.model_name or len(hashes) != len(matrix):
+            return None, []
+        return matrix, hashes
+
+    def encode(self, model: Any, texts: Sequence[str], **encode_kwargs: Any) -> np.ndarray:
+        """Return an (n, dim) read-only matrix of embeddings for ``texts``, encoding only unseen ones."""
+        started = time.perf_counter()
+        hashes = self.hashes = [document_hash(text) for text in texts]
+        # Identifies this exact sequence of rows, e.g. for indexes built on top of the matrix.
+        self.fingerprint = hashlib.sha1("\n".join([self.model_name, self.dtype.name] + hashes).encode("utf-8")).hexdigest()
+        stored, stored_hashes = self._load()
+        if stored is not None and stored_hashes == hashes and stored.dtype == self.dtype:
+            self.stats.update(reused=len(hashes), encoded=0, seconds=time.perf_counter() - started)
+            return stored
+
+        row_of: Dict[str, int] = {value: row for row, value in enumerate(stored_hashes)}
+        missing: List[int] = []
+        seen = set()
+        for position, value in enumerate(hashes):
+            if value not in row_of and value not in seen:
+                missing.append(position)
+                seen.add(value)
+
+        encoded: Dict[str, np.ndarray] = {}
+        if missing:
+            vectors = model.encode([texts[position] for position in missing], batch_size=self.batch_size, **encode_kwargs)
+            encoded = {hashes[position]: vector for position, vector in zip(missing, np.asarray(vectors, dtype=self.dtype))}
+
+        if stored is not None:
+            dim = stored.shape[1]
+        elif encoded:
+            dim = len(next(iter(encoded.values())))
+        else:
+            dim = 0
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        partial = self.directory / f"embeddings.{os.getpid()}.npy.part"
+        matrix = np.lib.format.open_memmap(partial, mode="w+", dtype=self.dtype, shape=(len(hashes), dim))
+        for row, value in enumerate(hashes):
+            matrix[row] = encoded[value] if value in encoded else stored[row_of[value]]
+        matrix.flush()
+        del matrix, stored
+        manifest = {"model": self.model_name, "dtype": self.dtype.name, "dim": dim, "hashes": hashes}
+        manifest_partial = self.directory / f"manifest.{os.getpid()}.json.part"
+        manifest_partial.write_text(json.dumps(manifest), encoding="utf-8")
+        os.replace(partial, self.matrix_path)
+        os.replace(manifest_partial, self.manifest_path)
+
+        self.stats.update(reused=len(hashes) - len(missing), encoded=len(missing), seconds=time.perf_counter() - started)
+        return np.load(self.matrix_path, mmap_mode="r")
+
+    def summary(self) -> Dict[str, object]:
+        return dict(self.stats, seconds=round(self.stats["seconds"], 2), model=self.model_name, name=self.name, directory=str(self.directory))
@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import re
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+from retrieval.lexical import THAI_ABBREVIATION_DOT_RE
+
+# Canonical organization -> the ways a question names it. Organization values in the
+# data vary by export ("PEA", "ERC_Energy_Regulatory_Commission", "การไฟฟ้านครหลวง (MEA)"),
+# so a value belongs to an organization when it contains the key or any alias.
+ORGANIZATION_ALIASES: Dict[str, List[str]] = {
+    "PEA": ["pea", "กฟภ", "การไฟฟ้าส่วนภูมิภาค"],
+    "MEA": ["mea", "กฟน", "การไฟฟ้านครหลวง"],
+    "EGAT": ["egat", "กฟผ", "การไฟฟ้าฝ่ายผลิต"],
+    "ERC": ["erc", "กกพ", "คณะกรรมการกำกับกิจการพลังงาน"],
+    # The scraper files EPPO's site under the NEPC source it publishes for.
+    "EPPO": ["eppo", "สนพ", "สำนักงานนโยบายและแผนพลังงาน", "nepc_national_energy_policy_council"],
+    "NEPC": ["nepc", "กพช", "คณะกรรมการนโยบายพลังงานแห่งชาติ"],
+    "Ministry_of_Energy": ["ministry of energy", "moen", "กระทรวงพลังงาน"],
+}
+
+_LATIN_ALIAS = re.compile(r"[a-z ]+")
+_ORGANIZATION_PATTERNS = {
+    org: re.compile(
+        # Latin acronyms must stand alone ("pea" not in "speaker") but may touch Thai text ("ของMEA").
+        "|".join(rf"(?<![a-z]){re.escape(alias)}(?![a-z])" if _LATIN_ALIAS.fullmatch(alias) else re.escape(alias) for alias in aliases)
+    )
+    for org, aliases in ORGANIZATION_ALIASES.items()
+}
+
+Values = Union[str, Iterable[str]]
+
+
+def detect_organizations(query: str) -> List[str]:
+    """Organizations named in ``query`` by acronym or Thai name, e.g. "กกพ." -> ["ERC"]."""
+    text = THAI_ABBREVIATION_DOT_RE.sub("", query.lower())
+    return [org for org, pattern in _ORGANIZATION_PATTERNS.items() if pattern.search(text)]
+
+
+def _as_list(values: Values) -> List[str]:
+    return [values] if isinstance(values, str) else list(values)
+
+
+class FilterIndex:
+    """Row sets for metadata filters, computed once when the corpus is loaded.
+
+    Each field is dictionary-encoded and its rows are stored grouped by value in
+    CSR form (rows with value ``v`` are ``rows[offsets[v]:offsets[v+1]]``, sorted),
+    so a filter costs a few slices and set intersections instead of a scan over
+    the table. Dates are kept sorted for range lookups with ``searchsorted``.
+    Row ids are positions in the searched matrix (documents or chunks).
+    """
+
+    def __init__(self, fields: Mapping[str, Sequence], dates: Optional[Sequence] = None) -> None:
+        self.fields: Dict[str, Dict[str, np.ndarray]] = {}
+        for field, values in fields.items():
+            labels = pd.Series(values, dtype=object).fillna("").astype(str).to_numpy()
+            categories, codes = np.unique(labels, return_inverse=True)
+            self.fields[field] = {
+                "categories": categories,
+                "offsets": np.concatenate([[0], np.cumsum(np.bincount(codes, minlength=len(categories)))]).astype(np.int64),
+                "rows": np.argsort(codes, kind="stable").astype(np.int64),
+            }
+        self.date_rows = self.date_values = None
+        if dates is not None:
+            parsed = pd.to_datetime(pd.Series(dates, dtype=object), errors="coerce").to_numpy(dtype="datetime64[D]")
+            valid = np.flatnonzero(~np.isnat(parsed))
+            order = np.argsort(parsed[valid], kind="stable")
+            self.date_rows = valid[order]
+            self.date_values = parsed[valid][order]
+
+    def categories(self, field: str) -> np.ndarray:
+        return self.fields[field]["categories"]
+
+    def _rows_for(self, field: str, matches: np.ndarray) -> np.ndarray:
+        column = self.fields[field]
+        parts = [column["rows"][column["offsets"][code]:column["offsets"][code + 1]] for code in np.flatnonzero(matches)]
+        return np.unique(np.concatenate(parts)) if parts else np.zeros(0, dtype=np.int64)
+
+    def rows(self, field: str, values: Values) -> np.ndarray:
+        """Rows whose ``field`` equals any of ``values`` (case-insensitive)."""
+        wanted = {value.lower() for value in _as_list(values)}
+        return self._rows_for(field, np.array([category.lower() in wanted for category in self.categories(field)], dtype=bool))
+
+    def organization_rows(self, organizations: Values, field: str = "org") -> np.ndarray:
+        """Rows of the named organizations, matching values that contain the organization's key or aliases."""
+        needles: List[str] = []
+        for name in _as_list(organizations):
+            canonical = next((org for org in ORGANIZATION_ALIASES if org.lower() == name.lower()), None)
+            needles.extend([canonical.lower(), *ORGANIZATION_ALIASES[canonical]] if canonical else [name.lower()])
+        lowered = [category.lower() for category in self.categories(field)]
+        return self._rows_for(field, np.array([any(needle in category for needle in needles) for category in lowered], dtype=bool))
+
+    def date_range(self, since: Optional[object] = None, until: Optional[object] = None) -> np.ndarray:
+        """Rows dated within ``[since, until]`` (either end open); undated rows never match."""
+        if self.date_rows is None:
+            return np.zeros(0, dtype=np.int64)
+        start = 0 if since is None else np.searchsorted(self.date_values, np.datetime64(pd.Timestamp(since).date()), side="left")
+        end = len(self.date_values) if until is None else np.searchsorted(self.date_values, np.datetime64(pd.Timestamp(until).date()), side="right")
+        return np.sort(self.date_rows[start:end])
+
+    def select(
+        self,
+        org: Optional[Values] = None,
+        doc_type: Optional[Values] = None,
+        priority: Optional[Values] = None,
+        since: Optional[object] = None,
+        until: Optional[object] = None,
+    ) -> Optional[np.ndarray]:
+        """Sorted row ids passing every given filter, or None when no filter is given."""
+        selections: List[np.ndarray] = []
+        if org is not None:
+            selections.append(self.organization_rows(org))
+        if doc_type is not None:
+            selections.append(self.rows("type", doc_type))
+        if priority is not None:
+            selections.append(self.rows("priority", priority))
+        if since is not None or until is not None:
+            selections.append(self.date_range(since, until))
+        if not selections:
+            return None
+        selected = min(selections, key=len)
+        for other in selections:
+            if other is not selected:
+                selected = np.intersect1d(selected, other, assume_unique=True)
+        return selected
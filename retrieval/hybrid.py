@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from retrieval.lexical import BM25Index
+from retrieval.vector_index import VectorIndex, normalize, top_k
+
+
+class Hit(NamedTuple):
+    id: int
+    score: float  # fused rank score, only meaningful for ordering
+    similarity: float  # cosine similarity between query and document
+    bm25: float
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[int]], k: int = 60, weights: Optional[Sequence[float]] = None) -> Dict[int, float]:
+    """Fuse ranked id lists: each list adds ``weight / (k + rank)`` for every id it contains."""
+    fused: Dict[int, float] = {}
+    for ranking, weight in zip(rankings, weights or [1.0] * len(rankings)):
+        for rank, doc_id in enumerate(ranking, start=1):
+            fused[int(doc_id)] = fused.get(int(doc_id), 0.0) + weight / (k + rank)
+    return fused
+
+
+class HybridRetriever:
+    """Dense vector search and BM25 fused with reciprocal rank fusion.
+
+    Each side contributes its top ``candidates`` documents. Once the corpus
+    reaches ``prefilter_min_docs`` and BM25 finds enough matches, the dense side
+    only scores the BM25 candidates instead of searching the whole index, so
+    the cheap lexical pass bounds the cost of dense scoring.
+
+    A query may be restricted to ``allowed`` row ids (a metadata filter). Up to
+    ``filter_scan_limit`` rows, the dense side scores exactly those rows and
+    nothing else; larger selections search the index over-fetched in
+    proportion to the selection and drop rows outside it.
+    """
+
+    def __init__(
+        self,
+        index: VectorIndex,
+        lexical: BM25Index,
+        embeddings: np.ndarray,
+        candidates: int = 50,
+        rrf_k: int = 60,
+        prefilter_min_docs: Optional[int] = 200_000,
+        prefilter_candidates: int = 2000,
+        filter_scan_limit: int = 50_000,
+    ) -> None:
+        self.index = index
+        self.lexical = lexical
+        self.embeddings = embeddings
+        self.candidates = candidates
+        self.rrf_k = rrf_k
+        self.prefilter_min_docs = prefilter_min_docs
+        self.prefilter_candidates = prefilter_candidates
+        self.filter_scan_limit = filter_scan_limit
+
+    def _similarities(self, query: np.ndarray, ids: np.ndarray) -> np.ndarray:
+        if not len(ids):
+            return np.zeros(0, dtype=np.float32)
+        return normalize(self.embeddings[ids]) @ query
+
+    def _fuse(self, query: np.ndarray, dense: Tuple[np.ndarray, np.ndarray], lexical: Tuple[np.ndarray, np.ndarray], k: int) -> List[Hit]:
+        dense_scores, dense_ids = dense
+        bm25_scores, bm25_ids = lexical
+        fused = reciprocal_rank_fusion([dense_ids, bm25_ids], k=self.rrf_k)
+        ranked = sorted(fused.items(), key=lambda item: -item[1])[:k]
+        similarity = dict(zip(dense_ids.tolist(), dense_scores.tolist()))
+        missing = np.array([doc_id for doc_id, _ in ranked if doc_id not in similarity], dtype=np.int64)
+        similarity.update(zip(missing.tolist(), self._similarities(query, missing).tolist()))
+        bm25 = dict(zip(bm25_ids.tolist(), bm25_scores.tolist()))
+        return [Hit(doc_id, score, float(similarity[doc_id]), float(bm25.get(doc_id, 0.0))) for doc_id, score in ranked]
+
+    def _filtered_dense(self, query: np.ndarray, allowed: np.ndarray, depth: int) -> Tuple[np.ndarray, np.ndarray]:
+        if len(allowed) <= self.filter_scan_limit:
+            best, order = top_k(self._similarities(query, allowed), depth)
+            return best, allowed[order]
+        fetch = min(len(self.embeddings), int(np.ceil(2 * depth * len(self.embeddings) / len(allowed))))
+        scores, ids = self.index.search(query, fetch)
+        keep = (ids[0] >= 0) & np.isin(ids[0], allowed)
+        return scores[0][keep][:depth], ids[0][keep][:depth]
+
+    def search_batch(
+        self,
+        query_vectors: np.ndarray,
+        query_texts: Sequence[str],
+        k: int,
+        allowed: Optional[Sequence[Optional[np.ndarray]]] = None,
+    ) -> List[List[Hit]]:
+        """Search several queries at once: the dense side scores all unfiltered ones in one index call.
+
+        ``allowed[i]`` optionally restricts query ``i`` to those sorted row ids.
+        """
+        queries = normalize(np.atleast_2d(query_vectors))
+        allowed = list(allowed) if allowed is not None else [None] * len(queries)
+        depth = max(k, self.candidates)
+        prefilter = self.prefilter_min_docs is not None and len(self.lexical) >= self.prefilter_min_docs
+        lexical = [
+            self.lexical.search(text, self.prefilter_candidates if prefilter else depth, candidates=rows)
+            for text, rows in zip(query_texts, allowed)
+        ]
+
+        dense: List[Tuple[np.ndarray, np.ndarray]] = [(np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.int64))] * len(queries)
+        full_rows = []
+        for row, (bm25_scores, bm25_ids) in enumerate(lexical):
+            if allowed[row] is not None:
+                dense[row] = self._filtered_dense(queries[row], np.asarray(allowed[row], dtype=np.int64), depth)
+                lexical[row] = (bm25_scores[:depth], bm25_ids[:depth])
+            elif prefilter and len(bm25_ids) >= depth:
+                best, order = top_k(self._similarities(queries[row], bm25_ids), depth)
+                dense[row] = (best, bm25_ids[order])
+                lexical[row] = (bm25_scores[:depth], bm25_ids[:depth])
+            else:
+                full_rows.append(row)
+        if full_rows:
+            scores, ids = self.index.search(queries[full_rows], depth)
+            for row, row_scores, row_ids in zip(full_rows, scores, ids):
+                keep = row_ids >= 0
+                dense[row] = (row_scores[keep], row_ids[keep])
+
+        return [self._fuse(query, dense[row], lexical[row], k) for row, query in enumerate(queries)]
+
+    def search(self, query_vector: np.ndarray, query_text: str, k: int, allowed: Optional[np.ndarray] = None) -> List[Hit]:
+        return self.search_batch(np.asarray(query_vector).reshape(1, -1), [query_text], k, [allowed])[0]
@@ -0,0 +1,207 @@
+from __future__ import annotations
+
+import json
+import math
+import os
+import re
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from retrieval.snapshot import current, publish
+from retrieval.vector_index import top_k
+
+try:
+    from pythainlp.tokenize import word_tokenize
+except Exception:  # pragma: no cover - optional dependency
+    word_tokenize = None  # type: ignore
+
+DEFAULT_DIRECTORY = Path(".peallm_cache/lexical")
+
+THAI_RUN = "\u0e00-\u0e7f"
+# Latin words, numbers and codes such as "12/2565" or "tou-2" stay whole; Thai runs are segmented.
+TOKEN_RE = re.compile(rf"[a-z0-9]+(?:[./-][a-z0-9]+)*|[{THAI_RUN}]+")
+# Dots inside Thai abbreviations: "กกพ." and "ก.ก.พ." both index as "กกพ".
+THAI_ABBREVIATION_DOT_RE = re.compile(rf"(?<=[{THAI_RUN}])\.")
+THAI_SPACING_MARKS = re.compile("[\u0e46\u0e2f]")  # ๆ and ฯ carry no lexical content
+
+
+def tokenizer_name() -> str:
+    return "newmm" if word_tokenize is not None else "bigram"
+
+
+def _segment_thai(run: str) -> List[str]:
+    if word_tokenize is not None:
+        return [word for word in word_tokenize(run, engine="newmm", keep_whitespace=False) if word.strip()]
+    # Without a segmenter, overlapping character bigrams still match words inside unsegmented text.
+    if len(run) < 3:
+        return [run]
+    return [run[i:i + 2] for i in range(len(run) - 1)]
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased index terms for ``text``, with Thai runs split into words (or bigrams)."""
+    text = THAI_SPACING_MARKS.sub(" ", THAI_ABBREVIATION_DOT_RE.sub("", text.lower()))
+    tokens: List[str] = []
+    for match in TOKEN_RE.finditer(text):
+        token = match.group()
+        if "\u0e00" <= token[0] <= "\u0e7f":
+            tokens.extend(_segment_thai(token))
+        else:
+            tokens.append(token)
+    return tokens
+
+
+class BM25Index:
+    """Okapi BM25 over a corpus identified by document hashes.
+
+    Postings are held in CSR form: the documents containing term ``t`` are
+    ``docs[offsets[t]:offsets[t+1]]`` with matching term frequencies in
+    ``tfs``. Document ids are row positions in the corpus most recently passed
+    to ``sync``, so they line up with the embedding matrix. On disk the index is
+    a few flat ``uint32``/``uint16`` arrays loaded with ``mmap_mode='r'``.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75) -> None:
+        self.k1 = k1
+        self.b = b
+        self.tokenizer = tokenizer_name()
+        self.vocab: Dict[str, int] = {}
+        self.hashes: List[str] = []
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.docs = np.zeros(0, dtype=np.uint32)
+        self.tfs = np.zeros(0, dtype=np.uint16)
+        self.doc_len = np.zeros(0, dtype=np.uint32)
+        self.stats = {"kept": 0, "tokenized": 0, "removed": 0}
+
+    def __len__(self) -> int:
+        return len(self.hashes)
+
+    def sync(self, hashes: Sequence[str], texts: Sequence[str]) -> bool:
+        """Make the index cover exactly ``hashes`` (in that order), tokenizing only unseen documents.
+
+        Existing postings are renumbered with one vectorized remap, so the cost of an
+        update is proportional to the new documents plus a linear pass over the arrays.
+        Returns whether anything changed.
+        """
+        hashes = list(hashes)
+        if hashes == self.hashes:
+            self.stats.update(kept=len(hashes), tokenized=0, removed=0)
+            return False
+
+        position = {value: row for row, value in enumerate(hashes)}
+        remap = np.array([position.get(value, -1) for value in self.hashes], dtype=np.int64)
+        old_terms = np.repeat(np.arange(len(self.offsets) - 1, dtype=np.int64), np.diff(self.offsets))
+        old_docs = remap[self.docs.astype(np.int64)] if len(self.docs) else np.zeros(0, dtype=np.int64)
+        keep = old_docs >= 0
+
+        doc_len = np.zeros(len(hashes), dtype=np.uint32)
+        kept_rows = remap[remap >= 0]
+        doc_len[kept_rows] = np.asarray(self.doc_len)[remap >= 0]
+
+        known = set(kept_rows.tolist())
+        new_terms: List[int] = []
+        new_docs: List[int] = []
+        new_tfs: List[int] = []
+        tokenized = 0
+        for row, text in enumerate(texts):
+            if row in known:
+                continue
+            counts = Counter(tokenize(text))
+            doc_len[row] = sum(counts.values())
+            for term, tf in counts.items():
+                new_terms.append(self.vocab.setdefault(term, len(self.vocab)))
+                new_docs.append(row)
+                new_tfs.append(min(tf, 65535))
+            tokenized += 1
+
+        terms = np.concatenate([old_terms[keep], np.asarray(new_terms, dtype=np.int64)])
+        docs = np.concatenate([old_docs[keep], np.asarray(new_docs, dtype=np.int64)])
+        tfs = np.concatenate([np.asarray(self.tfs)[keep], np.asarray(new_tfs, dtype=np.uint16)])
+        order = np.lexsort((docs, terms))
+        self.docs = docs[order].astype(np.uint32)
+        self.tfs = tfs[order].astype(np.uint16)
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(terms, minlength=len(self.vocab)))]).astype(np.int64)
+        self.doc_len = doc_len
+        self.stats.update(kept=len(known), tokenized=tokenized, removed=len(self.hashes) - len(known))
+        self.hashes = hashes
+        return True
+
+    def search(self, query: str, k: int, candidates: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Top ``k`` BM25 matches as ``(scores, ids)``; documents sharing no term with the query are left out."""
+        count = len(self.hashes)
+        term_ids = [self.vocab[term] for term in set(tokenize(query)) if term in self.vocab]
+        if not count or not term_ids:
+            return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.int64)
+        lengths = np.asarray(self.doc_len, dtype=np.float32)
+        average = float(lengths.mean()) or 1.0
+        scores = np.zeros(count, dtype=np.float32)
+        matched = np.zeros(count, dtype=bool)
+        for term in term_ids:
+            start, end = self.offsets[term], self.offsets[term + 1]
+            docs = np.asarray(self.docs[start:end], dtype=np.int64)
+            if not len(docs):
+                continue
+            tf = np.asarray(self.tfs[start:end], dtype=np.float32)
+            idf = math.log(1 + (count - len(docs) + 0.5) / (len(docs) + 0.5))
+            norm = tf + self.k1 * (1 - self.b + self.b * lengths[docs] / average)
+            scores[docs] += idf * tf * (self.k1 + 1) / norm
+            matched[docs] = True
+        if candidates is not None:
+            allowed = np.zeros(count, dtype=bool)
+            allowed[candidates] = True
+            matched &= allowed
+        ids = np.flatnonzero(matched)
+        best, order = top_k(scores[ids], k)
+        return best, ids[order]
+
+    def save(self, directory: Path) -> None:
+        """Publish the arrays and ``meta.json`` together as a new version of ``directory`` (see ``retrieval.snapshot``)."""
+
+        def write(staging: Path) -> None:
+            for name in ("offsets", "docs", "tfs", "doc_len"):
+                np.save(staging / f"{name}.npy", getattr(self, name))
+            vocab = sorted(self.vocab, key=self.vocab.__getitem__)
+            meta = {"k1": self.k1, "b": self.b, "tokenizer": self.tokenizer, "vocab": vocab, "hashes": self.hashes}
+            (staging / "meta.json").write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+
+        publish(Path(directory), write)
+
+    @classmethod
+    def load(cls, directory: Path) -> Optional["BM25Index"]:
+        """Load a saved index, or None if missing or built with a different tokenizer."""
+        directory = current(Path(directory))
+        if directory is None:
+            return None
+        meta = json.loads((directory / "meta.json").read_text(encoding="utf-8"))
+        index = cls(meta["k1"], meta["b"])
+        if meta.get("tokenizer") != index.tokenizer:
+            return None
+        index.vocab = {term: term_id for term_id, term in enumerate(meta["vocab"])}
+        index.hashes = meta["hashes"]
+        for name in ("offsets", "docs", "tfs", "doc_len"):
+            setattr(index, name, np.load(directory / f"{name}.npy", mmap_mode="r"))
+        if len(index.offsets) != len(index.vocab) + 1 or len(index.doc_len) != len(index.hashes):
+            return None
+        return index
+
+
+def load_or_sync(hashes: Sequence[str], texts: Sequence[str], directory: Optional[Path] = None, name: str = "default") -> BM25Index:
+    """Bring the BM25 index in ``directory/name`` (PEALLM_LEXICAL_DIR) up to date with the corpus and save it.
+
+    Each corpus (``name``) keeps its own index, so apps indexing different
+    texts do not re-tokenize and overwrite each other's.
+    """
+    directory = Path(directory or os.environ.get("PEALLM_LEXICAL_DIR") or DEFAULT_DIRECTORY) / name
+    try:
+        index = BM25Index.load(directory)
+    except (OSError, ValueError, KeyError) as exc:
+        print(f"[WARN] Lexical index {directory} unreadable ({exc}); rebuilding")
+        index = None
+    if index is None:
+        index = BM25Index()
+    if index.sync(hashes, texts):
+        index.save(directory)
+    return index
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_TTL = 3600.0
+
+TRAILING_PUNCTUATION_RE = re.compile(r"[\s?!.。？！]+$")
+
+
+def normalize_query(query: str) -> str:
+    """Cache key for a question: NFC, lower-cased, single spaces, no trailing punctuation."""
+    query = unicodedata.normalize("NFC", query).lower()
+    return TRAILING_PUNCTUATION_RE.sub("", " ".join(query.split()))
+
+
+class QueryCache:
+    """Thread-safe LRU cache whose entries expire ``ttl`` seconds after being stored.
+
+    Every lookup names the corpus ``version`` it was computed against (e.g. the
+    embedding fingerprint plus index backend). When a lookup or store arrives
+    with a different version than the cache holds, everything is dropped: results
+    computed against an older corpus or index are never served.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, ttl: Optional[float] = None, name: str = "query") -> None:
+        self.max_entries = max_entries if max_entries is not None else int(os.environ.get("PEALLM_QUERY_CACHE_SIZE") or DEFAULT_MAX_ENTRIES)
+        self.ttl = ttl if ttl is not None else float(os.environ.get("PEALLM_QUERY_CACHE_TTL") or DEFAULT_TTL)
+        self.name = name
+        self.version: Optional[str] = None
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0, "invalidations": 0}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _check_version(self, version: str) -> None:
+        if version != self.version:
+            if self._entries:
+                self.stats["invalidations"] += 1
+            self._entries.clear()
+            self.version = version
+
+    def get(self, key: Hashable, version: str) -> Optional[Any]:
+        if self.max_entries <= 0:
+            return None
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            stored, value = entry
+            if time.monotonic() - stored > self.ttl:
+                del self._entries[key]
+                self.stats["expired"] += 1
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return value
+
+    def put(self, key: Hashable, value: Any, version: str) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._check_version(version)
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            if self._entries:
+                self.stats["invalidations"] += 1
+            self._entries.clear()
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / lookups if lookups else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"{self.name} cache: {self.hit_rate:.0%} hit rate ({self.stats['hits']}/{self.stats['hits'] + self.stats['misses']}), "
+            f"{len(self)} entries, {self.stats['expired']} expired, {self.stats['evictions']} evicted, "
+            f"{self.stats['invalidations']} invalidations"
+        )
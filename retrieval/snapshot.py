@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Callable, Optional
+
+POINTER_NAME = "CURRENT"
+
+
+def _fsync(path: Path) -> None:
+    try:
+        fd = os.open(str(path), os.O_RDONLY)
+    except OSError:  # pragma: no cover - directories cannot be opened on Windows
+        return
+    try:
+        os.fsync(fd)
+    except OSError:  # pragma: no cover - platform without directory fsync
+        pass
+    finally:
+        os.close(fd)
+
+
+def current(directory: Path) -> Optional[Path]:
+    """The published version of ``directory``, or None if nothing was published yet."""
+    pointer = Path(directory) / POINTER_NAME
+    if not pointer.exists():
+        return None
+    version = Path(directory) / pointer.read_text(encoding="utf-8").strip()
+    return version if version.is_dir() else None
+
+
+def publish(directory: Path, write: Callable[[Path], None]) -> Path:
+    """Write a new version of ``directory`` with ``write`` and switch readers to it atomically.
+
+    ``write`` fills a fresh staging directory. Its files are fsynced, the
+    directory is renamed to its final version name and only then does the
+    ``CURRENT`` pointer move, so a reader sees either the previous version or
+    the complete new one. Files are never rewritten in place: processes that
+    memory-mapped an older version keep valid mappings after it is deleted.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    version = f"v{time.time_ns():x}.{os.getpid()}"
+    staging = directory / f"{version}.part"
+    staging.mkdir()
+    try:
+        write(staging)
+        for path in staging.iterdir():
+            _fsync(path)
+        _fsync(staging)
+        os.replace(staging, directory / version)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    pointer = directory / f"{POINTER_NAME}.{os.getpid()}.part"
+    with open(pointer, "w", encoding="utf-8") as handle:
+        handle.write(version)
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(pointer, directory / POINTER_NAME)
+    _fsync(directory)
+
+    # Older versions are unreachable now; other writers' staging directories are left alone.
+    for child in directory.iterdir():
+        if child.is_dir() and child.name != version and not child.name.endswith(".part"):
+            shutil.rmtree(child, ignore_errors=True)
+    return directory / version
@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import hashlib
+import os
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+import numpy as np
+
+DEFAULT_DIRECTORY = Path(".peallm_cache/text")
+
+
+class TextBlob:
+    """Read-only sequence of strings stored back to back as UTF-8 in one file.
+
+    ``<digest>.bin`` holds the bytes and ``<digest>.offsets.npy`` the
+    ``n + 1`` byte offsets; both are memory-mapped, so the text lives in the
+    page cache (shared by every process serving the same corpus) instead of
+    in each process's heap. Item ``i`` is decoded on access. Files are named
+    by content digest, so identical corpora reuse the same files and a
+    replica never rewrites what another one is reading.
+    """
+
+    def __init__(self, data: np.ndarray, offsets: np.ndarray) -> None:
+        self.data = data
+        self.offsets = offsets
+
+    @classmethod
+    def build(cls, texts: Iterable[str], directory: Optional[Path] = None) -> "TextBlob":
+        directory = Path(directory or os.environ.get("PEALLM_TEXT_DIR") or DEFAULT_DIRECTORY)
+        encoded = [text.encode("utf-8") for text in texts]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(item) for item in encoded], out=offsets[1:])
+        digest = hashlib.sha1(offsets.tobytes())
+        for item in encoded:
+            digest.update(item)
+        name = digest.hexdigest()
+        data_path = directory / f"{name}.bin"
+        offsets_path = directory / f"{name}.offsets.npy"
+        if not (data_path.exists() and offsets_path.exists()):
+            directory.mkdir(parents=True, exist_ok=True)
+            partial = directory / f"{name}.{os.getpid()}.part"
+            with open(partial, "wb") as handle:
+                for item in encoded:
+                    handle.write(item)
+            os.replace(partial, data_path)
+            partial_offsets = directory / f"{name}.{os.getpid()}.offsets.npy"
+            np.save(partial_offsets, offsets)
+            os.replace(partial_offsets, offsets_path)
+        del encoded
+        return cls.load(data_path, offsets_path)
+
+    @classmethod
+    def load(cls, data_path: Path, offsets_path: Path) -> "TextBlob":
+        offsets = np.load(offsets_path, mmap_mode="r")
+        # np.memmap cannot map an empty file.
+        data = np.memmap(data_path, dtype=np.uint8, mode="r") if offsets[-1] else np.zeros(0, dtype=np.uint8)
+        return cls(data, offsets)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: int) -> str:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return self.data[self.offsets[index]:self.offsets[index + 1]].tobytes().decode("utf-8")
+
+    def __iter__(self) -> Iterator[str]:
+        for index in range(len(self)):
+            yield self[index]
@@ -0,0 +1,486 @@
+from __future__ import annotations
+
+import abc
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple, Type
+
+import numpy as np
+
+from retrieval.snapshot import current, publish
+
+try:
+    import hnswlib
+except Exception:  # pragma: no cover - optional dependency
+    hnswlib = None  # type: ignore
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """Row-normalize to unit length as float32, so a dot product is cosine similarity."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def top_k(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Best ``k`` scores per row, highest first, via argpartition instead of a full sort."""
+    k = min(k, scores.shape[-1])
+    if k <= 0:
+        empty = np.empty(scores.shape[:-1] + (0,))
+        return empty.astype(np.float32), empty.astype(np.int64)
+    candidates = np.argpartition(-scores, k - 1, axis=-1)[..., :k]
+    candidate_scores = np.take_along_axis(scores, candidates, axis=-1)
+    order = np.argsort(-candidate_scores, axis=-1)
+    return np.take_along_axis(candidate_scores, order, axis=-1), np.take_along_axis(candidates, order, axis=-1)
+
+
+class VectorIndex(abc.ABC):
+    """Cosine-similarity index over a fixed matrix of document vectors.
+
+    ``search`` takes one query vector or a (q, dim) batch and returns
+    ``(scores, ids)`` of shape (q, k), best first; ids are row numbers of the
+    matrix the index was built from. ``save``/``load`` round-trip through a
+    directory holding ``index.json`` plus the backend's arrays, published as a
+    new version (see ``retrieval.snapshot``) so readers never see a partial save.
+    """
+
+    name = ""
+    # Whether load_or_build keeps a copy on disk; worth it when building costs more than loading.
+    cache_on_disk = True
+    # Whether a loaded index memory-maps its large arrays (shared through the page cache).
+    memory_mapped = True
+
+    @abc.abstractmethod
+    def __len__(self) -> int:
+        ...
+
+    def attach(self, vectors: np.ndarray) -> None:
+        """Give a loaded index the original vectors again (used by backends that re-rank exactly)."""
+
+    @abc.abstractmethod
+    def search(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        ...
+
+    @abc.abstractmethod
+    def _save_arrays(self, directory: Path) -> Dict[str, object]:
+        """Write the backend's arrays into ``directory`` and return the params ``_load_arrays`` needs."""
+
+    @classmethod
+    @abc.abstractmethod
+    def _load_arrays(cls, directory: Path, params: Dict[str, object]) -> "VectorIndex":
+        ...
+
+    def save(self, directory: Path, fingerprint: str = "") -> None:
+        def write(staging: Path) -> None:
+            params = self._save_arrays(staging)
+            meta = {"backend": self.name, "fingerprint": fingerprint, "params": params}
+            (staging / "index.json").write_text(json.dumps(meta), encoding="utf-8")
+
+        publish(Path(directory), write)
+
+
+def _blocks(count: int, size: int = 65536) -> Iterator[slice]:
+    for start in range(0, count, size):
+        yield slice(start, min(count, start + size))
+
+
+def _rerank(source: np.ndarray, queries: np.ndarray, candidates: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Exact cosine scores for each query's candidate rows (-1 = none), keeping the best ``k``."""
+    all_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+    all_ids = np.full((len(queries), k), -1, dtype=np.int64)
+    for row, (query, rows) in enumerate(zip(queries, candidates)):
+        rows = rows[rows >= 0]
+        if not len(rows):
+            continue
+        order = np.argsort(rows)  # sorted reads are friendlier to a memory-mapped source
+        exact = normalize(source[rows[order]]) @ query
+        scores, found = top_k(exact, k)
+        all_scores[row, :len(found)] = scores
+        all_ids[row, :len(found)] = rows[order][found]
+    return all_scores, all_ids
+
+
+class ExactIndex(VectorIndex):
+    """Brute force: vectors are normalized once, each query is one matrix-vector product.
+
+    float16 input (``PEALLM_EMBEDDING_DTYPE=float16``) stays float16, halving
+    the matrix; it is scored block by block in float32. The normalized matrix
+    is cached on disk like the other backends, so later starts memory-map it
+    instead of normalizing a private copy in every process.
+    """
+
+    name = "exact"
+
+    def __init__(self, vectors: np.ndarray) -> None:
+        dtype = np.float16 if np.asarray(vectors[:0]).dtype == np.float16 else np.float32
+        self.vectors = np.empty(np.shape(vectors), dtype=dtype)
+        for block in _blocks(len(vectors)):
+            self.vectors[block] = normalize(vectors[block])
+
+    def __len__(self) -> int:
+        return len(self.vectors)
+
+    def search(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        queries = normalize(np.atleast_2d(queries))
+        if self.vectors.dtype == np.float32:
+            return top_k(queries @ self.vectors.T, k)
+        scores = np.empty((len(queries), len(self.vectors)), dtype=np.float32)
+        for block in _blocks(len(self.vectors)):
+            scores[:, block] = queries @ self.vectors[block].astype(np.float32).T
+        return top_k(scores, k)
+
+    def _save_arrays(self, directory: Path) -> Dict[str, object]:
+        np.save(directory / "vectors.npy", self.vectors)
+        return {}
+
+    @classmethod
+    def _load_arrays(cls, directory: Path, params: Dict[str, object]) -> "ExactIndex":
+        index = cls.__new__(cls)
+        index.vectors = np.load(directory / "vectors.npy", mmap_mode="r")
+        return index
+
+
+def _kmeans(vectors: np.ndarray, clusters: int, iterations: int, seed: int, sample: int = 65536) -> np.ndarray:
+    """Spherical k-means on a sample of ``vectors``; returns unit-length centroids."""
+    rng = np.random.default_rng(seed)
+    if len(vectors) > sample:
+        vectors = vectors[rng.choice(len(vectors), sample, replace=False)]
+    centroids = vectors[rng.choice(len(vectors), clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, vectors)
+        empty = ~sums.any(axis=1)
+        # Re-seed empty clusters with random points so every list gets used.
+        sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()))]
+        centroids = normalize(sums)
+    return centroids
+
+
+class IVFIndex(VectorIndex):
+    """Inverted-file index: vectors grouped under k-means centroids, ``nprobe`` lists scanned per query.
+
+    Pure NumPy, so it is always available. Vectors are stored sorted by list
+    (CSR layout: ``offsets[c]:offsets[c+1]`` is list ``c``) to keep each scan
+    contiguous.
+    """
+
+    name = "ivf"
+
+    def __init__(self, vectors: np.ndarray, nlist: Optional[int] = None, nprobe: Optional[int] = None, iterations: int = 10, seed: int = 0) -> None:
+        data = normalize(vectors)
+        count = len(data)
+        self.nlist = max(1, min(count, nlist or int(4 * np.sqrt(count))))
+        self.nprobe = max(1, min(self.nlist, nprobe or max(1, self.nlist // 16)))
+        self.centroids = _kmeans(data, self.nlist, iterations, seed) if count else np.zeros((1, data.shape[1]), np.float32)
+        assignment = np.empty(count, dtype=np.int64)
+        for start in range(0, count, 65536):
+            assignment[start:start + 65536] = np.argmax(data[start:start + 65536] @ self.centroids.T, axis=1)
+        order = np.argsort(assignment, kind="stable")
+        self.ids = order.astype(np.int64)
+        self.vectors = data[order]
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(assignment, minlength=len(self.centroids)))]).astype(np.int64)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def search(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        queries = normalize(np.atleast_2d(queries))
+        _, probes = top_k(queries @ self.centroids.T, self.nprobe)
+        all_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        all_ids = np.full((len(queries), k), -1, dtype=np.int64)
+        for row, (query, lists) in enumerate(zip(queries, probes)):
+            rows = np.concatenate([np.arange(self.offsets[c], self.offsets[c + 1]) for c in lists])
+            if len(rows) == 0:
+                continue
+            scores, found = top_k(self.vectors[rows] @ query, k)
+            all_scores[row, :len(found)] = scores
+            all_ids[row, :len(found)] = self.ids[rows[found]]
+        return all_scores, all_ids
+
+    def _save_arrays(self, directory: Path) -> Dict[str, object]:
+        for name in ("centroids", "ids", "vectors", "offsets"):
+            np.save(directory / f"{name}.npy", getattr(self, name))
+        return {"nlist": self.nlist, "nprobe": self.nprobe}
+
+    @classmethod
+    def _load_arrays(cls, directory: Path, params: Dict[str, object]) -> "IVFIndex":
+        index = cls.__new__(cls)
+        index.nlist = int(params["nlist"])  # type: ignore[arg-type]
+        index.nprobe = int(params["nprobe"])  # type: ignore[arg-type]
+        index.centroids = np.load(directory / "centroids.npy")
+        index.offsets = np.load(directory / "offsets.npy")
+        index.ids = np.load(directory / "ids.npy", mmap_mode="r")
+        index.vectors = np.load(directory / "vectors.npy", mmap_mode="r")
+        return index
+
+
+class SQ8Index(VectorIndex):
+    """Scalar quantization: every dimension stored as one uint8, a quarter of float32.
+
+    Codes are ``round((x - low) / scale)`` per dimension of the normalized
+    vectors, so ``q . x ~= q . low + (q * scale) . code``. The approximate
+    scores pick ``rerank * k`` candidates, which are re-scored exactly against
+    the original vectors (usually the embedding store's memory map, shared
+    between processes through the page cache). Without the original vectors,
+    e.g. right after ``load_index``, the approximate order is returned.
+    """
+
+    name = "sq8"
+
+    def __init__(self, vectors: np.ndarray, rerank: int = 4) -> None:
+        self.rerank = rerank
+        count, dim = np.shape(vectors)
+        self.low = np.full(dim, np.inf, dtype=np.float32)
+        high = np.full(dim, -np.inf, dtype=np.float32)
+        for block in _blocks(count):
+            data = normalize(vectors[block])
+            self.low = np.minimum(self.low, data.min(axis=0))
+            high = np.maximum(high, data.max(axis=0))
+        self.scale = np.maximum(high - self.low, 1e-12) / 255.0 if count else np.ones(dim, np.float32)
+        self.codes = np.empty((count, dim), dtype=np.uint8)
+        for block in _blocks(count):
+            data = normalize(vectors[block])
+            self.codes[block] = np.clip(np.rint((data - self.low) / self.scale), 0, 255)
+        self.source: Optional[np.ndarray] = vectors
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def attach(self, vectors: np.ndarray) -> None:
+        self.source = vectors
+
+    def approximate(self, queries: np.ndarray) -> np.ndarray:
+        scores = np.empty((len(queries), len(self.codes)), dtype=np.float32)
+        offsets = queries @ self.low
+        weights = (queries * self.scale).T
+        # Small blocks keep the float32 copy of the codes in cache instead of a full-size temporary.
+        for block in _blocks(len(self.codes), 4096):
+            scores[:, block] = (self.codes[block].astype(np.float32) @ weights).T + offsets[:, None]
+        return scores
+
+    def search(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        queries = normalize(np.atleast_2d(queries))
+        if self.source is None or self.rerank <= 1:
+            return top_k(self.approximate(queries), k)
+        _, candidates = top_k(self.approximate(queries), k * self.rerank)
+        return _rerank(self.source, queries, candidates, k)
+
+    def _save_arrays(self, directory: Path) -> Dict[str, object]:
+        for name in ("codes", "low", "scale"):
+            np.save(directory / f"{name}.npy", getattr(self, name))
+        return {"rerank": self.rerank}
+
+    @classmethod
+    def _load_arrays(cls, directory: Path, params: Dict[str, object]) -> "SQ8Index":
+        index = cls.__new__(cls)
+        index.rerank = int(params["rerank"])  # type: ignore[arg-type]
+        index.low = np.load(directory / "low.npy")
+        index.scale = np.load(directory / "scale.npy")
+        index.codes = np.load(directory / "codes.npy", mmap_mode="r")
+        index.source = None
+        return index
+
+
+def _kmeans_l2(vectors: np.ndarray, clusters: int, iterations: int, rng: np.random.Generator) -> np.ndarray:
+    """Plain (Euclidean) k-means, as product quantization needs for its sub-vectors."""
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    centroids = vectors[rng.choice(len(vectors), clusters, replace=len(vectors) < clusters)].copy()
+    for _ in range(iterations):
+        distances = (vectors ** 2).sum(1, keepdims=True) - 2 * vectors @ centroids.T + (centroids ** 2).sum(1)
+        assignment = np.argmin(distances, axis=1)
+        counts = np.bincount(assignment, minlength=clusters)
+        sums = np.stack([np.bincount(assignment, weights=column, minlength=clusters) for column in vectors.T], axis=1)
+        empty = counts == 0
+        sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()))]
+        counts[empty] = 1
+        centroids = (sums / counts[:, None]).astype(np.float32)
+    return centroids
+
+
+class PQIndex(VectorIndex):
+    """Product quantization: each vector is ``m`` one-byte codes, one per sub-vector.
+
+    The dimensions are split into ``m`` equal sub-spaces, each with its own
+    256-entry k-means codebook; 384 dimensions at the default ``m = dim / 8``
+    take 48 bytes per vector instead of 1536. A query is scored against all
+    codes with per-sub-space lookup tables (asymmetric distance computation),
+    then the best ``rerank * k`` are re-scored exactly as in ``SQ8Index``.
+    """
+
+    name = "pq"
+
+    def __init__(self, vectors: np.ndarray, m: Optional[int] = None, rerank: int = 16, iterations: int = 10, seed: int = 0, sample: int = 256 * 40) -> None:
+        count, dim = np.shape(vectors)
+        m = m or max(1, dim // 8)
+        while dim % m:
+            m -= 1
+        self.m = m
+        self.rerank = rerank
+        rng = np.random.default_rng(seed)
+        training = normalize(vectors[np.sort(rng.choice(count, sample, replace=False))] if count > sample else vectors)
+        sub = dim // m
+        clusters = min(256, max(1, len(training)))
+        self.codebooks = np.stack([
+            _kmeans_l2(training[:, part * sub:(part + 1) * sub], clusters, iterations, rng) for part in range(m)
+        ]) if count else np.zeros((m, 1, sub), np.float32)
+        self.codes = np.empty((count, m), dtype=np.uint8)
+        for block in _blocks(count):
+            data = normalize(vectors[block])
+            for part in range(m):
+                piece = data[:, part * sub:(part + 1) * sub]
+                book = self.codebooks[part]
+                self.codes[block, part] = np.argmin((book ** 2).sum(1) - 2 * piece @ book.T, axis=1)
+        self.source: Optional[np.ndarray] = vectors
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def attach(self, vectors: np.ndarray) -> None:
+        self.source = vectors
+
+    def approximate(self, queries: np.ndarray) -> np.ndarray:
+        m, clusters, sub = self.codebooks.shape
+        # tables[q, part, code] = query sub-vector . centroid
+        tables = np.einsum("qms,mcs->qmc", queries.reshape(len(queries), m, sub), self.codebooks)
+        scores = np.empty((len(queries), len(self.codes)), dtype=np.float32)
+        parts = np.arange(m)
+        for block in _blocks(len(self.codes)):
+            codes = np.asarray(self.codes[block], dtype=np.int64)
+            for row, table in enumerate(tables):
+                scores[row, block] = table[parts, codes].sum(axis=1)
+        return scores
+
+    def search(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        queries = normalize(np.atleast_2d(queries))
+        if self.source is None or self.rerank <= 1:
+            return top_k(self.approximate(queries), k)
+        _, candidates = top_k(self.approximate(queries), k * self.rerank)
+        return _rerank(self.source, queries, candidates, k)
+
+    def _save_arrays(self, directory: Path) -> Dict[str, object]:
+        np.save(directory / "codes.npy", self.codes)
+        np.save(directory / "codebooks.npy", self.codebooks)
+        return {"m": self.m, "rerank": self.rerank}
+
+    @classmethod
+    def _load_arrays(cls, directory: Path, params: Dict[str, object]) -> "PQIndex":
+        index = cls.__new__(cls)
+        index.m = int(params["m"])  # type: ignore[arg-type]
+        index.rerank = int(params["rerank"])  # type: ignore[arg-type]
+        index.codebooks = np.load(directory / "codebooks.npy")
+        index.codes = np.load(directory / "codes.npy", mmap_mode="r")
+        index.source = None
+        return index
+
+
+class HNSWIndex(VectorIndex):
+    """Graph index from hnswlib over normalized vectors (inner product == cosine)."""
+
+    name = "hnsw"
+    memory_mapped = False
+
+    def __init__(self, vectors: np.ndarray, m: int = 16, ef_construction: int = 200, ef_search: int = 64, threads: int = -1) -> None:
+        data = normalize(vectors)
+        self.ef_search = ef_search
+        self.graph = hnswlib.Index(space="ip", dim=data.shape[1])
+        self.graph.init_index(max_elements=max(1, len(data)), M=m, ef_construction=ef_construction)
+        if len(data):
+            self.graph.add_items(data, np.arange(len(data)), num_threads=threads)
+        self.graph.set_ef(ef_search)
+
+    def __len__(self) -> int:
+        return self.graph.get_current_count()
+
+    def search(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        queries = normalize(np.atleast_2d(queries))
+        k = min(k, len(self))
+        if k <= 0:
+            return np.empty((len(queries), 0), np.float32), np.empty((len(queries), 0), np.int64)
+        self.graph.set_ef(max(self.ef_search, k))
+        labels, distances = self.graph.knn_query(queries, k=k)
+        # hnswlib's "ip" distance is 1 - dot product.
+        return (1.0 - distances).astype(np.float32), labels.astype(np.int64)
+
+    def _save_arrays(self, directory: Path) -> Dict[str, object]:
+        self.graph.save_index(str(directory / "hnsw.bin"))
+        return {"dim": self.graph.dim, "ef_search": self.ef_search}
+
+    @classmethod
+    def _load_arrays(cls, directory: Path, params: Dict[str, object]) -> "HNSWIndex":
+        index = cls.__new__(cls)
+        index.ef_search = int(params["ef_search"])  # type: ignore[arg-type]
+        index.graph = hnswlib.Index(space="ip", dim=int(params["dim"]))  # type: ignore[arg-type]
+        index.graph.load_index(str(directory / "hnsw.bin"))
+        index.graph.set_ef(index.ef_search)
+        return index
+
+
+def _available_backends() -> Dict[str, Type[VectorIndex]]:
+    backends: Dict[str, Type[VectorIndex]] = {"exact": ExactIndex, "ivf": IVFIndex, "sq8": SQ8Index, "pq": PQIndex}
+    if hnswlib is not None:
+        backends["hnsw"] = HNSWIndex
+    return backends
+
+
+BACKENDS = _available_backends()
+
+
+def resolve_backend_name(name: str = "exact") -> str:
+    """Map ``name`` to an installed backend; unknown or unavailable backends fall back to exact search."""
+    if name not in BACKENDS:
+        print(f"[WARN] Vector index backend '{name}' unavailable; using exact")
+        return "exact"
+    return name
+
+
+def build_index(vectors: np.ndarray, backend: str = "exact", **params: object) -> VectorIndex:
+    return BACKENDS[resolve_backend_name(backend)](vectors, **params)  # type: ignore[call-arg]
+
+
+def load_index(directory: Path, fingerprint: Optional[str] = None) -> Optional[VectorIndex]:
+    """Load a saved index, or return None when it is missing, unavailable or built from other vectors."""
+    version = current(Path(directory))
+    if version is None:
+        return None
+    meta = json.loads((version / "index.json").read_text(encoding="utf-8"))
+    backend = BACKENDS.get(meta.get("backend", ""))
+    if backend is None or (fingerprint is not None and meta.get("fingerprint") != fingerprint):
+        return None
+    return backend._load_arrays(version, meta.get("params", {}))
+
+
+def load_or_build(vectors: np.ndarray, directory: Optional[Path], fingerprint: str, backend: str = "exact", **params: object) -> VectorIndex:
+    """Reuse the index saved in ``directory`` if it was built from the same vectors, else build and save one."""
+    backend = resolve_backend_name(backend)
+    if not BACKENDS[backend].cache_on_disk:
+        directory = None
+    if directory is not None:
+        directory = Path(directory) / backend
+        try:
+            index = load_index(directory, fingerprint)
+        except (OSError, ValueError, RuntimeError) as exc:
+            print(f"[WARN] Saved {backend} index unreadable ({exc}); rebuilding")
+            index = None
+        if index is not None:
+            index.attach(vectors)
+            return index
+    index = build_index(vectors, backend, **params)
+    if directory is not None:
+        index.save(directory, fingerprint)
+    if directory is not None and index.memory_mapped:
+        # Serve from the memory-mapped copy just saved, releasing the freshly built arrays.
+        try:
+            saved = load_index(directory, fingerprint)
+        except (OSError, ValueError, RuntimeError):
+            saved = None
+        if saved is not None:
+            saved.attach(vectors)
+            index = saved
+    return index
+
+
+def default_backend() -> str:
+    return os.environ.get("PEALLM_VECTOR_INDEX", "exact")
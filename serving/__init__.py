@@ -0,0 +1 @@
+"""Model serving utilities for the PEAllm Space."""
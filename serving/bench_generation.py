@@ -0,0 +1,133 @@
+"""Throughput of the chat model under concurrent users.
+
+    python -m serving.bench_generation --model jackyanghxc/PEAllm --clients 8 --turns 4
+    python -m serving.bench_generation --model Qwen/Qwen2.5-0.5B-Instruct --modes scheduler --batch 16
+
+``--clients`` threads each send ``--turns`` chat messages back to back.
+``sequential`` is one ``generate`` per message with messages taking turns on
+the model (what every Space worker did before the scheduler); ``scheduler``
+sends them through the continuous-batching ContinuousBatcher. Reported per
+mode: generated tokens per second across all clients, time to first token
+and full-reply latency percentiles, and for the scheduler its mean batch
+occupancy. Sampling is greedy so both modes produce comparable lengths.
+"""
+
+from __future__ import annotations
+
+import argparse
+import threading
+import time
+from typing import Callable, Dict, Iterator, List, Tuple
+
+from serving.model_manager import ModelManager, load_pretrained
+from serving.scheduler import ContinuousBatcher
+from serving.streaming import stream_generate
+
+PROMPTS = [
+    "Tell me about EGAT's power generation capacity",
+    "MEA ให้ข้อมูลลูกค้าอย่างไร?",
+    "What is Thailand's renewable energy target?",
+    "แผน AEDP คืออะไร?",
+    "How many provinces does PEA serve?",
+    "การใช้พลังงานขั้นสุดท้ายของไทยเป็นอย่างไร?",
+]
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] if ordered else 0.0
+
+
+def sequential_stream(manager: ModelManager, max_new_tokens: int) -> Callable[[str], Iterator[str]]:
+    lock = threading.Lock()
+
+    def stream(prompt: str) -> Iterator[str]:
+        with lock, manager.acquire() as loaded:
+            inputs = loaded.tokenizer(prompt, return_tensors="pt", truncation=True, max_length=512)
+            inputs = {key: value.to(loaded.model.device) for key, value in inputs.items()}
+            yield from stream_generate(
+                loaded.tokenizer, loaded.model, inputs,
+                max_new_tokens=max_new_tokens, do_sample=False, pad_token_id=loaded.tokenizer.eos_token_id,
+            )
+
+    return stream
+
+
+def run_clients(stream: Callable[[str], Iterator[str]], count_tokens: Callable[[str], int], clients: int, turns: int) -> Dict[str, float]:
+    first_token: List[float] = []
+    latency: List[float] = []
+    tokens: List[int] = []
+
+    def client(offset: int) -> None:
+        for turn in range(turns):
+            prompt = f"<|begin_of_text|>{PROMPTS[(offset + turn) % len(PROMPTS)]}"
+            started = time.perf_counter()
+            text, first = "", None
+            for text in stream(prompt):
+                first = first if first is not None else time.perf_counter() - started
+            latency.append(time.perf_counter() - started)
+            first_token.append(first if first is not None else latency[-1])
+            tokens.append(count_tokens(text))
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(index,)) for index in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return {
+        "tok/s": sum(tokens) / elapsed,
+        "ttft50": percentile(first_token, 0.5),
+        "ttft95": percentile(first_token, 0.95),
+        "lat50": percentile(latency, 0.5),
+        "lat95": percentile(latency, 0.95),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generation throughput and latency under concurrent chat users.")
+    parser.add_argument("--model", required=True, help="Hub id or local path of a causal LM")
+    parser.add_argument("--clients", type=int, default=8, help="Concurrent chat users")
+    parser.add_argument("--turns", type=int, default=4, help="Messages per user")
+    parser.add_argument("--max-new-tokens", type=int, default=64)
+    parser.add_argument("--batch", type=int, default=8, help="Scheduler batch size")
+    parser.add_argument("--modes", default="sequential,scheduler", help="Comma-separated modes to compare")
+    args = parser.parse_args()
+
+    manager = ModelManager([args.model], loader=load_pretrained, poll_interval=0)
+    manager.start(background=False)
+    if not manager.ready:
+        raise SystemExit(f"Could not load {args.model}: {manager.error}")
+    tokenizer = manager.current.tokenizer
+
+    def count_tokens(text: str) -> int:
+        return len(tokenizer(text, add_special_tokens=False)["input_ids"])
+
+    rows: List[Tuple[str, Dict[str, float]]] = []
+    for mode in [name.strip() for name in args.modes.split(",") if name.strip()]:
+        if mode == "sequential":
+            result = run_clients(sequential_stream(manager, args.max_new_tokens), count_tokens, args.clients, args.turns)
+        elif mode == "scheduler":
+            scheduler = ContinuousBatcher(manager, max_batch=args.batch, max_queue=max(args.clients, 1))
+            result = run_clients(
+                lambda prompt: iter(scheduler.submit(prompt, max_new_tokens=args.max_new_tokens, do_sample=False)),
+                count_tokens, args.clients, args.turns,
+            )
+            result["occupancy"] = scheduler.summary()["batch_occupancy"]
+        else:
+            raise SystemExit(f"Unknown mode: {mode}")
+        rows.append((mode, result))
+
+    print(f"{args.model}: {args.clients} clients x {args.turns} turns, {args.max_new_tokens} new tokens")
+    print(f"{'mode':<12}{'tok/s':>9}{'ttft p50':>10}{'ttft p95':>10}{'lat p50':>9}{'lat p95':>9}{'occupancy':>11}")
+    for mode, result in rows:
+        occupancy = f"{result['occupancy']:.2f}" if "occupancy" in result else "-"
+        print(
+            f"{mode:<12}{result['tok/s']:>9.1f}{result['ttft50']:>9.2f}s{result['ttft95']:>9.2f}s"
+            f"{result['lat50']:>8.2f}s{result['lat95']:>8.2f}s{occupancy:>11}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""Compare the model's weight formats on CPU: speed, memory and answer quality.
+
+    python -m serving.bench_quantization --model jackyanghxc/PEAllm
+    python -m serving.bench_quantization --model Qwen/Qwen2.5-0.5B-Instruct --modes none,int8 --max-new-tokens 32
+
+Each format (see serving.model_manager.QUANTIZATION_MODES) runs in its own
+interpreter so peak RSS is not shared. Every worker answers the same fixed
+prompts greedily. "none" (float32) runs first and its answers are the
+reference:
+
+- match: share of prompts whose answer is token-for-token the reference
+- agree: mean fraction of reference tokens reproduced before the first difference
+- ppl: perplexity of the reference answers under the quantized model
+  (teacher-forced), which stays meaningful after greedy answers diverge
+
+tok/s is generated tokens over generation time at batch size 1.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - Windows
+    resource = None  # type: ignore
+
+from serving.bench_generation import PROMPTS
+from serving.model_manager import QUANTIZATION_MODES, load_pretrained
+
+EXTRA_PROMPTS = [
+    "อัตราค่าไฟฟ้า TOU ของ กฟภ. คิดอย่างไร?",
+    "Explain the role of the ERC in Thailand's electricity market.",
+    "กฟผ. ผลิตไฟฟ้าจากเชื้อเพลิงอะไรบ้าง?",
+    "What does the Power Development Plan (PDP) cover?",
+]
+
+
+def _max_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage / (1024 * 1024) if sys.platform == "darwin" else usage / 1024
+
+
+def run_worker(model_name: str, mode: str, max_new_tokens: int, reference: Optional[Dict[str, List[int]]]) -> Dict[str, Any]:
+    import torch
+
+    started = time.perf_counter()
+    tokenizer, model = load_pretrained(model_name, quantization=mode)
+    load_seconds = time.perf_counter() - started
+    rss_loaded = _max_rss_mb()
+
+    answers: Dict[str, List[int]] = {}
+    generated = 0
+    generate_seconds = 0.0
+    nll = 0.0
+    scored = 0
+    for prompt in PROMPTS + EXTRA_PROMPTS:
+        inputs = tokenizer(f"<|begin_of_text|>{prompt}", return_tensors="pt")
+        prompt_length = inputs["input_ids"].shape[1]
+        started = time.perf_counter()
+        with torch.no_grad():
+            output = model.generate(**inputs, max_new_tokens=max_new_tokens, do_sample=False, pad_token_id=tokenizer.eos_token_id)
+        generate_seconds += time.perf_counter() - started
+        answers[prompt] = output[0, prompt_length:].tolist()
+        generated += len(answers[prompt])
+        # The float32 worker scores its own answers, giving the baseline perplexity.
+        expected = reference.get(prompt) if reference else answers[prompt]
+        if expected:
+            target = torch.tensor([expected])
+            with torch.no_grad():
+                logits = model(input_ids=torch.cat([inputs["input_ids"], target], dim=1)).logits
+            predicted = logits[0, prompt_length - 1:-1].float().log_softmax(-1)
+            nll -= float(predicted.gather(-1, target[0][:, None]).sum())
+            scored += target.shape[1]
+
+    result: Dict[str, Any] = {
+        "mode": mode,
+        "load_seconds": load_seconds,
+        "rss_mb": rss_loaded,
+        "peak_rss_mb": _max_rss_mb(),
+        "tokens_per_sec": generated / generate_seconds if generate_seconds else 0.0,
+        "answers": answers,
+        "ppl": math.exp(nll / scored) if scored else None,
+        "match": 1.0,
+        "agree": 1.0,
+    }
+    if reference:
+        pairs = [(answers[prompt], reference[prompt]) for prompt in answers if prompt in reference]
+        result["match"] = sum(ours == theirs for ours, theirs in pairs) / len(pairs)
+        result["agree"] = sum(_agreement(ours, theirs) for ours, theirs in pairs) / len(pairs)
+    return result
+
+
+def _agreement(ours: List[int], reference: List[int]) -> float:
+    same = 0
+    for a, b in zip(ours, reference):
+        if a != b:
+            break
+        same += 1
+    return same / len(reference) if reference else 1.0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Tokens/sec, memory and answer quality of each weight format against float32.")
+    parser.add_argument("--model", required=True, help="Hub id or local path of a causal LM")
+    parser.add_argument("--modes", default=",".join(QUANTIZATION_MODES), help="Comma-separated formats; none (float32) is the reference")
+    parser.add_argument("--max-new-tokens", type=int, default=64)
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--reference", type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        reference = json.loads(args.reference.read_text(encoding="utf-8")) if args.reference else None
+        print(json.dumps(run_worker(args.model, args.worker, args.max_new_tokens, reference), ensure_ascii=False))
+        return
+
+    modes = [name.strip() for name in args.modes.split(",") if name.strip()]
+    modes = ["none"] + [mode for mode in modes if mode != "none"]
+    handle, name = tempfile.mkstemp(suffix=".json", prefix="peallm-reference-")
+    os.close(handle)
+    reference_path = Path(name)
+    print(f"{args.model}: {len(PROMPTS) + len(EXTRA_PROMPTS)} prompts, {args.max_new_tokens} new tokens, CPU")
+    print(f"{'mode':<6} {'load s':>7} {'RSS MB':>8} {'peak MB':>8} {'tok/s':>7} {'match':>6} {'agree':>6} {'ppl':>7}")
+    try:
+        for mode in modes:
+            command = [sys.executable, "-m", "serving.bench_quantization", "--worker", mode,
+                       "--model", args.model, "--max-new-tokens", str(args.max_new_tokens)]
+            if mode != "none":
+                command += ["--reference", str(reference_path)]
+            # The benchmark is about CPU workers; hide GPUs from the children.
+            result = subprocess.run(command, capture_output=True, text=True, env={**os.environ, "CUDA_VISIBLE_DEVICES": ""})
+            if result.returncode != 0:
+                print(f"{mode:<6} failed: {result.stderr.strip().splitlines()[-1:]}")
+                if mode == "none":
+                    return
+                continue
+            row = json.loads(result.stdout.strip().splitlines()[-1])
+            if mode == "none":
+                reference_path.write_text(json.dumps(row["answers"], ensure_ascii=False), encoding="utf-8")
+            rss = f"{row['rss_mb']:.0f}" if row["rss_mb"] is not None else "n/a"
+            peak = f"{row['peak_rss_mb']:.0f}" if row["peak_rss_mb"] is not None else "n/a"
+            ppl_text = f"{row['ppl']:.2f}" if row.get("ppl") else "-"
+            print(f"{mode:<6} {row['load_seconds']:>7.1f} {rss:>8} {peak:>8} {row['tokens_per_sec']:>7.2f} {row['match']:>6.2f} {row['agree']:>6.2f} {ppl_text:>7}")
+    finally:
+        reference_path.unlink(missing_ok=True)
+
+
+if __name__ == "__main__":
+    main()
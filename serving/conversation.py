@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import os
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+DEFAULT_MAX_PROMPT_TOKENS = 2048
+
+Message = Dict[str, str]
+Prompt = Union[str, Sequence[Message]]
+
+_ROLE_LABELS = {"system": "System", "user": "User", "assistant": "Assistant"}
+
+
+def conversation_messages(message: str, history: Optional[Sequence[Any]] = None, system_prompt: Optional[str] = None) -> List[Message]:
+    """Messages for one chat turn: the system prompt, earlier turns from Gradio's ``history``, then ``message``.
+
+    ``history`` may be in Gradio's pair format (``[user, assistant]``) or its
+    messages format (dicts with ``role`` and ``content``); non-text parts such
+    as uploaded files are skipped.
+    """
+    messages: List[Message] = [{"role": "system", "content": system_prompt}] if system_prompt else []
+    for turn in history or []:
+        if isinstance(turn, dict):
+            if turn.get("role") in ("user", "assistant") and isinstance(turn.get("content"), str):
+                messages.append({"role": turn["role"], "content": turn["content"]})
+            continue
+        user, assistant = turn[0], turn[1]
+        if isinstance(user, str):
+            messages.append({"role": "user", "content": user})
+        if isinstance(assistant, str) and assistant:
+            messages.append({"role": "assistant", "content": assistant})
+    messages.append({"role": "user", "content": message})
+    return messages
+
+
+def _render(tokenizer: Any, messages: List[Message]) -> List[int]:
+    if getattr(tokenizer, "chat_template", None):
+        return list(tokenizer.apply_chat_template(messages, add_generation_prompt=True))
+    if len(messages) == 1:
+        # A lone question keeps the original single-turn prompt.
+        text = f"<|begin_of_text|>{messages[0]['content']}"
+    else:
+        transcript = "\n\n".join(f"{_ROLE_LABELS[item['role']]}: {item['content']}" for item in messages)
+        text = f"<|begin_of_text|>{transcript}\n\nAssistant:"
+    return tokenizer(text, add_special_tokens=False)["input_ids"]
+
+
+def prompt_ids(tokenizer: Any, prompt: Prompt, max_tokens: Optional[int] = None) -> List[int]:
+    """Token ids for a plain prompt or a message list, within ``max_tokens`` (``PEALLM_MAX_PROMPT_TOKENS``).
+
+    Earlier turns are rendered identically every time, so a conversation's
+    prompt only grows at the end and its KV cache stays reusable. When it no
+    longer fits, the oldest user/assistant exchange is dropped (the system
+    prompt always stays).
+    """
+    max_tokens = max_tokens or int(os.environ.get("PEALLM_MAX_PROMPT_TOKENS") or DEFAULT_MAX_PROMPT_TOKENS)
+    if isinstance(prompt, str):
+        return tokenizer(prompt, truncation=True, max_length=max_tokens)["input_ids"]
+    messages = list(prompt)
+    system = messages[:1] if messages and messages[0]["role"] == "system" else []
+    turns = messages[len(system):]
+    ids = _render(tokenizer, system + turns)
+    while len(ids) > max_tokens and len(turns) > 1:
+        turns = turns[2:] or turns[-1:]
+        ids = _render(tokenizer, system + turns)
+    return ids[-max_tokens:]
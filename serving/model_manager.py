@@ -0,0 +1,338 @@
+from __future__ import annotations
+
+import gc
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+try:
+    import torch
+    from transformers import AutoModelForCausalLM, AutoTokenizer
+except Exception:  # pragma: no cover - optional dependency
+    torch = None  # type: ignore
+    AutoModelForCausalLM = AutoTokenizer = None  # type: ignore
+
+try:
+    from transformers import QuantoConfig
+except Exception:  # pragma: no cover - optional dependency
+    QuantoConfig = None  # type: ignore
+
+try:
+    from huggingface_hub import HfApi
+except Exception:  # pragma: no cover - optional dependency
+    HfApi = None  # type: ignore
+
+DEFAULT_WARMUP_PROMPT = "สวัสดีครับ PEA คืออะไร"
+DEFAULT_WARMUP_TOKENS = 4
+
+# Weight formats for PEALLM_QUANTIZATION. "none" keeps float32 on CPU (float16 on GPU);
+# the others exist mainly for CPU-only workers, where an 8B model in float32 needs ~32 GB.
+QUANTIZATION_MODES = ("none", "bf16", "int8", "int4")
+
+
+class ModelNotReady(Exception):
+    pass
+
+
+def zero_gpu() -> bool:
+    """Whether this is a ZeroGPU Space, where the GPU is only attached inside ``@spaces.GPU`` calls."""
+    return bool(os.environ.get("SPACES_ZERO_GPU"))
+
+
+def select_device_and_dtype() -> Tuple[str, Any]:
+    """Return device map and dtype based on GPU availability."""
+    if torch.cuda.is_available():
+        return "cuda", torch.float16
+    return "cpu", torch.float32
+
+
+def latest_revision(name: str) -> Optional[str]:
+    """Commit sha of a Hub model's main branch; None for local paths or when the Hub is unreachable."""
+    if HfApi is None or os.path.isdir(name):
+        return None
+    try:
+        return HfApi().model_info(name).sha
+    except Exception as exc:  # noqa: BLE001
+        print(f"[WARN] Could not look up the latest revision of {name}: {exc}")
+        return None
+
+
+def quantize_linear_int8(model: Any) -> Any:
+    """Swap every nn.Linear for a dynamically quantized int8 one (CPU).
+
+    Layers are converted one at a time, so only a single layer ever exists in
+    float32 next to the bfloat16 checkpoint; the remaining weights (embeddings,
+    norms) are cast to float32 at the end, which the int8 kernels expect.
+    """
+    dynamic_linear = torch.ao.nn.quantized.dynamic.Linear
+    for module in list(model.modules()):
+        for child_name, child in list(module.named_children()):
+            if type(child) is torch.nn.Linear:
+                layer = child.float()
+                layer.qconfig = torch.ao.quantization.default_dynamic_qconfig
+                setattr(module, child_name, dynamic_linear.from_float(layer))
+    return model.float()
+
+
+def load_pretrained(name: str, revision: Optional[str] = None, quantization: Optional[str] = None) -> Tuple[Any, Any]:
+    """Load tokenizer and model for one checkpoint, pinned to ``revision`` when given.
+
+    ``quantization`` (default ``PEALLM_QUANTIZATION``, else "none") picks the
+    weight format: "bf16" halves float32 memory, "int8" is weight int8 with
+    dynamic activation quantization for CPU matmuls (~1/4 of float32), and
+    "int4" is 4-bit weight-only via optimum-quanto (~1/8). All of them keep a
+    regular transformers model, so streaming and the scheduler work unchanged.
+    """
+    if AutoModelForCausalLM is None:
+        raise RuntimeError("torch and transformers are required to load a model")
+    quantization = (quantization or os.environ.get("PEALLM_QUANTIZATION") or "none").lower()
+    if quantization not in QUANTIZATION_MODES:
+        raise ValueError(f"Unknown quantization {quantization!r}; expected one of {', '.join(QUANTIZATION_MODES)}")
+    device_map, dtype = select_device_and_dtype()
+    extra: Dict[str, Any] = {}
+    if quantization == "int8" and device_map != "cpu":
+        print("[WARN] int8 dynamic quantization is CPU-only; loading float16 on the GPU instead")
+        quantization = "none"
+    if quantization in ("bf16", "int8"):
+        dtype = torch.bfloat16
+    elif quantization == "int4":
+        if QuantoConfig is None:
+            raise RuntimeError("int4 needs optimum-quanto (pip install optimum-quanto)")
+        extra["quantization_config"] = QuantoConfig(weights="int4")
+    # ZeroGPU expects weights moved with .to("cuda") at startup, which it defers until a GPU is attached.
+    on_zero_gpu = zero_gpu() and device_map == "cuda"
+    tokenizer = AutoTokenizer.from_pretrained(name, revision=revision)
+    model = AutoModelForCausalLM.from_pretrained(
+        name,
+        revision=revision,
+        torch_dtype=dtype,
+        device_map=None if on_zero_gpu else device_map,
+        low_cpu_mem_usage=True,
+        **extra,
+    )
+    if on_zero_gpu:
+        model = model.to("cuda")
+    if quantization == "int8":
+        model = quantize_linear_int8(model)
+    model.eval()
+    return tokenizer, model
+
+
+@dataclass
+class LoadedModel:
+    """One resident checkpoint and the number of requests currently using it."""
+
+    name: str
+    revision: Optional[str]
+    tokenizer: Any
+    model: Any
+    loaded_at: float = field(default_factory=time.time)
+    in_flight: int = 0
+    retired: bool = False
+
+    @property
+    def key(self) -> str:
+        """Identifies this load of the weights, e.g. for caches that only fit the model that filled them."""
+        return f"{self.name}@{self.revision}@{self.loaded_at}"
+
+
+class ModelManager:
+    """Own the model of one worker: load once, warm up, report readiness, hot-swap.
+
+    ``start`` loads the first loadable entry of ``candidates`` in a background
+    thread and runs a short generation so the first real request does not pay
+    for kernel compilation and cache allocation. Requests take the model with
+    ``acquire``, which waits until loading has settled and counts the request as
+    in flight for the model it got.
+
+    ``swap`` loads and warms a new checkpoint while the current one keeps
+    serving, then switches new requests over in one step. Requests already
+    running finish on the old model, which is released once the last of them
+    leaves; until then both models are resident, so a swap needs room for two.
+    With ``poll_interval`` (``PEALLM_MODEL_POLL`` seconds, 0 disables) the
+    manager checks the Hub for a new commit of the serving model and swaps to it.
+
+    ``warmup`` (``PEALLM_WARMUP``) defaults to off on ZeroGPU, where generating
+    outside a ``@spaces.GPU`` call fails; there the first request pays for it.
+    """
+
+    def __init__(
+        self,
+        candidates: Sequence[str],
+        loader: Callable[[str, Optional[str]], Tuple[Any, Any]] = load_pretrained,
+        warmup_prompt: str = DEFAULT_WARMUP_PROMPT,
+        warmup_tokens: int = DEFAULT_WARMUP_TOKENS,
+        poll_interval: Optional[float] = None,
+        warmup: Optional[bool] = None,
+    ) -> None:
+        self.candidates = list(candidates)
+        self.warmup = warmup if warmup is not None else (os.environ.get("PEALLM_WARMUP") or ("0" if zero_gpu() else "1")) == "1"
+        self.loader = loader
+        self.warmup_prompt = warmup_prompt
+        self.warmup_tokens = warmup_tokens
+        self.poll_interval = poll_interval if poll_interval is not None else float(os.environ.get("PEALLM_MODEL_POLL") or 0)
+        self.state = "idle"
+        self.error: Optional[str] = None
+        self.swapping: Optional[str] = None
+        self.current: Optional[LoadedModel] = None
+        self.stats: Dict[str, float] = {"loads": 0, "swaps": 0, "failed_swaps": 0, "released": 0, "load_seconds": 0.0, "warmup_seconds": 0.0}
+        self._settled = threading.Event()
+        self._lock = threading.Lock()
+        self._swap_lock = threading.Lock()
+        self._started = False
+
+    @property
+    def ready(self) -> bool:
+        return self.current is not None
+
+    def start(self, background: bool = True) -> Optional[threading.Thread]:
+        """Load the first working candidate; with ``background=False`` load in the calling thread until ready or failed."""
+        with self._lock:
+            if self._started:
+                raise RuntimeError("ModelManager.start() called twice")
+            self._started = True
+        if not background:
+            self._load_initial()
+            return None
+        thread = threading.Thread(target=self._load_initial, name="model-loader", daemon=True)
+        thread.start()
+        return thread
+
+    def _load_initial(self) -> None:
+        self.state = "loading"
+        errors: List[str] = []
+        for name in self.candidates:
+            try:
+                loaded = self._load(name, latest_revision(name))
+            except Exception as exc:  # noqa: BLE001
+                errors.append(f"{name}: {exc}")
+                print(f"[WARN] Could not load {name}: {exc}")
+                continue
+            self._install(loaded)
+            if self.poll_interval > 0:
+                threading.Thread(target=self._poll, name="model-poller", daemon=True).start()
+            return
+        self.state = "failed"
+        self.error = "; ".join(errors) or "no model candidates configured"
+        self._settled.set()
+        print(f"[WARN] Failed to load model: {self.error}")
+
+    def _load(self, name: str, revision: Optional[str]) -> LoadedModel:
+        started = time.perf_counter()
+        tokenizer, model = self.loader(name, revision)
+        loaded = LoadedModel(name, revision, tokenizer, model)
+        self.stats["load_seconds"] = time.perf_counter() - started
+        self.stats["loads"] += 1
+        if self.warmup:
+            self.warm_up(loaded)
+        return loaded
+
+    def warm_up(self, loaded: LoadedModel) -> None:
+        """Run one short greedy generation; a model that cannot generate is never installed."""
+        started = time.perf_counter()
+        tokenizer, model = loaded.tokenizer, loaded.model
+        inputs = tokenizer(self.warmup_prompt, return_tensors="pt")
+        inputs = {key: value.to(model.device) for key, value in inputs.items()}
+        with torch.no_grad():
+            model.generate(**inputs, max_new_tokens=self.warmup_tokens, do_sample=False, pad_token_id=tokenizer.eos_token_id)
+        self.stats["warmup_seconds"] = time.perf_counter() - started
+
+    def _install(self, loaded: LoadedModel) -> None:
+        with self._lock:
+            previous, self.current = self.current, loaded
+            self.state = "ready"
+            self.error = None
+            release = False
+            if previous is not None:
+                previous.retired = True
+                release = previous.in_flight == 0
+        self._settled.set()
+        print(f"[OK] Serving {loaded.name}" + (f"@{loaded.revision[:8]}" if loaded.revision else ""))
+        if release:
+            self._release(previous)
+
+    def _release(self, loaded: LoadedModel) -> None:
+        loaded.tokenizer = loaded.model = None
+        gc.collect()
+        if torch is not None and torch.cuda.is_available():
+            torch.cuda.empty_cache()
+        self.stats["released"] += 1
+        print(f"[OK] Released {loaded.name}" + (f"@{loaded.revision[:8]}" if loaded.revision else ""))
+
+    def wait_ready(self, timeout: Optional[float] = None) -> None:
+        """Block until loading has settled; raise ModelNotReady if it has not after ``timeout`` seconds."""
+        if not self._settled.wait(timeout):
+            raise ModelNotReady("Model is still loading")
+
+    @contextmanager
+    def acquire(self, timeout: Optional[float] = None) -> Iterator[LoadedModel]:
+        """The serving model for the duration of one request.
+
+        Raises ModelNotReady when the model is still loading after ``timeout``
+        seconds or when every candidate failed to load.
+        """
+        self.wait_ready(timeout)
+        with self._lock:
+            loaded = self.current
+            if loaded is None:
+                raise ModelNotReady(f"Model failed to load: {self.error}")
+            loaded.in_flight += 1
+        try:
+            yield loaded
+        finally:
+            with self._lock:
+                loaded.in_flight -= 1
+                release = loaded.retired and loaded.in_flight == 0
+            if release:
+                self._release(loaded)
+
+    def swap(self, name: Optional[str] = None, revision: Optional[str] = None) -> bool:
+        """Load ``name`` at ``revision`` (default: latest revision of the serving model) and switch to it.
+
+        The current model keeps serving while the new one loads; on failure it
+        simply stays in place and False is returned.
+        """
+        with self._swap_lock:
+            name = name or (self.current.name if self.current else self.candidates[0])
+            revision = revision or latest_revision(name)
+            self.swapping = name
+            try:
+                loaded = self._load(name, revision)
+            except Exception as exc:  # noqa: BLE001
+                self.stats["failed_swaps"] += 1
+                print(f"[WARN] Swap to {name} failed, keeping the current model: {exc}")
+                return False
+            finally:
+                self.swapping = None
+            self._install(loaded)
+            self.stats["swaps"] += 1
+            return True
+
+    def _poll(self) -> None:
+        while True:
+            time.sleep(self.poll_interval)
+            current = self.current
+            if current is None or current.revision is None:
+                continue
+            revision = latest_revision(current.name)
+            if revision and revision != current.revision:
+                print(f"[OK] New revision of {current.name}: {revision[:8]}, swapping")
+                self.swap(current.name, revision)
+
+    def status(self) -> Dict[str, Any]:
+        """Readiness and model details, for health checks and the status panel."""
+        current = self.current
+        return {
+            "state": self.state,
+            "ready": current is not None,
+            "model": current.name if current else None,
+            "revision": current.revision if current else None,
+            "loaded_at": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(current.loaded_at)) if current else None,
+            "in_flight": current.in_flight if current else 0,
+            "swapping": self.swapping,
+            "error": self.error,
+            **self.stats,
+        }
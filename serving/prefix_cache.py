@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple
+
+try:
+    from transformers import DynamicCache
+except Exception:  # pragma: no cover - optional dependency
+    DynamicCache = None  # type: ignore
+
+DEFAULT_MAX_MB = 512
+DEFAULT_BLOCK_SIZE = 16
+
+
+def to_legacy(past: Any) -> tuple:
+    """Per-layer ``(key, value)`` tensors shaped (batch, heads, seq, head_dim), whatever cache class the model returned."""
+    return past.to_legacy_cache() if hasattr(past, "to_legacy_cache") else tuple(past)
+
+
+def to_model_cache(legacy: tuple) -> Any:
+    if DynamicCache is not None and hasattr(DynamicCache, "from_legacy_cache"):
+        return DynamicCache.from_legacy_cache(legacy)
+    return legacy
+
+
+class _Entry:
+    __slots__ = ("ids", "kv", "nbytes", "keys")
+
+    def __init__(self, ids: Tuple[int, ...], kv: tuple, keys: List[int]) -> None:
+        self.ids = ids
+        self.kv = kv
+        self.nbytes = sum(tensor.numel() * tensor.element_size() for layer in kv for tensor in layer)
+        self.keys = keys
+
+
+class PrefixCache:
+    """KV caches of earlier prompts, reused for any later prompt that starts the same way.
+
+    An entry holds the KV tensors (batch 1) of one token sequence: a finished
+    chat turn's prompt plus reply. It is indexed under a chained hash of every
+    ``block_size``-token prefix, so ``lookup`` finds the longest block-aligned
+    prefix shared with *any* entry: the previous turn of the same conversation
+    (follow-ups only prefill the new tokens), or another session's identical
+    system prompt and retrieved context. Entries are evicted least recently
+    used once their tensors exceed ``max_bytes`` (``PEALLM_PREFIX_CACHE_MB``).
+
+    Caches only fit the model that computed them: every call names a model
+    ``version`` and a different version empties the cache.
+    """
+
+    def __init__(self, max_bytes: Optional[int] = None, block_size: int = DEFAULT_BLOCK_SIZE) -> None:
+        self.max_bytes = max_bytes if max_bytes is not None else int(float(os.environ.get("PEALLM_PREFIX_CACHE_MB") or DEFAULT_MAX_MB) * 1024 * 1024)
+        self.block_size = max(1, block_size)
+        self.version: Optional[Hashable] = None
+        self.bytes = 0
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._index: Dict[int, _Entry] = {}
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {"lookups": 0, "hits": 0, "prompt_tokens": 0, "reused_tokens": 0, "stores": 0, "evictions": 0}
+
+    def _block_keys(self, ids: Sequence[int], limit: int) -> List[int]:
+        """Chained hash of each block-aligned prefix of ``ids[:limit]``, shortest first."""
+        keys: List[int] = []
+        key = 0
+        for end in range(self.block_size, limit + 1, self.block_size):
+            key = hash((key, tuple(ids[end - self.block_size:end])))
+            keys.append(key)
+        return keys
+
+    def _check_version(self, version: Hashable) -> None:
+        if version != self.version:
+            self._entries.clear()
+            self._index.clear()
+            self.bytes = 0
+            self.version = version
+
+    def lookup(self, ids: Sequence[int], version: Hashable) -> Tuple[int, Optional[tuple]]:
+        """``(length, kv)`` for the longest cached prefix of ``ids``, or ``(0, None)``.
+
+        At least one token is always left over, since the model must run on
+        something to produce the next-token logits.
+        """
+        with self._lock:
+            self._check_version(version)
+            self.stats["lookups"] += 1
+            self.stats["prompt_tokens"] += len(ids)
+            keys = self._block_keys(ids, len(ids) - 1)
+            for blocks in range(len(keys), 0, -1):
+                entry = self._index.get(keys[blocks - 1])
+                length = blocks * self.block_size
+                if entry is None or entry.ids[:length] != tuple(ids[:length]):
+                    continue
+                self._entries.move_to_end(id(entry))
+                self.stats["hits"] += 1
+                self.stats["reused_tokens"] += length
+                return length, tuple((key[:, :, :length], value[:, :, :length]) for key, value in entry.kv)
+            return 0, None
+
+    def store(self, ids: Sequence[int], kv: tuple, version: Hashable) -> None:
+        """Keep ``kv`` (the cache after feeding exactly ``ids``) for later prompts sharing a prefix with it."""
+        ids = tuple(ids)
+        if len(ids) < self.block_size or kv[0][0].shape[2] != len(ids):
+            return
+        keys = self._block_keys(ids, len(ids))
+        entry = _Entry(ids, kv, keys)
+        if entry.nbytes > self.max_bytes:
+            return
+        with self._lock:
+            self._check_version(version)
+            # An earlier turn of this conversation is a prefix of the new entry: superseded.
+            for key in keys:
+                older = self._index.get(key)
+                if older is not None and older is not entry and ids[:len(older.ids)] == older.ids:
+                    self._drop(older)
+            for key in keys:
+                self._index[key] = entry
+            self._entries[id(entry)] = entry
+            self.bytes += entry.nbytes
+            self.stats["stores"] += 1
+            while self.bytes > self.max_bytes and self._entries:
+                self._drop(next(iter(self._entries.values())))
+                self.stats["evictions"] += 1
+
+    def _drop(self, entry: _Entry) -> None:
+        if self._entries.pop(id(entry), None) is None:
+            return
+        self.bytes -= entry.nbytes
+        for key in entry.keys:
+            if self._index.get(key) is entry:
+                del self._index[key]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def summary(self) -> Dict[str, Any]:
+        prompt_tokens = self.stats["prompt_tokens"]
+        return {
+            **self.stats,
+            "entries": len(self._entries),
+            "mb": round(self.bytes / (1024 * 1024), 1),
+            "reuse_rate": round(self.stats["reused_tokens"] / prompt_tokens, 3) if prompt_tokens else 0.0,
+        }
@@ -0,0 +1,398 @@
+from __future__ import annotations
+
+import os
+import queue
+import threading
+import time
+from collections import deque
+from contextlib import AbstractContextManager
+from typing import Any, Deque, Dict, Iterator, List, Optional, Set
+
+try:
+    import torch
+except Exception:  # pragma: no cover - optional dependency
+    torch = None  # type: ignore
+
+from serving.conversation import Prompt, prompt_ids
+from serving.model_manager import LoadedModel, ModelManager
+from serving.prefix_cache import PrefixCache, to_legacy, to_model_cache
+
+DEFAULT_MAX_BATCH = 8
+DEFAULT_MAX_QUEUE = 64
+DEFAULT_QUEUE_TIMEOUT = 5.0
+DEFAULT_TOP_K = 50
+
+_DONE = object()
+
+
+class SchedulerBusy(Exception):
+    pass
+
+
+def _left_pad(tensor: Any, width: int, dim: int) -> Any:
+    if width <= 0:
+        return tensor
+    shape = list(tensor.shape)
+    shape[dim] = width
+    return torch.cat([tensor.new_zeros(shape), tensor], dim=dim)
+
+
+class GenerationRequest:
+    """One chat turn in the scheduler; iterate it for the reply generated so far.
+
+    Closing the iterator early (the client went away) cancels the request and
+    its sequence leaves the batch at the next step.
+    """
+
+    def __init__(self, prompt: Prompt, max_new_tokens: int, temperature: float, top_p: float, do_sample: bool) -> None:
+        self.prompt = prompt
+        self.prompt_ids: List[int] = []
+        self.max_new_tokens = max_new_tokens
+        self.temperature = temperature
+        self.top_p = top_p
+        self.do_sample = do_sample and temperature > 0
+        self.token_ids: List[int] = []
+        self.submitted = time.monotonic()
+        self.cancelled = threading.Event()
+        self._output: "queue.Queue[Any]" = queue.Queue()
+
+    def emit(self, text: str) -> None:
+        self._output.put(text)
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        self._output.put(error if error is not None else _DONE)
+
+    def __iter__(self) -> Iterator[str]:
+        try:
+            while True:
+                item = self._output.get()
+                if item is _DONE:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            self.cancelled.set()
+
+
+class ContinuousBatcher:
+    """Decode every active chat turn in one shared batch, one token per step.
+
+    A single worker thread owns the model. Between decoding steps it admits
+    waiting requests (up to ``max_batch`` sequences): their prompts are
+    prefilled together, left-padded to a common length, and their KV caches
+    are left-padded and concatenated onto the running batch. A sequence leaves
+    the batch as soon as it emits EOS, reaches ``max_new_tokens`` or is
+    cancelled; columns that became padding in every remaining row are trimmed
+    so finished long prompts stop costing attention time.
+
+    ``submit`` waits up to ``queue_timeout`` seconds for one of ``max_queue``
+    waiting slots and raises SchedulerBusy when none frees up. When the manager
+    swaps models, admission pauses until the current batch drains, then the
+    worker switches to the new model.
+
+    With a ``prefix_cache``, a newcomer whose prompt starts like an earlier
+    one (the previous turn of its conversation, a shared system prompt) is
+    prefilled on top of the cached KV, so only its new tokens are computed;
+    finished turns are stored back.
+
+    Defaults come from ``PEALLM_DECODE_BATCH``, ``PEALLM_DECODE_QUEUE`` and
+    ``PEALLM_QUEUE_TIMEOUT``. ``summary`` reports queue wait, batch occupancy
+    and generated tokens per second.
+    """
+
+    def __init__(
+        self,
+        manager: ModelManager,
+        max_batch: Optional[int] = None,
+        max_queue: Optional[int] = None,
+        queue_timeout: Optional[float] = None,
+        top_k: int = DEFAULT_TOP_K,
+        max_prompt_tokens: Optional[int] = None,
+        prefix_cache: Optional[PrefixCache] = None,
+        window: int = 512,
+    ) -> None:
+        self.manager = manager
+        self.prefix_cache = prefix_cache
+        self.max_batch = max(1, max_batch or int(os.environ.get("PEALLM_DECODE_BATCH") or DEFAULT_MAX_BATCH))
+        self.max_queue = max(1, max_queue or int(os.environ.get("PEALLM_DECODE_QUEUE") or DEFAULT_MAX_QUEUE))
+        self.queue_timeout = queue_timeout if queue_timeout is not None else float(os.environ.get("PEALLM_QUEUE_TIMEOUT") or DEFAULT_QUEUE_TIMEOUT)
+        self.top_k = top_k
+        self.max_prompt_tokens = max_prompt_tokens
+        self.stats: Dict[str, float] = {
+            "submitted": 0, "rejected": 0, "cancelled": 0, "completed": 0, "failed": 0,
+            "steps": 0, "prefills": 0, "tokens": 0, "decoded_rows": 0, "busy_seconds": 0.0,
+        }
+        self._waits: Deque[float] = deque(maxlen=window)
+        self._waiting: "queue.Queue[GenerationRequest]" = queue.Queue(maxsize=self.max_queue)
+        self._lock = threading.Lock()
+        self._worker: Optional[threading.Thread] = None
+        # Batch state, touched only by the worker thread.
+        self._active: List[GenerationRequest] = []
+        self._cache: Optional[tuple] = None
+        self._mask: Any = None
+        self._last: Any = None
+        self._lease: Optional[AbstractContextManager] = None
+        self._loaded: Optional[LoadedModel] = None
+        self._eos: Set[int] = set()
+
+    def _ensure_worker(self) -> None:
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="decode-scheduler", daemon=True)
+                self._worker.start()
+
+    def submit(
+        self,
+        prompt: Prompt,
+        max_new_tokens: int = 200,
+        temperature: float = 0.7,
+        top_p: float = 1.0,
+        do_sample: bool = True,
+    ) -> GenerationRequest:
+        request = GenerationRequest(prompt, max_new_tokens, temperature, top_p, do_sample)
+        self._ensure_worker()
+        try:
+            self._waiting.put(request, timeout=self.queue_timeout)
+        except queue.Full:
+            self.stats["rejected"] += 1
+            raise SchedulerBusy(f"Server is busy ({self.max_queue} requests waiting)") from None
+        self.stats["submitted"] += 1
+        return request
+
+    def _run(self) -> None:
+        while True:
+            try:
+                self._admit()
+                if self._active:
+                    self._step()
+            except Exception as exc:  # noqa: BLE001
+                print(f"[WARN] Decoding batch failed, dropping {len(self._active)} requests: {exc}")
+                self.stats["failed"] += len(self._active)
+                for request in self._active:
+                    request.finish(exc)
+                self._reset_batch()
+
+    def _reset_batch(self) -> None:
+        self._active = []
+        self._cache = self._mask = self._last = None
+
+    def _acquire_model(self) -> None:
+        lease = self.manager.acquire()
+        self._loaded = lease.__enter__()
+        self._lease = lease
+        tokenizer, model = self._loaded.tokenizer, self._loaded.model
+        eos = getattr(getattr(model, "generation_config", None), "eos_token_id", None)
+        self._eos = set(eos if isinstance(eos, (list, tuple)) else [eos]) | {tokenizer.eos_token_id}
+        self._eos.discard(None)
+
+    def _release_model(self) -> None:
+        if self._lease is not None:
+            lease, self._lease, self._loaded = self._lease, None, None
+            lease.__exit__(None, None, None)
+
+    def _admit(self) -> None:
+        newcomers: List[GenerationRequest] = []
+        if not self._active:
+            # Idle: hand the model back so a finished hot-swap can release the old one.
+            self._release_model()
+            newcomers.append(self._waiting.get())
+        draining = self._loaded is not None and self.manager.current is not self._loaded
+        while not draining and len(self._active) + len(newcomers) < self.max_batch:
+            try:
+                newcomers.append(self._waiting.get_nowait())
+            except queue.Empty:
+                break
+        live = [request for request in newcomers if not request.cancelled.is_set()]
+        self.stats["cancelled"] += len(newcomers) - len(live)
+        if not live:
+            return
+        if self._loaded is None:
+            try:
+                self._acquire_model()
+            except Exception as exc:  # noqa: BLE001
+                for request in live:
+                    request.finish(exc)
+                return
+        now = time.monotonic()
+        self._waits.extend(now - request.submitted for request in live)
+        try:
+            self._prefill(live)
+        except Exception as exc:  # noqa: BLE001
+            if any(request in self._active for request in live):
+                raise
+            # The forward pass failed before the newcomers joined: the running batch is intact.
+            print(f"[WARN] Prefill failed for {len(live)} requests: {exc}")
+            self.stats["failed"] += len(live)
+            for request in live:
+                request.finish(exc)
+
+    def _prefill(self, requests: List[GenerationRequest]) -> None:
+        """Prefill newcomers: prefix-cache hits one by one on top of their cached KV, the rest together."""
+        started = time.perf_counter()
+        fresh: List[GenerationRequest] = []
+        for request in requests:
+            request.prompt_ids = prompt_ids(self._loaded.tokenizer, request.prompt, self.max_prompt_tokens)
+            cached, past = self.prefix_cache.lookup(request.prompt_ids, self._loaded.key) if self.prefix_cache is not None else (0, None)
+            if past is None:
+                fresh.append(request)
+            else:
+                self._prefill_group([request], past, cached)
+        if fresh:
+            self._prefill_group(fresh)
+        self.stats["busy_seconds"] += time.perf_counter() - started
+
+    def _prefill_group(self, requests: List[GenerationRequest], past: Optional[tuple] = None, cached: int = 0) -> None:
+        tokenizer, model = self._loaded.tokenizer, self._loaded.model
+        encoded = [request.prompt_ids[cached:] for request in requests]
+        length = max(len(tokens) for tokens in encoded)
+        pad = tokenizer.pad_token_id if tokenizer.pad_token_id is not None else next(iter(self._eos), 0)
+        ids = torch.full((len(requests), length), pad, dtype=torch.long)
+        mask = torch.zeros((len(requests), cached + length), dtype=torch.long)
+        mask[:, :cached] = 1
+        for row, tokens in enumerate(encoded):
+            ids[row, length - len(tokens):] = torch.tensor(tokens, dtype=torch.long)
+            mask[row, cached + length - len(tokens):] = 1
+        ids, mask = ids.to(model.device), mask.to(model.device)
+        with torch.no_grad():
+            output = model(
+                input_ids=ids,
+                attention_mask=mask,
+                position_ids=(mask.cumsum(-1) - 1).clamp(min=0)[:, cached:],
+                past_key_values=to_model_cache(past) if past is not None else None,
+                use_cache=True,
+            )
+        tokens = self._sample(output.logits[:, -1, :], requests)
+        self._merge(requests, to_legacy(output.past_key_values), mask, tokens)
+        self._remove(self._accept(requests, tokens))
+        self.stats["prefills"] += 1
+
+    def _merge(self, requests: List[GenerationRequest], cache: tuple, mask: Any, tokens: Any) -> None:
+        if self._cache is None:
+            self._active, self._cache, self._mask, self._last = list(requests), cache, mask, tokens
+            return
+        length = max(self._mask.shape[1], mask.shape[1])
+        old, new = length - self._mask.shape[1], length - mask.shape[1]
+        self._mask = torch.cat([_left_pad(self._mask, old, 1), _left_pad(mask, new, 1)], dim=0)
+        self._cache = tuple(
+            (
+                torch.cat([_left_pad(old_key, old, 2), _left_pad(new_key, new, 2)], dim=0),
+                torch.cat([_left_pad(old_value, old, 2), _left_pad(new_value, new, 2)], dim=0),
+            )
+            for (old_key, old_value), (new_key, new_value) in zip(self._cache, cache)
+        )
+        self._last = torch.cat([self._last, tokens], dim=0)
+        self._active.extend(requests)
+
+    def _step(self) -> None:
+        self._remove([request for request in self._active if request.cancelled.is_set()], cancelled=True)
+        if not self._active:
+            return
+        started = time.perf_counter()
+        model = self._loaded.model
+        self._mask = torch.cat([self._mask, self._mask.new_ones((self._mask.shape[0], 1))], dim=1)
+        with torch.no_grad():
+            output = model(
+                input_ids=self._last[:, None],
+                attention_mask=self._mask,
+                position_ids=self._mask.sum(-1, keepdim=True) - 1,
+                past_key_values=to_model_cache(self._cache),
+                use_cache=True,
+            )
+        self._cache = to_legacy(output.past_key_values)
+        self._last = self._sample(output.logits[:, -1, :], self._active)
+        self.stats["steps"] += 1
+        self.stats["decoded_rows"] += len(self._active)
+        self._remove(self._accept(self._active, self._last))
+        self.stats["busy_seconds"] += time.perf_counter() - started
+
+    def _sample(self, logits: Any, requests: List[GenerationRequest]) -> Any:
+        """Next token per row: greedy, or temperature / top-k / top-p sampling per request."""
+        logits = logits.float()
+        tokens = logits.argmax(-1)
+        rows = [row for row, request in enumerate(requests) if request.do_sample]
+        if not rows:
+            return tokens
+        index = torch.tensor(rows, device=logits.device)
+        temperature = torch.tensor([requests[row].temperature for row in rows], device=logits.device)
+        scores = logits.index_select(0, index) / temperature[:, None]
+        if self.top_k:
+            kth = torch.topk(scores, min(self.top_k, scores.shape[-1]), dim=-1).values[:, -1:]
+            scores = scores.masked_fill(scores < kth, float("-inf"))
+        top_p = torch.tensor([requests[row].top_p for row in rows], device=logits.device)
+        if bool((top_p < 1).any()):
+            ordered, order = scores.sort(dim=-1, descending=True)
+            probabilities = ordered.softmax(-1)
+            # Keep the smallest prefix reaching top_p; the most likely token always survives.
+            ordered = ordered.masked_fill(probabilities.cumsum(-1) - probabilities > top_p[:, None], float("-inf"))
+            scores = scores.scatter(-1, order, ordered)
+        tokens[index] = torch.multinomial(scores.softmax(-1), 1).squeeze(-1)
+        return tokens
+
+    def _accept(self, requests: List[GenerationRequest], tokens: Any) -> List[GenerationRequest]:
+        """Record one new token per request and stream its text; return the requests that are done."""
+        tokenizer = self._loaded.tokenizer
+        finished: List[GenerationRequest] = []
+        for request, token in zip(requests, tokens.tolist()):
+            if token in self._eos:
+                finished.append(request)
+                continue
+            request.token_ids.append(token)
+            self.stats["tokens"] += 1
+            text = tokenizer.decode(request.token_ids, skip_special_tokens=True)
+            # A Thai character can span several byte-level tokens; wait until it is complete.
+            if not text.endswith("\ufffd"):
+                request.emit(text)
+            if len(request.token_ids) >= request.max_new_tokens:
+                finished.append(request)
+        return finished
+
+    def _remove(self, requests: List[GenerationRequest], cancelled: bool = False) -> None:
+        if not requests:
+            return
+        leaving = {id(request) for request in requests}
+        if self.prefix_cache is not None and not cancelled:
+            self._store_prefixes(leaving)
+        for request in requests:
+            request.finish()
+        self.stats["cancelled" if cancelled else "completed"] += len(requests)
+        keep = [row for row, request in enumerate(self._active) if id(request) not in leaving]
+        if not keep:
+            self._reset_batch()
+            return
+        index = torch.tensor(keep, device=self._mask.device)
+        mask = self._mask.index_select(0, index)
+        start = int(mask.any(dim=0).int().argmax())
+        self._mask = mask[:, start:]
+        self._cache = tuple(
+            (key.index_select(0, index)[:, :, start:], value.index_select(0, index)[:, :, start:])
+            for key, value in self._cache
+        )
+        self._last = self._last.index_select(0, index)
+        self._active = [self._active[row] for row in keep]
+
+    def _store_prefixes(self, leaving: Set[int]) -> None:
+        """Copy finished rows' KV (their trailing real columns) into the prefix cache for follow-up turns."""
+        for row, request in enumerate(self._active):
+            if id(request) not in leaving:
+                continue
+            length = int(self._mask[row].sum())
+            # Fed so far: the prompt and every generated token except a final one still unfed.
+            fed = (request.prompt_ids + request.token_ids)[:length]
+            kv = tuple((key[row:row + 1, :, -length:].clone(), value[row:row + 1, :, -length:].clone()) for key, value in self._cache)
+            self.prefix_cache.store(fed, kv, self._loaded.key)
+
+    def summary(self) -> Dict[str, Any]:
+        waits = sorted(self._waits)
+        steps = self.stats["steps"]
+        busy = self.stats["busy_seconds"]
+        return {
+            **self.stats,
+            "active": len(self._active),
+            "waiting": self._waiting.qsize(),
+            "max_batch": self.max_batch,
+            "queue_wait_p50_ms": round(1000 * waits[len(waits) // 2], 1) if waits else 0.0,
+            "queue_wait_p95_ms": round(1000 * waits[min(len(waits) - 1, int(len(waits) * 0.95))], 1) if waits else 0.0,
+            "batch_occupancy": round(self.stats["decoded_rows"] / (steps * self.max_batch), 3) if steps else 0.0,
+            "tokens_per_second": round(self.stats["tokens"] / busy, 1) if busy else 0.0,
+        }
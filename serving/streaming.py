@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import threading
+from typing import Any, Dict, Hashable, Iterator, List, Optional
+
+try:
+    import torch
+    from transformers import StoppingCriteria, StoppingCriteriaList, TextIteratorStreamer
+except Exception:  # pragma: no cover - optional dependency
+    torch = None  # type: ignore
+    StoppingCriteria = object  # type: ignore
+    StoppingCriteriaList = TextIteratorStreamer = None  # type: ignore
+
+from serving.prefix_cache import PrefixCache, to_legacy, to_model_cache
+
+
+class StopOnEvent(StoppingCriteria):
+    """Stop ``generate`` at the next token once ``event`` is set."""
+
+    def __init__(self, event: threading.Event) -> None:
+        self.event = event
+
+    def __call__(self, input_ids: Any, scores: Any, **kwargs: Any) -> bool:
+        return self.event.is_set()
+
+
+def stream_generate(
+    tokenizer: Any,
+    model: Any,
+    inputs: Dict[str, Any],
+    timeout: Optional[float] = None,
+    prefix_cache: Optional[PrefixCache] = None,
+    cache_version: Optional[Hashable] = None,
+    **generate_kwargs: Any,
+) -> Iterator[str]:
+    """Yield the reply generated so far, growing by one decoded piece per step.
+
+    ``model.generate`` runs in a worker thread feeding a TextIteratorStreamer;
+    the prompt is not echoed. Closing the iterator (Gradio does so when the
+    client disconnects or presses stop) stops generation at the next token and
+    waits for the worker, so the model is idle again when the caller's
+    ``acquire`` ends. An exception inside ``generate`` is re-raised here.
+
+    With ``prefix_cache`` (single prompt only) ``generate`` starts from the KV
+    cache of the longest cached prefix of the prompt and only prefills the rest;
+    afterwards the cache of prompt plus reply is stored for the next turn,
+    unless the reply was abandoned.
+    """
+    if TextIteratorStreamer is None:
+        raise RuntimeError("torch and transformers are required for streaming generation")
+    streamer = TextIteratorStreamer(tokenizer, skip_prompt=True, skip_special_tokens=True, timeout=timeout)
+    cancel = threading.Event()
+    errors: List[BaseException] = []
+
+    def run() -> None:
+        try:
+            if prefix_cache is not None:
+                _, past = prefix_cache.lookup(inputs["input_ids"][0].tolist(), cache_version)
+                if past is not None:
+                    generate_kwargs["past_key_values"] = to_model_cache(past)
+            with torch.no_grad():
+                output = model.generate(
+                    **inputs,
+                    streamer=streamer,
+                    stopping_criteria=StoppingCriteriaList([StopOnEvent(cancel)]),
+                    return_dict_in_generate=prefix_cache is not None,
+                    **generate_kwargs,
+                )
+            # A cancelled reply is abandoned; its partial cache would only evict useful prefixes.
+            if prefix_cache is not None and not cancel.is_set() and getattr(output, "past_key_values", None) is not None:
+                # The cache covers every token fed to the model: all but the last one generated.
+                kv = to_legacy(output.past_key_values)
+                prefix_cache.store(output.sequences[0, :kv[0][0].shape[2]].tolist(), kv, cache_version)
+        except Exception as exc:  # noqa: BLE001
+            errors.append(exc)
+            streamer.end()
+
+    worker = threading.Thread(target=run, name="generate", daemon=True)
+    worker.start()
+    text = ""
+    finished = False
+    try:
+        for piece in streamer:
+            text += piece
+            yield text
+        finished = True
+    finally:
+        # Only an early exit cancels; a reply that streamed to the end has already stopped.
+        if not finished:
+            cancel.set()
+        worker.join()
+    if errors:
+        raise errors[0]
@@ -2,15 +2,74 @@ import pandas as pd
 import gradio as gr
 from sentence_transformers import SentenceTransformer
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
 import re
 import os
 import json
+from functools import lru_cache
 from typing import List, Dict, Tuple
 
+from retrieval.batching import MicroBatcher
+from retrieval.chunking import ChunkStore
+from retrieval.embedding_store import EmbeddingStore
+from retrieval.filters import FilterIndex, detect_organizations
+from retrieval.hybrid import HybridRetriever
+from retrieval.lexical import load_or_sync
+from retrieval.query_cache import QueryCache, normalize_query
+from retrieval.text_blob import TextBlob
+from retrieval.vector_index import default_backend, load_or_build
+
+EMBEDDING_MODEL = 'sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2'
+
+# ชื่อคอลัมน์ที่เป็นไปได้ของแต่ละฟิลด์ (จับคู่แบบไม่สนตัวพิมพ์ เป็น substring ตามลำดับ)
+COLUMN_CANDIDATES = {
+    'org': ['organization', 'org', 'source', 'องค์กร'],
+    'title': ['title', 'name', 'subject', 'หัวข้อ', 'ชื่อ'],
+    'content': ['content', 'text', 'body', 'description', 'เนื้อหา', 'รายละเอียด'],
+    'type': ['document_type', 'type', 'category', 'ประเภท'],
+    'url': ['url', 'link', 'ลิงก์'],
+    'priority': ['priority', 'ความสำคัญ'],
+    'date': ['collection_date', 'date', 'วันที่'],
+}
+
+HTML_TAG_RE = re.compile(r'<[^>]+>')
+UNWANTED_CHARS_RE = re.compile(r'[^\w\s\u0e00-\u0e7f.,!?;:()\-\'""/]')
+WHITESPACE_RE = re.compile(r'\s+')
+
+
+def compose_document(header, content):
+    """ข้อความเต็มของเอกสาร: หัวเรื่อง (องค์กร/หัวข้อ/ประเภท) ตามด้วยเนื้อหา"""
+    if header and content:
+        return f"{header}\nเนื้อหา: {content}"
+    return header or (f"เนื้อหา: {content}" if content else "")
+
+
+@lru_cache(maxsize=32)
+def resolve_columns(columns):
+    """ฟิลด์ -> คอลัมน์แรกที่ชื่อมีคำที่เป็นไปได้ (None ถ้าไม่มี) คำนวณครั้งเดียวต่อ schema"""
+    lowered = [(column, str(column).lower()) for column in columns]
+    resolved = {}
+    for field, candidates in COLUMN_CANDIDATES.items():
+        resolved[field] = next(
+            (column for candidate in candidates for column, name in lowered if candidate.lower() in name),
+            None
+        )
+    return resolved
+
 class ComprehensiveThaiEnergyRAG:
-    def __init__(self, csv_file):
-        """🇹🇭 ระบบ RAG ครอบคลุมสำหรับข้อมูลพลังงานไทยทั้งหมด 309 เอกสาร"""
+    def __init__(self, csv_file, embedding_dir=None, embedding_dtype=None, vector_index=None,
+                 chunk_size=None, chunk_overlap=None):
+        """🇹🇭 ระบบ RAG ครอบคลุมสำหรับข้อมูลพลังงานไทยทั้งหมด 309 เอกสาร
+        
+        Embeddings are cached under embedding_dir/chunks (PEALLM_EMBEDDING_DIR, default .peallm_cache/embeddings)
+        as float32 or float16 (PEALLM_EMBEDDING_DTYPE); only new or changed chunks are encoded.
+        vector_index picks the search backend ('exact', 'ivf', 'hnsw', or the quantized 'sq8' / 'pq'
+        that re-rank their best candidates exactly against the stored embeddings; PEALLM_VECTOR_INDEX).
+        Documents are indexed as overlapping chunks of chunk_size characters (PEALLM_CHUNK_SIZE,
+        default 400) sharing chunk_overlap characters (PEALLM_CHUNK_OVERLAP, default 80).
+        Concurrent intelligent_search calls are micro-batched: up to PEALLM_BATCH_MAX queries (32)
+        arriving within PEALLM_BATCH_WAIT_MS (5 ms) are encoded and searched together.
+        Query embeddings and answers are cached (PEALLM_QUERY_CACHE_SIZE entries, default 1024,
+        for PEALLM_QUERY_CACHE_TTL seconds, default 3600) per corpus_version."""
         
         print("🇹🇭 กำลังโหลดระบบตอบคำถามพลังงานไทยแบบครอบคลุม...")
         print("📊 ใช้ข้อมูลทั้งหมด 309 เอกสารจากทุกหน่วยงาน")
@@ -25,18 +84,80 @@ class ComprehensiveThaiEnergyRAG:
         
         # โหลดโมเดล embedding (รองรับภาษาไทย)
         print("🤖 กำลังโหลดโมเดล AI หลายภาษา...")
-        self.model = SentenceTransformer('sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2')
+        self.model = SentenceTransformer(EMBEDDING_MODEL)
+        self.embedding_store = EmbeddingStore(
+            EMBEDDING_MODEL,
+            directory=embedding_dir,
+            dtype=embedding_dtype or os.environ.get('PEALLM_EMBEDDING_DTYPE', 'float32'),
+            name='chunks'
+        )
         print("✅ โหลดโมเดล embedding สำเร็จ")
         
         # เตรียมเอกสารและสร้าง embeddings
         print("📄 กำลังเตรียมเอกสารทั้งหมด...")
-        self.documents, self.metadata = self.prepare_all_documents()
+        self.corpus = self.prepare_all_documents()
+        
+        # ข้อความยาวย้ายไปไว้ในไฟล์เดียวที่ map เข้าหน่วยความจำ (PEALLM_TEXT_DIR) แทนสำเนาใน DataFrame
+        # ข้อความเต็มประกอบใหม่จากหัวเรื่อง + เนื้อหาเมื่อต้องใช้ และไม่เก็บ CSV ดิบไว้อีก
+        self.contents = TextBlob.build(self.corpus.pop('content'))
+        self.headers = TextBlob.build(self.corpus.pop('header'))
+        self.corpus = self.corpus.drop(columns=['full_text'])
+        del self.df
+        
+        # แบ่งเนื้อหาเต็มเป็นช่วง ๆ ตามขอบประโยค แต่ละช่วงมีหัวเรื่องของเอกสารแม่กำกับ
+        self.chunks = ChunkStore.build(
+            self.contents,
+            self.headers,
+            size=chunk_size,
+            overlap=chunk_overlap
+        )
+        chunk_texts = self.chunks.indexed_texts()
         
-        print("🔄 กำลังสร้าง embeddings สำหรับทุกเอกสาร...")
-        self.embeddings = self.model.encode(self.documents, show_progress_bar=True)
+        # ดัชนีกรองตามองค์กร/ประเภท/ความสำคัญ/วันที่ ระดับช่วงข้อความ คำนวณครั้งเดียว
+        parents = self.chunks.doc_ids
+        self.filters = FilterIndex(
+            {field: self.corpus[field].to_numpy()[parents] for field in ('org', 'type', 'priority')},
+            dates=self.corpus['date'].to_numpy()[parents]
+        )
+        print(f"✂️ แบ่งเป็น {len(self.chunks)} ช่วงข้อความจาก {len(self.corpus)} เอกสาร")
+        
+        print("🔄 กำลังสร้าง embeddings สำหรับทุกช่วงข้อความ...")
+        self.embeddings = self.embedding_store.encode(self.model, chunk_texts, show_progress_bar=True)
+        stats = self.embedding_store.stats
+        print(f"✅ embeddings: ใช้ซ้ำ {stats['reused']} / เข้ารหัสใหม่ {stats['encoded']} ช่วง ({stats['seconds']:.1f} วินาที)")
+        self.index = load_or_build(
+            self.embeddings,
+            self.embedding_store.directory / 'index',
+            self.embedding_store.fingerprint,
+            backend=vector_index or default_backend()
+        )
+        # ดัชนีคำ (BM25) สำหรับคำเฉพาะ เช่น เลขที่ระเบียบ รหัสอัตรา ชื่อย่อหน่วยงาน
+        self.lexical = load_or_sync(self.embedding_store.hashes, chunk_texts, name=self.embedding_store.name)
+        self.retriever = HybridRetriever(self.index, self.lexical, self.embeddings)
+        print(f"✅ ดัชนีค้นหา: {self.index.name} + BM25 ({self.lexical.stats['tokenized']} ช่วงใหม่)")
+        
+        # คำถามที่เข้ามาพร้อมกันจะถูกรวบเป็นชุดเดียว: encode ครั้งเดียว ค้นด้วยการคูณเมทริกซ์ครั้งเดียว
+        self.search_queue = MicroBatcher(
+            self._search_requests,
+            max_batch=int(os.environ.get('PEALLM_BATCH_MAX', '32')),
+            max_wait=float(os.environ.get('PEALLM_BATCH_WAIT_MS', '5')) / 1000,
+            name='rag-search'
+        )
+        
+        # แคชคำถามซ้ำ (LRU + TTL) ผูกกับเวอร์ชันของคลังข้อมูล/ดัชนี สร้างใหม่เมื่อไรแคชเดิมถูกล้างเอง
+        self.embedding_cache = QueryCache(name='query embedding')
+        self.answer_cache = QueryCache(name='answer')
         
         print("✅ ระบบ RAG ครอบคลุมพร้อมใช้งาน!")
-        print(f"📚 จำนวนเอกสารที่ใช้งานได้: {len(self.documents)} ฉบับ")
+        print(f"📚 จำนวนเอกสารที่ใช้งานได้: {len(self.corpus)} ฉบับ")
+    
+    @property
+    def corpus_version(self):
+        """เวอร์ชันของคลังข้อมูล + ดัชนี: เปลี่ยนเมื่อเอกสาร โมเดล หรือ backend ของดัชนีเปลี่ยน"""
+        return f"{self.index.name}:{self.embedding_store.fingerprint}"
+    
+    def cache_summary(self):
+        return f"{self.embedding_cache.summary()}\n{self.answer_cache.summary()}"
     
     def show_organization_stats(self):
         """แสดงสถิติข้อมูลตามองค์กร"""
@@ -54,131 +175,182 @@ class ComprehensiveThaiEnergyRAG:
         print("=" * 50)
     
     def prepare_all_documents(self):
-        """เตรียมเอกสารทั้งหมดสำหรับ embedding"""
-        documents = []
-        metadata = []
-        
+        """เตรียมเอกสารทั้งหมดสำหรับ embedding เป็นตาราง (คอลัมน์ละฟิลด์) ด้วย pandas แบบ vectorized"""
         print(f"📋 คอลัมน์ที่มี: {list(self.df.columns)}")
         
-        successful_docs = 0
-        for idx, row in self.df.iterrows():
-            try:
-                # ดึงข้อมูลจากแต่ละคอลัมน์
-                org = self.safe_get(row, ['organization', 'org', 'source', 'องค์กร'])
-                title = self.safe_get(row, ['title', 'name', 'subject', 'หัวข้อ', 'ชื่อ'])
-                content = self.safe_get(row, ['content', 'text', 'body', 'description', 'เนื้อหา', 'รายละเอียด'])
-                doc_type = self.safe_get(row, ['document_type', 'type', 'category', 'ประเภท'])
-                url = self.safe_get(row, ['url', 'link', 'ลิงก์'])
-                
-                # สร้างข้อความเอกสารที่ครอบคลุม
-                doc_parts = []
-                if org:
-                    doc_parts.append(f"องค์กร: {org}")
-                if title:
-                    doc_parts.append(f"หัวข้อ: {title}")
-                if doc_type:
-                    doc_parts.append(f"ประเภท: {doc_type}")
-                if content:
-                    # ทำความสะอาดเนื้อหา
-                    clean_content = self.advanced_clean_content(content)
-                    if clean_content:
-                        doc_parts.append(f"เนื้อหา: {clean_content}")
-                
-                doc_text = "\n".join(doc_parts)
-                
-                # ตรวจสอบว่าเอกสารมีเนื้อหาเพียงพอ
-                if len(doc_text.strip()) > 50:  # เพิ่มความเข้มงวด
-                    documents.append(doc_text)
-                    metadata.append({
-                        'org': org,
-                        'title': title,
-                        'content': clean_content if content else "",
-                        'type': doc_type,
-                        'url': url,
-                        'index': idx,
-                        'full_text': doc_text
-                    })
-                    successful_docs += 1
-                    
-                    # แสดงตัวอย่างเอกสารแรก 5 ฉบับ
-                    if successful_docs <= 5:
-                        print(f"\n📄 เอกสารที่ {successful_docs}:")
-                        print(f"  🏢 องค์กร: {org}")
-                        print(f"  📝 หัวข้อ: {title[:80]}...")
-                        print(f"  📋 ประเภท: {doc_type}")
-                        print(f"  📊 ความยาว: {len(clean_content)} ตัวอักษร")
-                
-            except Exception as e:
-                print(f"⚠️ ข้อผิดพลาดในเอกสารที่ {idx}: {e}")
-                continue
-            
-            # แสดงความคืบหน้า
-            if (idx + 1) % 50 == 0:
-                print(f"⏳ ประมวลผลแล้ว: {idx + 1}/{len(self.df)} เอกสาร")
+        # จับคู่ฟิลด์กับคอลัมน์ครั้งเดียวต่อ schema แทนการวนหาทุกแถว
+        columns = resolve_columns(tuple(self.df.columns))
+        fields = {field: self.column_values(column) for field, column in columns.items()}
+        fields['content'] = self.clean_content_column(fields['content'])
         
-        print(f"✅ เตรียมเอกสารเรียบร้อย: {successful_docs}/{len(self.df)} ฉบับ")
-        return documents, metadata
+        # สร้างข้อความเอกสารที่ครอบคลุม
+        labelled = [
+            np.where(fields[field] != "", label + fields[field], "")
+            for field, label in (('org', 'องค์กร: '), ('title', 'หัวข้อ: '), ('type', 'ประเภท: '))
+        ]
+        header = ["\n".join(part for part in parts if part) for parts in zip(*labelled)]
+        full_text = [compose_document(head, content) for head, content in zip(header, fields['content'])]
+        
+        corpus = pd.DataFrame({
+            'org': fields['org'],
+            'title': fields['title'],
+            'content': fields['content'],
+            'header': header,
+            'type': fields['type'],
+            'url': fields['url'],
+            'priority': fields['priority'],
+            'date': fields['date'],
+            'index': self.df.index,
+            'full_text': full_text
+        })
+        
+        # ตรวจสอบว่าเอกสารมีเนื้อหาเพียงพอ
+        corpus = corpus[corpus['full_text'].str.strip().str.len() > 50].reset_index(drop=True)  # เพิ่มความเข้มงวด
+        
+        # แสดงตัวอย่างเอกสารแรก 5 ฉบับ
+        for number, doc in enumerate(corpus.head(5).itertuples(index=False), 1):
+            print(f"\n📄 เอกสารที่ {number}:")
+            print(f"  🏢 องค์กร: {doc.org}")
+            print(f"  📝 หัวข้อ: {doc.title[:80]}...")
+            print(f"  📋 ประเภท: {doc.type}")
+            print(f"  📊 ความยาว: {len(doc.content)} ตัวอักษร")
+        
+        print(f"✅ เตรียมเอกสารเรียบร้อย: {len(corpus)}/{len(self.df)} ฉบับ")
+        return corpus
+    
+    def column_values(self, column):
+        """ค่าของคอลัมน์เป็นข้อความที่ตัดช่องว่างหัวท้ายแล้ว ค่าว่าง/NaN กลายเป็น """""
+        if column is None:
+            return pd.Series("", index=self.df.index, dtype=object)
+        raw = self.df[column]
+        values = raw.astype(str).str.strip()
+        return values.mask(raw.isna() | (values == 'nan'), "")
     
-    def safe_get(self, row, possible_cols):
-        """ดึงค่าจาก row อย่างปลอดภัย"""
-        for col in possible_cols:
-            for actual_col in row.index:
-                if col.lower() in actual_col.lower():
-                    val = row[actual_col]
-                    return str(val).strip() if pd.notna(val) and str(val).strip() != 'nan' else ""
-        return ""
+    def clean_content_column(self, content):
+        """ทำความสะอาดเนื้อหาทั้งคอลัมน์ด้วย pandas string operations
+        
+        ลบ HTML tags, อักขระพิเศษที่ไม่จำเป็น และช่องว่างที่เกินไป
+        ไม่ตัดความยาว: เนื้อหาทั้งหมดถูกแบ่งเป็นช่วง ๆ (chunk) ตอนสร้างดัชนี
+        """
+        return (
+            content.str.replace(HTML_TAG_RE, '', regex=True)
+            .str.replace(UNWANTED_CHARS_RE, ' ', regex=True)
+            .str.replace(WHITESPACE_RE, ' ', regex=True)
+            .str.strip()
+        )
     
     def advanced_clean_content(self, content):
-        """ทำความสะอาดเนื้อหาขั้นสูง"""
+        """ทำความสะอาดเนื้อหาข้อความเดียว ด้วยกฎเดียวกับ clean_content_column"""
         if pd.isna(content) or content == 'nan':
             return ""
-        
-        content = str(content)
-        
-        # ลบ HTML tags
-        content = re.sub(r'<[^>]+>', '', content)
-        
-        # ลบอักขระพิเศษที่ไม่จำเป็น
-        content = re.sub(r'[^\w\s\u0e00-\u0e7f.,!?;:()\-\'""/]', ' ', content)
-        
-        # ลบช่องว่างที่เกินไป
-        content = re.sub(r'\s+', ' ', content)
-        content = re.sub(r'\n+', ' ', content)
-        
-        # ตัดให้เหมาะสม
-        if len(content) > 1500:
-            content = content[:1500] + "..."
-        
-        return content.strip()
+        return self.clean_content_column(pd.Series([str(content)], dtype=object)).iloc[0]
     
-    def intelligent_search(self, query, top_k=5):
-        """ค้นหาแบบอัจฉริยะ"""
+    def allowed_rows(self, query, filters=None, auto_filter=True):
+        """ช่วงข้อความที่ผ่านตัวกรอง (None = ไม่กรอง)
         
-        # Encode คำถาม
-        query_embedding = self.model.encode([query])
-        
-        # คำนวณความคล้าย
-        similarities = cosine_similarity(query_embedding, self.embeddings)[0]
+        filters: dict ที่มี org, doc_type, priority, since, until (ใส่เฉพาะที่ต้องการ)
+        auto_filter: ถ้าไม่ได้ระบุ org และคำถามเอ่ยชื่อย่อ/ชื่อหน่วยงาน (PEA, กฟภ., กกพ. ...) จะกรองเฉพาะหน่วยงานนั้น
+        """
+        spec = dict(filters or {})
+        detected = auto_filter and 'org' not in spec and detect_organizations(query)
+        if detected:
+            rows = self.filters.select(org=detected, **spec)
+            # หน่วยงานที่เอ่ยถึงไม่มีในคลังข้อมูล: ค้นแบบไม่กรององค์กรแทนการไม่พบอะไรเลย
+            if len(rows):
+                return rows
+        return self.filters.select(**spec)
+    
+    def search_batch(self, queries, top_k=5, filters=None, auto_filter=True):
+        """ค้นหาหลายคำถามพร้อมกัน: encode ในรอบเดียวและค้นด้วยเมทริกซ์เดียว คืนผลลัพธ์ทีละคำถาม
         
-        # หาผลลัพธ์ที่ดีที่สุด
-        top_indices = np.argsort(similarities)[-top_k:][::-1]
+        filters: dict เดียวใช้กับทุกคำถาม หรือ list ของ dict ทีละคำถาม (ดู allowed_rows)
+        """
+        queries = list(queries)
+        if not queries:
+            return []
+        specs = filters if isinstance(filters, list) else [filters] * len(queries)
+        allowed = [self.allowed_rows(query, spec, auto_filter) for query, spec in zip(queries, specs)]
+        
+        # Encode ทุกคำถามที่ยังไม่อยู่ในแคชในรอบเดียว
+        version = self.corpus_version
+        keys = [normalize_query(query) for query in queries]
+        vectors = [self.embedding_cache.get(key, version) for key in keys]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            encoded = self.model.encode([queries[i] for i in missing], batch_size=len(missing))
+            for i, vector in zip(missing, encoded):
+                vectors[i] = vector
+                self.embedding_cache.put(keys[i], vector, version)
+        query_embeddings = np.vstack(vectors)
+        
+        # หาช่วงข้อความที่ดีที่สุด: ความหมาย (embedding) + คำตรงตัว (BM25) รวมด้วย reciprocal rank fusion
+        # ดึงมาหลายเท่าของ top_k เพราะเอกสารเดียวอาจมีหลายช่วงติดอันดับ
+        # ตัวกรองทำให้การค้นหาแตะเฉพาะแถวที่เกี่ยวข้อง แทนการค้นทั้งคลังแล้วค่อยคัดทิ้ง
+        batch_hits = self.retriever.search_batch(query_embeddings, queries, top_k * 4, allowed)
+        return [self.collapse_hits(hits, top_k) for hits in batch_hits]
+    
+    def collapse_hits(self, hits, top_k):
+        """รวมผลระดับช่วงข้อความกลับเป็นรายเอกสาร โดยใช้ช่วงที่ได้คะแนนสูงสุดของแต่ละเอกสาร"""
+        if not hits:
+            return []
+        by_chunk = {hit.id: hit for hit in hits}
+        doc_ids, chunk_ids, _ = self.chunks.aggregate(
+            [hit.id for hit in hits], [hit.score for hit in hits], top_k
+        )
         
         results = []
-        for idx in top_indices:
+        for doc_id, chunk_id in zip(doc_ids.tolist(), chunk_ids.tolist()):
+            hit = by_chunk[chunk_id]
             results.append({
-                'document': self.documents[idx],
-                'metadata': self.metadata[idx],
-                'similarity': similarities[idx]
+                'document': self.document_text(doc_id),
+                'metadata': self.document_metadata(doc_id),
+                'chunk': self.chunks.text(chunk_id),
+                'similarity': hit.similarity,
+                'bm25': hit.bm25
             })
         
         return results
     
+    def document_text(self, doc_id):
+        return compose_document(self.headers[doc_id], self.contents[doc_id])
+    
+    def document_metadata(self, doc_id):
+        """ข้อมูลของเอกสารหนึ่งฉบับ: ฟิลด์สั้นจากตาราง corpus และข้อความจากไฟล์ข้อความ"""
+        metadata = {column: self.corpus[column].iat[doc_id] for column in self.corpus.columns}
+        metadata['content'] = self.contents[doc_id]
+        metadata['header'] = self.headers[doc_id]
+        metadata['full_text'] = compose_document(metadata['header'], metadata['content'])
+        return metadata
+    
+    def _search_requests(self, requests):
+        """ตัวประมวลผลของคิว: requests คือรายการ (query, top_k, filters) ที่เข้ามาในช่วงเวลาเดียวกัน"""
+        depth = max(top_k for _, top_k, _ in requests)
+        results = self.search_batch(
+            [query for query, _, _ in requests], depth, filters=[filters for _, _, filters in requests]
+        )
+        return [found[:top_k] for found, (_, top_k, _) in zip(results, requests)]
+    
+    def intelligent_search(self, query, top_k=5, filters=None):
+        """ค้นหาแบบอัจฉริยะ (ผ่านคิวรวบคำถามที่เข้ามาพร้อมกัน) กรองได้ด้วย filters (ดู allowed_rows)"""
+        return self.search_queue((query, top_k, filters))
+    
     def generate_comprehensive_answer(self, question):
-        """สร้างคำตอบที่ครอบคลุม"""
+        """สร้างคำตอบที่ครอบคลุม (คำถามที่เคยถามแล้วตอบจากแคช)"""
         
         if not question.strip():
             return self.get_welcome_message()
         
+        version = self.corpus_version
+        key = normalize_query(question)
+        answer = self.answer_cache.get(key, version)
+        if answer is None:
+            answer = self.compose_comprehensive_answer(question)
+            self.answer_cache.put(key, answer, version)
+        return answer
+    
+    def compose_comprehensive_answer(self, question):
+        """ค้นหาและเรียบเรียงคำตอบใหม่ทั้งหมด"""
+        
         # ค้นหาเอกสารที่เกี่ยวข้อง
         results = self.intelligent_search(question, top_k=6)
         
@@ -206,8 +378,8 @@ class ComprehensiveThaiEnergyRAG:
         response += f"📝 ประเภท: {main_metadata['type']}\n"
         response += f"🎯 ความเกี่ยวข้อง: {best_result['similarity']:.1%}\n\n"
         
-        # เนื้อหาหลัก
-        main_content = main_metadata['content']
+        # เนื้อหาหลัก: ช่วงข้อความที่ตรงกับคำถามที่สุด
+        main_content = best_result['chunk'] or main_metadata['content']
         if len(main_content) > 1200:
             main_content = main_content[:1200] + "..."
         
@@ -226,8 +398,9 @@ class ComprehensiveThaiEnergyRAG:
                     response += f"📄 {meta['title'][:60]}...\n"
                     response += f"🎯 ความเกี่ยวข้อง: {best_org_result['similarity']:.1%}\n"
                     
-                    if meta['content']:
-                        short_content = meta['content'][:200] + "..." if len(meta['content']) > 200 else meta['content']
+                    snippet = best_org_result['chunk'] or meta['content']
+                    if snippet:
+                        short_content = snippet[:200] + "..." if len(snippet) > 200 else snippet
                         response += f"📝 {short_content}\n"
                     count += 1
         
@@ -386,6 +559,7 @@ if __name__ == "__main__":
             print(f"❓ คำถาม: {q}")
             answer = rag.generate_comprehensive_answer(q)
             print(f"✅ คำตอบ (150 ตัวอักษรแรก): {answer[:150]}...")
+        print(f"🗄️ {rag.cache_summary()}")
         
         # สร้าง demo interface ระดับมืออาชีพ
         demo = create_professional_demo_interface(rag)
@@ -396,7 +570,8 @@ if __name__ == "__main__":
         print(f"🎯 **พร้อมสำหรับการนำเสนอ PEA พรุ่งนี้!**")
         print(f"📊 รองรับข้อมูลครอบคลุมทั้งหมด 309 เอกสาร")
         
-        # เปิด demo ระดับมืออาชีพ
+        # เปิด demo ระดับมืออาชีพ (รับหลายผู้ใช้พร้อมกัน เพื่อให้คิวค้นหารวบคำถามเป็นชุดได้)
+        demo.queue(default_concurrency_limit=int(os.environ.get('PEALLM_CONCURRENCY', '16')))
         demo.launch(
             server_name="0.0.0.0",
             server_port=7860,
@@ -6,7 +6,6 @@ Handles Thai language, removes duplicates, organizes for Google Drive upload
 """
 
 import requests
-from bs4 import BeautifulSoup
 import pandas as pd
 import time
 import os
@@ -15,16 +14,79 @@ from datetime import datetime
 import json
 from urllib.parse import urljoin, urlparse
 import hashlib
+from collections import Counter
+
+from automation.async_crawl import AsyncCrawlEngine
+from automation.crawl_index import NEW, UNCHANGED, CrawlIndex
+from automation.extraction import DocumentExtractor, document_kind
+from automation.frontier import CrawlFrontier, RobotsCache, is_crawlable
+from automation.http_cache import HttpCache
+from automation.keywords import KeywordMatcher, load_keyword_tables
+from automation.page_fetcher import PageFetcher
+from automation.transport import ThrottledSession
+from automation import record_dataset
+from automation.record_dataset import RecordDataset
 
 class ThaiEnergyWebScraper:
-    def __init__(self):
-        self.session = requests.Session()
+    def __init__(self, crawl_mode='sequential', max_in_flight=8, per_host_in_flight=2, host_delay=1.0,
+                 http_cache_dir=None, http_cache_max_mb=256, index_path=None, max_depth=2, max_pages=50,
+                 parser='auto', keyword_tables=None, extract_dir=None, extract_max_mb=25, extract_workers=None,
+                 dataset_dir=None, keep_documents=True, host_rate=2.0, max_retries=4, pool_size=16):
+        """crawl_mode is 'sequential' (one site at a time) or 'async' (all sites in parallel).
+        Pass http_cache_dir to revalidate pages with conditional GETs against an on-disk cache.
+        Pass index_path to track documents across runs; new/changed records then land in
+        delta_documents and vanished ones in tombstones.
+        max_depth/max_pages bound each site's crawl; a site config may override them.
+        parser picks an HTML backend from automation.html_parsing ('auto', 'selectolax', 'lxml',
+        'stream', 'html.parser'). keyword_tables overrides automation/keyword_tables.json, the
+        document-type and priority keyword tables.
+        Pass extract_dir to download linked PDF/DOCX/XLSX files after the crawl and extract
+        their text in a process pool (files over extract_max_mb are skipped).
+        With dataset_dir or keep_documents=False, records are streamed into a Parquet dataset
+        (partitioned by Source and Priority, under dataset_dir or Thai_Energy_Dataset_<timestamp>)
+        as they are found; with keep_documents=False they are not also kept in all_documents, so
+        memory stays flat however large the crawl. CSV exports keep scrape order either way.
+        Every request is limited to host_rate requests/second per host (slowing down when a host
+        gets slow or returns 429/5xx) and retried up to max_retries times with jittered backoff;
+        pool_size sets the connection pool per host."""
+        self.crawl_mode = crawl_mode
+        self.max_in_flight = max_in_flight
+        self.per_host_in_flight = per_host_in_flight
+        self.host_delay = host_delay
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.session = ThrottledSession(
+            host_rate=host_rate, host_burst=per_host_in_flight, max_retries=max_retries, pool_size=pool_size
+        )
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         })
+        self.http_cache = HttpCache(http_cache_dir, max_bytes=http_cache_max_mb * 1024 * 1024) if http_cache_dir else None
+        self.fetcher = PageFetcher(self.session, http_cache=self.http_cache, parser=parser)
+        self.robots = RobotsCache(self.session, self.session.headers['User-Agent'])
+        self.run_timestamp = datetime.now().strftime('%Y-%m-%d_%H-%M')
+        self.keep_documents = keep_documents or not record_dataset.available()
         self.all_documents = []
+        self.document_count = 0
+        self.source_counts = Counter()
+        self.linked_files = []
+        self.extracted_texts = {}
+        self.dataset = None
+        if record_dataset.available() and (dataset_dir or not keep_documents):
+            self.dataset = RecordDataset(dataset_dir or f"Thai_Energy_Dataset_{self.run_timestamp}")
+        elif not keep_documents:
+            print("[WARN] pyarrow is not installed; keeping scraped records in memory")
         self.seen_urls = set()
         self.processed_content = set()
+        self.failed_pages = []
+        self.fetched_pages = set()
+        self.index = CrawlIndex(index_path) if index_path else None
+        self.delta_documents = []
+        self.tombstones = []
+        self.extractor = DocumentExtractor(
+            extract_dir, self.session, max_bytes=extract_max_mb * 1024 * 1024,
+            workers=extract_workers, can_fetch=self.robots.can_fetch
+        ) if extract_dir else None
         
         # Target websites configuration
         self.websites = {
@@ -65,6 +127,13 @@ class ThaiEnergyWebScraper:
                 'folder': 'Government_Agencies/NEPC_National_Energy_Policy_Council/'
             }
         }
+        
+        self.keyword_tables = keyword_tables or load_keyword_tables()
+        self.matcher = KeywordMatcher(
+            self.keyword_tables,
+            extra_keywords=[kw for config in self.websites.values() for kw in config['target_keywords']]
+        )
+        self._site_keyword_sets = {}
 
     def clean_thai_text(self, text):
         """Clean and normalize Thai text"""
@@ -79,183 +148,272 @@ class ThaiEnergyWebScraper:
         
         return text
 
+    def site_keywords(self, keywords):
+        """Lower-cased keyword set for a site, making sure the matcher knows every keyword"""
+        key = tuple(keywords)
+        if key not in self._site_keyword_sets:
+            if not self.matcher.covers(keywords):
+                # Sites added after construction: recompile once with their keywords included
+                self.matcher = KeywordMatcher(self.keyword_tables, extra_keywords=set(self.matcher.vocabulary) | set(keywords))
+            self._site_keyword_sets[key] = frozenset(keyword.lower() for keyword in keywords)
+        return self._site_keyword_sets[key]
+
+    def classify_text(self, text, keywords):
+        """Relevance, document type, priority and keyword hits for a title in a single scan"""
+        return self.matcher.classify(text, self.site_keywords(keywords))
+
     def is_relevant_content(self, text, keywords):
         """Check if content contains relevant keywords"""
-        text_lower = text.lower()
-        return any(keyword in text_lower for keyword in keywords)
+        return self.classify_text(text, keywords).relevant
+
+    def fetch_page(self, url):
+        """Return the parsed page (anchors and canonical URL), downloading and parsing it only once per run"""
+        return self.fetcher.get(url)
+
+    def resolve_url(self, href, page_url, source_config):
+        """Turn an href found on page_url into an absolute URL"""
+        if href.startswith('/'):
+            return source_config['base_url'] + href
+        elif href.startswith('http'):
+            return href
+        return urljoin(page_url, href)
+
+    def parse_documents(self, page, url, source_config):
+        """Build candidate document records from a parsed page without registering them"""
+        candidates = []
+
+        # Find all links
+        for anchor in page.anchors:
+            href = anchor.href
+            text = self.clean_thai_text(anchor.text)
+
+            if not text or len(text) < 5:
+                continue
+
+            # Check if it's a relevant document and determine its type in the same pass
+            classification = self.classify_text(text, source_config['target_keywords'])
+            if not classification.relevant:
+                continue
+
+            full_url = self.resolve_url(href, url, source_config)
+            url_hash = hashlib.md5(full_url.encode()).hexdigest()
+            content_hash = hashlib.md5(text.encode()).hexdigest()
+            doc_type = classification.document_type
+            priority = classification.priority
+
+            document = {
+                'Document_Title_Thai': text,
+                'Document_URL': full_url,
+                'Source': source_config['folder'].split('/')[1] if '/' in source_config['folder'] else url.split('//')[1].split('.')[1].upper(),
+                'Collection_Date': datetime.now().strftime('%Y-%m-%d'),
+                'Language': 'Thai',
+                'Document_Type': doc_type,
+                'Priority': priority,
+                'Status': 'Collected',
+                'Folder_Path': source_config['folder'],
+                'Content_Hash': content_hash
+            }
+            candidates.append((url_hash, content_hash, document))
+
+        return candidates
+
+    def register_documents(self, candidates, page_url=None):
+        """Add candidate records that are not duplicates, return how many were kept
+
+        page_url is the page the candidates were parsed from; it counts as fetched this run.
+        """
+        if page_url is not None:
+            self.fetched_pages.add(page_url)
+        documents_found = 0
+        for url_hash, content_hash, document in candidates:
+            if url_hash in self.seen_urls or content_hash in self.processed_content:
+                continue
+            self.seen_urls.add(url_hash)
+            self.processed_content.add(content_hash)
+            self.document_count += 1
+            self.source_counts[document['Source']] += 1
+            if self.keep_documents:
+                self.all_documents.append(document)
+            if self.dataset is not None:
+                self.dataset.append(document)
+            if document_kind(document['Document_URL']):
+                self.linked_files.append(document)
+            documents_found += 1
+
+            if self.index is not None:
+                change = self.index.observe(url_hash, content_hash, document['Source'], document['Document_URL'], page_url)
+                if change != UNCHANGED:
+                    self.delta_documents.append(dict(document, Change_Type=change))
+        return documents_found
+
+    def site_hosts(self, config):
+        """Hosts the crawler may follow links on for a site"""
+        return {urlparse(config['base_url']).netloc.lower(), urlparse(config['thai_url']).netloc.lower()}
+
+    def link_score(self, classification):
+        """Rank a link by the priority of its anchor text and how many site keywords it mentions"""
+        return {'High': 30, 'Medium': 20}.get(classification.priority, 10) + classification.keyword_hits
+
+    def discover_links(self, page, page_url, config):
+        """Collect relevant same-site page links with a crawl score, in page order"""
+        allowed_hosts = self.site_hosts(config)
+
+        links = {}
+        for anchor in page.anchors:
+            href = anchor.href
+            text = self.clean_thai_text(anchor.text)
+
+            if not (href and text and len(text) > 3):
+                continue
+            classification = self.classify_text(text, config['target_keywords'])
+            if not classification.relevant:
+                continue
+
+            full_url = self.resolve_url(href, page_url, config)
+            if not is_crawlable(full_url, allowed_hosts):
+                continue
+
+            # Links found in navigation menus get a small boost
+            score = self.link_score(classification) + (5 if anchor.in_nav else 0)
+            links[full_url] = max(score, links.get(full_url, score))
+
+        return list(links.items())
+
+    def new_frontier(self, config):
+        """Start a crawl frontier for a site seeded with its Thai landing page"""
+        frontier = CrawlFrontier(config.get('max_depth', self.max_depth), config.get('max_pages', self.max_pages))
+        frontier.push(config['thai_url'], 0)
+        return frontier
+
+    def expand_frontier(self, frontier, page, url, depth, config):
+        """Queue the links of a crawled page one level deeper"""
+        if page.canonical:
+            frontier.mark_seen(self.resolve_url(page.canonical, url, config))
+        for link_url, score in self.discover_links(page, url, config):
+            frontier.push(link_url, depth + 1, score)
 
     def extract_documents_from_page(self, url, source_config):
         """Extract document links and content from a page"""
         try:
             print(f"  Scraping: {url}")
-            response = self.session.get(url, timeout=15)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Find all links
-            links = soup.find_all('a', href=True)
-            documents_found = 0
-            
-            for link in links:
-                href = link.get('href', '')
-                text = self.clean_thai_text(link.get_text())
-                
-                if not text or len(text) < 5:
-                    continue
-                
-                # Check if it's a relevant document
-                if self.is_relevant_content(text, source_config['target_keywords']):
-                    # Create absolute URL
-                    if href.startswith('/'):
-                        full_url = source_config['base_url'] + href
-                    elif href.startswith('http'):
-                        full_url = href
-                    else:
-                        full_url = urljoin(url, href)
-                    
-                    # Check for duplicates
-                    url_hash = hashlib.md5(full_url.encode()).hexdigest()
-                    content_hash = hashlib.md5(text.encode()).hexdigest()
-                    
-                    if url_hash not in self.seen_urls and content_hash not in self.processed_content:
-                        self.seen_urls.add(url_hash)
-                        self.processed_content.add(content_hash)
-                        
-                        # Determine document type
-                        doc_type = self.classify_document_type(text)
-                        priority = self.get_priority(text, doc_type)
-                        
-                        document = {
-                            'Document_Title_Thai': text,
-                            'Document_URL': full_url,
-                            'Source': source_config['folder'].split('/')[1] if '/' in source_config['folder'] else url.split('//')[1].split('.')[1].upper(),
-                            'Collection_Date': datetime.now().strftime('%Y-%m-%d'),
-                            'Language': 'Thai',
-                            'Document_Type': doc_type,
-                            'Priority': priority,
-                            'Status': 'Collected',
-                            'Folder_Path': source_config['folder'],
-                            'Content_Hash': content_hash
-                        }
-                        
-                        self.all_documents.append(document)
-                        documents_found += 1
-            
+            page = self.fetch_page(url)
+            documents_found = self.register_documents(self.parse_documents(page, url, source_config), url)
             print(f"[OK] Found {documents_found} relevant documents from {url}")
             return documents_found
             
         except Exception as e:
             print(f"[ERROR] Error scraping {url}: {str(e)}")
+            self.failed_pages.append(url)
             return 0
 
     def classify_document_type(self, title):
         """Classify document type based on title"""
-        title_lower = title.lower()
-        
-        if any(word in title_lower for word in ['นโยบาย', 'policy']):
-            return 'Policy'
-        elif any(word in title_lower for word in ['แผน', 'plan', 'ยุทธศาสตร์']):
-            return 'Plan'
-        elif any(word in title_lower for word in ['กฎ', 'ระเบียบ', 'กฎหมาย', 'regulation']):
-            return 'Regulation'
-        elif any(word in title_lower for word in ['มาตรฐาน', 'standard', 'เทคนิค']):
-            return 'Standard'
-        elif any(word in title_lower for word in ['รายงาน', 'report']):
-            return 'Report'
-        elif any(word in title_lower for word in ['สถิติ', 'statistic']):
-            return 'Statistics'
-        else:
-            return 'Document'
+        return self.matcher.document_type(self.matcher.match(title))
 
     def get_priority(self, title, doc_type):
         """Assign priority based on content importance"""
-        title_lower = title.lower()
-        
-        # High priority keywords
-        high_priority = ['แผนแม่บท', 'นโยบายหลัก', 'ยุทธศาสตร์หลัก', 'มาตรฐานหลัก']
-        medium_priority = ['รายงานประจำปี', 'แผนปฏิบัติ', 'ระเบียบปฏิบัติ']
-        
-        if any(keyword in title_lower for keyword in high_priority):
-            return 'High'
-        elif any(keyword in title_lower for keyword in medium_priority):
-            return 'Medium'
-        elif doc_type in ['Policy', 'Plan', 'Regulation']:
-            return 'High'
-        elif doc_type in ['Standard', 'Report']:
-            return 'Medium'
-        else:
-            return 'Low'
+        return self.matcher.priority(self.matcher.match(title), doc_type)
 
     def scrape_website_deep(self, website_name, config):
-        """Deep scrape a website including subpages"""
+        """Breadth-first crawl of a website within its depth and page budget"""
         print(f"\n  Starting deep scrape of {website_name}")
         
-        # Start with main Thai page
-        main_docs = self.extract_documents_from_page(config['thai_url'], config)
-        
-        # Try to find and scrape relevant subpages
-        try:
-            response = self.session.get(config['thai_url'], timeout=15)
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Look for navigation menus and important sections
-            nav_links = []
-            
-            # Common navigation selectors
-            nav_selectors = [
-                'nav a', '.menu a', '.navigation a', 
-                '.main-menu a', '.primary-menu a',
-                'header a', '.header a'
-            ]
-            
-            for selector in nav_selectors:
-                found_links = soup.select(selector)
-                for link in found_links:
-                    href = link.get('href', '')
-                    text = self.clean_thai_text(link.get_text())
-                    
-                    if (href and text and 
-                        self.is_relevant_content(text, config['target_keywords']) and
-                        len(text) > 3):
-                        
-                        if href.startswith('/'):
-                            full_url = config['base_url'] + href
-                        elif href.startswith('http'):
-                            full_url = href
-                        else:
-                            full_url = urljoin(config['thai_url'], href)
-                            
-                        nav_links.append(full_url)
-            
-            # Remove duplicates and limit to prevent infinite crawling
-            nav_links = list(set(nav_links))[:10]  # Limit to 10 subpages per site
-            
-            print(f"  Found {len(nav_links)} relevant subpages to scrape")
-            
-            # Scrape each subpage
-            for subpage_url in nav_links:
-                time.sleep(1)  # Be respectful to servers
-                self.extract_documents_from_page(subpage_url, config)
+        frontier = self.new_frontier(config)
+        while not frontier.exhausted():
+            for url, depth in frontier.pop_level():
+                if not self.robots.can_fetch(url):
+                    print(f"  [SKIP] robots.txt disallows {url}")
+                    frontier.skip()
+                    continue
                 
-        except Exception as e:
-            print(f"[WARN]️ Error in deep scraping {website_name}: {str(e)}")
+                if frontier.pages_taken > 1:
+                    # Same pacing as the async engine: host_delay, or robots.txt Crawl-delay if longer
+                    time.sleep(max(self.host_delay, self.robots.crawl_delay(url)))
+                
+                self.extract_documents_from_page(url, config)
+                
+                # The parsed page is reused from the fetcher, not refetched
+                try:
+                    page = self.fetch_page(url)
+                except Exception:
+                    continue
+                self.expand_frontier(frontier, page, url, depth, config)
+        
+        print(f"  Crawled {frontier.pages_taken} pages of {website_name} ({len(frontier)} left in frontier)")
 
     def scrape_all_websites(self):
         """Scrape all configured websites"""
         print("  Starting comprehensive Thai energy sector web scraping...")
         print("=" * 70)
         
+        if self.index is not None:
+            self.index.begin_run()
+        
+        if self.crawl_mode == 'async':
+            total_docs = self.scrape_all_websites_async()
+        else:
+            total_docs = self.scrape_all_websites_sequential()
+        
+        print(f"\n  SCRAPING COMPLETE!")
+        print(f"  Total documents collected: {total_docs}")
+        print(f"  Unique URLs processed: {len(self.seen_urls)}")
+        for host, counts in self.fetcher.summary().items():
+            print(f"   • {host}: {counts['fetches']} fetches, {counts['parses']} parses, {counts['reuses']} reused")
+        for host, counts in self.session.summary().items():
+            print(f"   • {host}: {counts['requests']} requests, {counts['retries']} retries, "
+                  f"{counts['slowdowns']} slowdowns, {counts['throttle_wait_s']}s throttled, now {counts['rate']} req/s")
+        if self.failed_pages:
+            print(f"[WARN] {len(self.failed_pages)} pages failed after retries")
+        if self.extractor is not None:
+            self.extract_document_texts()
+        if self.index is not None:
+            # Only pages fetched this run can lose documents; a page that failed or fell
+            # outside the crawl budget must not tombstone what it linked to.
+            self.tombstones = self.index.finish_run(self.fetched_pages)
+            new_docs = sum(1 for doc in self.delta_documents if doc['Change_Type'] == NEW)
+            print(f"  Incremental: {new_docs} new, {len(self.delta_documents) - new_docs} changed, "
+                  f"{len(self.tombstones)} removed")
+        if self.http_cache is not None:
+            self.http_cache.save()
+            cache_stats = self.http_cache.summary()
+            print(f"  HTTP cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, "
+                  f"{cache_stats['bytes_saved']:,} bytes saved")
+        
+        return total_docs
+
+    def extract_document_texts(self):
+        """Extract text from linked PDF/DOCX/XLSX files and note where it is stored on each record"""
+        print(f"\n  Extracting linked documents...")
+        self.extracted_texts = self.extractor.extract(self.linked_files)
+        for document in self.linked_files + self.delta_documents:
+            entry = self.extracted_texts.get(document['Content_Hash'])
+            if entry is not None:
+                document['Text_File'] = entry['file']
+                document['Text_Chars'] = entry['chars']
+        return len(self.extracted_texts)
+
+    def scrape_all_websites_async(self):
+        """Scrape all websites concurrently with per-host politeness limits"""
+        engine = AsyncCrawlEngine(
+            self,
+            max_in_flight=self.max_in_flight,
+            per_host_in_flight=self.per_host_in_flight,
+            host_delay=self.host_delay
+        )
+        return engine.run()
+
+    def scrape_all_websites_sequential(self):
+        """Scrape websites one after another"""
         total_docs = 0
         
         for website_name, config in self.websites.items():
             try:
                 print(f"\n  Processing {website_name}...")
-                initial_count = len(self.all_documents)
+                initial_count = self.document_count
                 
                 self.scrape_website_deep(website_name, config)
                 
-                final_count = len(self.all_documents)
+                final_count = self.document_count
                 site_docs = final_count - initial_count
                 total_docs += site_docs
                 
@@ -267,57 +425,99 @@ class ThaiEnergyWebScraper:
             except Exception as e:
                 print(f"[ERROR] Failed to process {website_name}: {str(e)}")
         
-        print(f"\n  SCRAPING COMPLETE!")
-        print(f"  Total documents collected: {total_docs}")
-        print(f"  Unique URLs processed: {len(self.seen_urls)}")
-        
         return total_docs
 
+    def record_frames(self, source=None, priority=None, columns=None):
+        """Yield the collected records of one source and/or priority as DataFrames, batch by batch"""
+        if self.keep_documents:
+            df = pd.DataFrame(self.all_documents)
+            if source is not None:
+                df = df[df['Source'] == source]
+            if priority is not None:
+                df = df[df['Priority'] == priority]
+            yield df[columns] if columns else df
+            return
+        for batch in self.dataset.iter_batches(source, priority, columns or record_dataset.COLUMNS):
+            df = batch.to_pandas()
+            if self.extractor is not None and 'Content_Hash' in df:
+                entries = [self.extracted_texts.get(content_hash, {}) for content_hash in df['Content_Hash']]
+                df['Text_File'] = [entry.get('file') for entry in entries]
+                df['Text_Chars'] = [entry.get('chars') for entry in entries]
+            yield df
+
+    def collected_documents(self):
+        """Every record collected this run, read back from the dataset when not kept in memory"""
+        if self.keep_documents:
+            return self.all_documents
+        return [row for df in self.record_frames() for row in df.to_dict('records')]
+
+    def write_csv(self, filename, frames):
+        """Write DataFrame batches to one CSV file, return the number of rows written"""
+        rows = 0
+        with open(filename, 'w', encoding='utf-8-sig', newline='') as f:
+            for df in frames:
+                df.to_csv(f, index=False, header=rows == 0)
+                rows += len(df)
+        if rows == 0:
+            os.remove(filename)
+        return rows
+
     def save_to_files(self):
         """Save collected data to organized files"""
-        if not self.all_documents:
+        if not self.document_count:
             print("[ERROR] No documents to save!")
             return
         
         # Create timestamp for file naming
         timestamp = datetime.now().strftime('%Y-%m-%d_%H-%M')
         
-        # Create main DataFrame
-        df_all = pd.DataFrame(self.all_documents)
-        
         # Save complete dataset
         filename_all = f"Thai_Energy_Complete_Dataset_{timestamp}.csv"
-        df_all.to_csv(filename_all, index=False, encoding='utf-8-sig')
+        self.write_csv(filename_all, self.record_frames())
         print(f"  Saved complete dataset: {filename_all}")
+        if self.dataset is not None:
+            print(f"  Parquet dataset (by Source/Priority): {self.dataset.directory}")
         
-        # Save by source organization
-        for org in df_all['Source'].unique():
-            df_org = df_all[df_all['Source'] == org]
+        # Save by source organization; each file reads only that source's partitions
+        for org in self.source_counts:
             filename_org = f"Thai_Energy_{org}_Dataset_{timestamp}.csv"
-            df_org.to_csv(filename_org, index=False, encoding='utf-8-sig')
-            print(f"  Saved {org} dataset: {filename_org} ({len(df_org)} documents)")
+            count = self.write_csv(filename_org, self.record_frames(source=org))
+            print(f"  Saved {org} dataset: {filename_org} ({count} documents)")
         
         # Save high priority documents only
-        df_high = df_all[df_all['Priority'] == 'High']
-        if not df_high.empty:
-            filename_high = f"Thai_Energy_High_Priority_{timestamp}.csv"
-            df_high.to_csv(filename_high, index=False, encoding='utf-8-sig')
-            print(f"⭐ Saved high priority dataset: {filename_high} ({len(df_high)} documents)")
+        filename_high = f"Thai_Energy_High_Priority_{timestamp}.csv"
+        count = self.write_csv(filename_high, self.record_frames(priority='High'))
+        if count:
+            print(f"⭐ Saved high priority dataset: {filename_high} ({count} documents)")
         
         # Create summary report
-        self.create_summary_report(df_all, timestamp)
+        self.create_summary_report(timestamp)
         
         return filename_all
 
-    def create_summary_report(self, df, timestamp):
+    def create_summary_report(self, timestamp):
         """Create a summary report of the scraping results"""
+        document_types = Counter()
+        priorities = Counter()
+        top_documents = []
+        for df in self.record_frames(columns=['Document_Title_Thai', 'Document_Type', 'Priority']):
+            document_types.update(df['Document_Type'])
+            priorities.update(df['Priority'])
+            if len(top_documents) < 10:
+                top_documents.extend(df.loc[df['Priority'] == 'High', 'Document_Title_Thai'].head(10 - len(top_documents)))
+        
         summary = {
             'scraping_date': datetime.now().isoformat(),
-            'total_documents': len(df),
-            'sources': df['Source'].value_counts().to_dict(),
-            'document_types': df['Document_Type'].value_counts().to_dict(),
-            'priority_breakdown': df['Priority'].value_counts().to_dict(),
-            'top_documents': df[df['Priority'] == 'High']['Document_Title_Thai'].head(10).tolist()
+            'total_documents': self.document_count,
+            'sources': dict(self.source_counts.most_common()),
+            'document_types': dict(document_types.most_common()),
+            'priority_breakdown': dict(priorities.most_common()),
+            'top_documents': top_documents,
+            'page_fetches': self.fetcher.summary(),
+            'transport': self.session.summary(),
+            'failed_pages': self.failed_pages,
+            'http_cache': self.http_cache.summary() if self.http_cache is not None else None,
+            'document_extraction': self.extractor.summary() if self.extractor is not None else None
         }
         
         # Save JSON summary
@@ -375,12 +575,12 @@ def main():
             
     except KeyboardInterrupt:
         print("\n⏹️ Scraping interrupted by user")
-        if scraper.all_documents:
+        if scraper.document_count:
             print("  Saving collected data before exit...")
             scraper.save_to_files()
     except Exception as e:
         print(f"[ERROR] Unexpected error: {str(e)}")
-        if scraper.all_documents:
+        if scraper.document_count:
             print("  Saving collected data before exit...")
             scraper.save_to_files()
 